@@ -3,15 +3,57 @@ Answer Quality Validation Module
 Validates answer completeness and quality before proceeding to next question
 """
 import os
-from groq import Groq
+import re
+import threading
 from dotenv import load_dotenv
+from llm_client import complete_text, LLMUnavailableError
+from keyword_index import keyword_index
 
 load_dotenv()
 
-api_key = os.getenv("GROQ_API_KEY") or os.getenv("GROQ_API")
-client = Groq(api_key=api_key) if api_key else Groq()
+# Pre-scores at or above this are accepted, at or below REJECT are sent back, without an LLM call
+PRESCORE_ACCEPT_THRESHOLD = float(os.getenv("AIBA_VALIDATION_ACCEPT_SCORE", "0.75"))
+PRESCORE_REJECT_THRESHOLD = float(os.getenv("AIBA_VALIDATION_REJECT_SCORE", "0.15"))
 
-models_to_try = ["llama-3.1-70b-versatile", "llama-3.1-8b-instant", "mixtral-8x7b-32768", "gemma2-9b-it"]
+NUMBER_PATTERN = re.compile(r"\d+(?:[.,]\d+)*%?")
+# Capitalised words and acronyms (SAP, S/4HANA, Salesforce, Finance)
+ENTITY_PATTERN = re.compile(r"\b(?:[A-Z]{2,}[\w/&-]*|[A-Z][a-z][\w&-]*)")
+WORD_PATTERN = re.compile(r"[a-z0-9]+")
+STOPWORDS = {
+    "what", "which", "when", "where", "who", "whom", "whose", "why", "how", "does", "that", "this",
+    "these", "those", "there", "their", "they", "them", "your", "yours", "have", "with", "from",
+    "into", "about", "would", "could", "should", "will", "been", "being", "were", "what's", "also",
+    "some", "such", "than", "then", "more", "most", "very", "just", "like", "need", "needs"
+}
+
+
+class ValidationMetrics:
+    """Counts of answers settled by the pre-scorer versus escalated to the LLM"""
+
+    def __init__(self):
+        self.accepted = 0
+        self.rejected = 0
+        self.escalated = 0
+        self._lock = threading.Lock()
+
+    def record(self, tier):
+        with self._lock:
+            setattr(self, tier, getattr(self, tier) + 1)
+
+    def snapshot(self):
+        with self._lock:
+            total = self.accepted + self.rejected + self.escalated
+            return {
+                "total": total,
+                "accepted": self.accepted,
+                "rejected": self.rejected,
+                "escalated": self.escalated,
+                "escalation_rate": round(self.escalated / total, 3) if total else 0.0
+            }
+
+
+# Shared metrics instance
+validation_metrics = ValidationMetrics()
 
 
 def validate_answer_quality(answer, question, question_type="general", conversation_context=None):
@@ -33,6 +75,7 @@ def validate_answer_quality(answer, question, question_type="general", conversat
             - missing_aspects: list - What's missing
     """
     if not answer or len(answer.strip()) < 10:
+        validation_metrics.record("rejected")
         return {
             "is_valid": False,
             "quality_score": 0.0,
@@ -41,13 +84,19 @@ def validate_answer_quality(answer, question, question_type="general", conversat
             "missing_aspects": ["detail", "specificity"]
         }
     
+    # Clearly good and clearly poor answers are settled locally; only borderline ones reach the LLM
+    features = answer_features(answer, question)
+    prescore = prescore_answer(features)
+    if prescore >= PRESCORE_ACCEPT_THRESHOLD:
+        validation_metrics.record("accepted")
+        return heuristic_validation(prescore, features)
+    if prescore <= PRESCORE_REJECT_THRESHOLD:
+        validation_metrics.record("rejected")
+        return heuristic_validation(prescore, features)
+    validation_metrics.record("escalated")
+    
     # Check for common vague responses
-    vague_indicators = [
-        "i don't know", "not sure", "maybe", "possibly", 
-        "it depends", "probably", "i think", "not really"
-    ]
-    answer_lower = answer.lower()
-    is_vague = any(indicator in answer_lower for indicator in vague_indicators)
+    is_vague = bool(features["vague_hits"])
     
     # Use AI to assess answer quality
     validation_prompt = f"""
@@ -58,7 +107,7 @@ Question Type: {question_type}
 Answer: {answer}
 
 Recent Conversation Context:
-{conversation_context[-500] if conversation_context else "None"}
+{conversation_context[-500:] if conversation_context else "None"}
 
 Evaluate this answer on:
 1. **Specificity**: Is it specific and concrete (vs vague/generic)?
@@ -78,36 +127,125 @@ Be strict but fair. An answer is valid if it provides useful information, even i
 """
     
     try:
-        for model_name in models_to_try:
-            try:
-                response = client.chat.completions.create(
-                    model=model_name,
-                    messages=[
-                        {
-                            "role": "system",
-                            "content": "You are a quality assurance analyst. Evaluate answers objectively and provide structured feedback."
-                        },
-                        {
-                            "role": "user",
-                            "content": validation_prompt
-                        }
-                    ],
-                    temperature=0.3,  # Lower temperature for more consistent evaluation
-                    max_tokens=300
-                )
-                
-                result_text = response.choices[0].message.content
-                return parse_validation_result(result_text, is_vague)
-            except Exception as e:
-                continue
+        try:
+            result_text, _ = complete_text(
+                [
+                    {
+                        "role": "system",
+                        "content": "You are a quality assurance analyst. Evaluate answers objectively and provide structured feedback."
+                    },
+                    {
+                        "role": "user",
+                        "content": validation_prompt
+                    }
+                ],
+                task="validate_answer",
+                # Repeats of the same evaluation (retries, reloads) are served from the cache
+                cache=True,
+                temperature=0.3,  # Lower temperature for more consistent evaluation
+                max_tokens=300
+            )
+        except LLMUnavailableError:
+            # Fallback: Basic validation
+            return basic_validation(answer, is_vague)
         
-        # Fallback: Basic validation
-        return basic_validation(answer, is_vague)
+        return parse_validation_result(result_text, is_vague)
     except Exception as e:
         print(f"Error in answer validation: {e}")
         return basic_validation(answer, is_vague)
 
 
+def answer_features(answer, question):
+    """
+    Local signals of answer quality
+    
+    Returns:
+        dict with words, numbers, entities (distinct capitalised names and
+        acronyms, not counting sentence starts), section_keywords, vague_hits
+        and question_overlap (share of the question's content words the answer uses)
+    """
+    scan = keyword_index.scan(answer)
+    
+    entities = set()
+    # Last non-space character before the current match, carried forward so
+    # each stretch of the answer is only scanned once
+    preceding = ""
+    scanned = 0
+    for match in ENTITY_PATTERN.finditer(answer):
+        word = match.group(0)
+        gap = answer[scanned:match.start()].rstrip()
+        if gap:
+            preceding = gap[-1]
+        scanned = match.start()
+        if not word.isupper() and (not preceding or preceding in ".!?:\n"):
+            continue
+        entities.add(word)
+    
+    answer_words = WORD_PATTERN.findall(answer.lower())
+    answer_stems = {word[:5] for word in answer_words}
+    question_terms = {
+        word for word in WORD_PATTERN.findall((question or "").lower())
+        if len(word) > 3 and word not in STOPWORDS
+    }
+    overlap = (
+        len([term for term in question_terms if term[:5] in answer_stems]) / len(question_terms)
+        if question_terms else 0.0
+    )
+    
+    return {
+        "words": len(answer_words),
+        "numbers": len(NUMBER_PATTERN.findall(answer)),
+        "entities": len(entities),
+        "section_keywords": sum(scan["section_counts"].values()),
+        "vague_hits": scan["vague_hits"],
+        "question_overlap": round(overlap, 2)
+    }
+
+
+def prescore_answer(features):
+    """Weighted 0-1 quality estimate from answer_features()"""
+    score = (
+        0.30 * min(1.0, features["words"] / 40)
+        + 0.20 * min(1.0, features["numbers"] / 2)
+        + 0.20 * min(1.0, features["entities"] / 2)
+        + 0.15 * min(1.0, features["question_overlap"] / 0.3)
+        + 0.15 * min(1.0, features["section_keywords"] / 3)
+    )
+    score -= min(0.5, 0.25 * len(features["vague_hits"]))
+    return round(max(0.0, min(1.0, score)), 2)
+
+
+def heuristic_validation(prescore, features):
+    """Validation result for an answer the pre-scorer was confident about"""
+    if prescore >= PRESCORE_ACCEPT_THRESHOLD:
+        return {
+            "is_valid": True,
+            "quality_score": prescore,
+            "feedback": "Answer looks good!",
+            "should_probe": False,
+            "missing_aspects": []
+        }
+    
+    missing_aspects = []
+    if features["vague_hits"]:
+        missing_aspects.append("specificity")
+    if features["words"] < 15:
+        missing_aspects.append("detail")
+    if not features["numbers"]:
+        missing_aspects.append("figures or metrics")
+    if not features["entities"]:
+        missing_aspects.append("specific systems, teams or tools")
+    
+    return {
+        "is_valid": False,
+        "quality_score": prescore,
+        "feedback": "Your answer seems a bit vague. Could you be more specific?" if features["vague_hits"]
+            else "Could you add more detail, such as figures, systems or teams involved?",
+        "should_probe": True,
+        "missing_aspects": missing_aspects
+    }
+
+
 def parse_validation_result(result_text, is_vague):
     """Parse AI validation result into structured format"""
     try:
@@ -230,32 +368,30 @@ Output ONLY the question, no preamble.
 """
     
     try:
-        for model_name in models_to_try:
-            try:
-                response = client.chat.completions.create(
-                    model=model_name,
-                    messages=[
-                        {
-                            "role": "system",
-                            "content": "You are a senior MBB consultant. Ask direct, probing questions."
-                        },
-                        {
-                            "role": "user",
-                            "content": probe_prompt
-                        }
-                    ],
-                    temperature=0.7,
-                    max_tokens=100
-                )
-                
-                probe_question = response.choices[0].message.content.strip()
-                # Clean up
-                probe_question = probe_question.strip('"').strip("'")
-                if not probe_question.endswith('?'):
-                    probe_question += "?"
-                return probe_question
-            except Exception as e:
-                continue
+        probe_question, _ = complete_text(
+            [
+                {
+                    "role": "system",
+                    "content": "You are a senior MBB consultant. Ask direct, probing questions."
+                },
+                {
+                    "role": "user",
+                    "content": probe_prompt
+                }
+            ],
+            task="probing_question",
+            temperature=0.7,
+            max_tokens=100
+        )
+        
+        probe_question = probe_question.strip()
+        # Clean up
+        probe_question = probe_question.strip('"').strip("'")
+        if not probe_question.endswith('?'):
+            probe_question += "?"
+        return probe_question
+    except LLMUnavailableError:
+        pass
     except Exception as e:
         print(f"Error generating probe question: {e}")
     
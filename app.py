@@ -1,17 +1,21 @@
-from flask import Flask, render_template, request, jsonify, send_file
+from flask import Flask, render_template, request, jsonify, send_file, Response, stream_with_context, g
 import os
 import json
+import copy
 from datetime import datetime
 from dotenv import load_dotenv
-from groq import Groq
 
 # Import BRD generation functions
 from interactive_brd_generator import (
     get_ai_response, 
     generate_brd, 
-    save_brd, 
+    generate_brd_stream,
+    save_brd_markdown,
     save_conversation,
-    extract_conversation_summary
+    brd_filenames,
+    brd_header,
+    brd_footer,
+    PDF_SUPPORT
 )
 
 # Import customer research and adaptive questioning
@@ -22,13 +26,159 @@ from customer_research import (
     should_continue_phase
 )
 
+from answer_validation import validate_answer_quality, validation_metrics
+from requirements_completeness import calculate_completeness_score, get_completeness_dashboard
+
+from session_store import session_store, new_session, new_session_id
+from question_prefetch import question_prefetcher
+from turn_tasks import turn_task_runner
+from render_queue import render_queue
+from brd_renderer import warm_up as warm_up_renderer
+from artifact_store import artifact_store
+from brd_repository import brd_repository
+from conversation_summary import ConversationSummary
+from llm_client import router, response_cache
+from tracing import tracer
+from metrics import metrics_registry
+from token_ledger import token_ledger
+
 load_dotenv()
 
+# Per-task timeouts for the work done after each answer
+FOLLOW_UP_TIMEOUT_SECONDS = float(os.getenv("AIBA_FOLLOW_UP_TIMEOUT_SECONDS", "20"))
+VALIDATION_TIMEOUT_SECONDS = float(os.getenv("AIBA_VALIDATION_TIMEOUT_SECONDS", "15"))
+COMPLETENESS_TIMEOUT_SECONDS = float(os.getenv("AIBA_COMPLETENESS_TIMEOUT_SECONDS", "20"))
+
 app = Flask(__name__)
 app.secret_key = os.urandom(24)
+# Let a fronting nginx/Apache send artifact files itself
+app.config['USE_X_SENDFILE'] = os.getenv("AIBA_USE_X_SENDFILE", "0") == "1"
+
+ARTIFACT_MIMETYPES = {
+    '.pdf': 'application/pdf',
+    '.md': 'text/markdown',
+    '.json': 'application/json'
+}
+
+# Import WeasyPrint and parse the BRD stylesheet at boot rather than on the first request
+warm_up_renderer()
+
+@app.before_request
+def start_request_span():
+    """Open the span every LLM call made for this request nests under"""
+    route = request.url_rule.rule if request.url_rule else 'unmatched'
+    g.trace_span = tracer.start_span(f"{request.method} {route}", kind="http", route=route, method=request.method)
+    g.trace_token = tracer.activate(g.trace_span)
 
-# Groq models to try
-models_to_try = ["llama-3.1-70b-versatile", "llama-3.1-8b-instant", "mixtral-8x7b-32768", "gemma2-9b-it"]
+@app.after_request
+def tag_request_span(response):
+    span = g.get('trace_span')
+    if span is not None:
+        span.set(status_code=response.status_code)
+        response.headers['X-Trace-Id'] = span.trace_id
+    return response
+
+@app.teardown_request
+def finish_request_span(error=None):
+    span = g.pop('trace_span', None)
+    if span is None:
+        return
+    if error is not None:
+        span.fail(error)
+        span.set(status_code=500)
+    tracer.deactivate(g.pop('trace_token'))
+    span.finish()
+
+def service_metrics():
+    """/metrics families for state kept outside the span histograms"""
+    cache = response_cache.stats()
+    validation = validation_metrics.snapshot()
+    models = router.snapshot()
+    return [
+        ('aiba_llm_cache_hits_total', 'counter', 'LLM response cache hits', [('aiba_llm_cache_hits_total', [], cache['hits'])]),
+        ('aiba_llm_cache_misses_total', 'counter', 'LLM response cache misses', [('aiba_llm_cache_misses_total', [], cache['misses'])]),
+        ('aiba_llm_cache_entries', 'gauge', 'LLM responses currently cached', [('aiba_llm_cache_entries', [], cache['entries'])]),
+        ('aiba_validation_answers_total', 'counter', 'Answers by validation tier', [
+            ('aiba_validation_answers_total', [('tier', tier)], validation[tier])
+            for tier in ('accepted', 'rejected', 'escalated')
+        ]),
+        ('aiba_model_available', 'gauge', 'Whether the model circuit breaker is closed', [
+            ('aiba_model_available', [('model', model_name)], int(state['available']))
+            for model_name, state in sorted(models.items())
+        ]),
+        ('aiba_model_latency_seconds', 'gauge', 'Recent LLM latency per model and task, as used for routing', [
+            ('aiba_model_latency_seconds', [('model', entry['model']), ('task', entry['task']), ('stat', stat)], entry[f'{stat}_s'])
+            for entry in router.latency.snapshot()
+            for stat in ('ewma', 'p95')
+        ])
+    ]
+
+metrics_registry.add_collector(service_metrics)
+
+def resolve_session(data):
+    """
+    Conversation state for a request
+    
+    Clients that send a session_id get the server-side session. Older clients,
+    or a client whose session was evicted, send the full state instead; it is
+    used as-is and stored again under the given session_id.
+    Returns None if the session is unknown and the request carries no state.
+    """
+    session_id = data.get('session_id')
+    # LLM calls made for this request are charged to the session
+    tracer.tag_root(session_id=session_id)
+    session = session_store.get(session_id)
+    if session is not None:
+        return session
+    if session_id and 'conversation_history' not in data:
+        return None
+    
+    session = {
+        'session_id': session_id,
+        'client_name': data.get('client_name', ''),
+        'company_name': data.get('company_name', ''),
+        'project_topic': data.get('project_topic', ''),
+        'project_context': data.get('project_context', ''),
+        'customer_research': data.get('customer_research', ''),
+        'conversation_history': data.get('conversation_history', []),
+        'conversation_phase': data.get('conversation_phase', 'discovery')
+    }
+    persist_session(session)
+    if session_id:
+        brd_repository.save_project(session)
+    return session
+
+def persist_session(session):
+    """Save a session back to the store (no-op for stateless requests)"""
+    if session.get('session_id'):
+        with session_store.lock(session['session_id']):
+            session_store.save(session)
+
+def conversation_summary_for(session):
+    """The session's rolling conversation summary, caught up with its history"""
+    state = session.get('conversation_summary')
+    summary = ConversationSummary.from_dict(state)
+    summary.update(session['conversation_history'])
+    if not state or state.get('messages_seen') != summary.messages_seen:
+        session['conversation_summary'] = summary.to_dict()
+    return summary
+
+def session_usage(session):
+    """Token usage and cost of a session so far (None for stateless requests)"""
+    if not session.get('session_id'):
+        return None
+    usage = token_ledger.session_usage(session['session_id'])
+    totals = usage['totals']
+    print(f"💰 Session usage: {totals['total_tokens']} tokens over {totals['calls']} LLM calls (${totals['cost_usd']:.4f})")
+    return usage
+
+def record_turn(session, question, answer):
+    """Add a turn to the project repository (sessions only)"""
+    if session.get('session_id'):
+        brd_repository.add_turn(session['session_id'], question, answer)
+
+def session_expired_response():
+    return jsonify({'error': 'Session not found or expired', 'error_code': 'session_expired'}), 404
 
 @app.route('/')
 def index():
@@ -46,6 +196,10 @@ def start_project():
     if not client_name:
         return jsonify({'error': 'Customer name is required'}), 400
     
+    # Pick the session id now so the research call is charged to it
+    session_id = new_session_id()
+    tracer.tag_root(session_id=session_id)
+    
     # Research customer
     print(f"🔍 Researching customer: {client_name} ({company_name})")
     customer_research, research_model = research_customer(client_name, company_name)
@@ -58,8 +212,31 @@ Date: {datetime.now().strftime("%Y-%m-%d %H:%M:%S")}
 Customer Research: {customer_research[:500] if customer_research else 'Research in progress...'}
 """
     
+    # Keep the conversation state server-side from here on
+    session = new_session(
+        client_name,
+        company_name or 'Not specified',
+        project_topic or 'To be discovered',
+        project_context,
+        customer_research,
+        research_model,
+        session_id=session_id
+    )
+    session_store.save(session)
+    brd_repository.save_project(session)
+    
+    # Start on the first question while the response travels back
+    question_prefetcher.start(
+        session['session_id'],
+        session['conversation_history'],
+        session['customer_research'],
+        session['conversation_phase'],
+        session['project_topic']
+    )
+    
     return jsonify({
         'success': True,
+        'session_id': session['session_id'],
         'project_context': project_context,
         'client_name': client_name,
         'company_name': company_name or 'Not specified',
@@ -73,9 +250,13 @@ Customer Research: {customer_research[:500] if customer_research else 'Research
 def get_question():
     """Generate adaptive question based on conversation phase and history"""
     data = request.json
-    conversation_history = data.get('conversation_history', [])
-    customer_research = data.get('customer_research', '')
-    conversation_phase = data.get('conversation_phase', 'discovery')
+    session = resolve_session(data)
+    if session is None:
+        return session_expired_response()
+    
+    conversation_history = session['conversation_history']
+    customer_research = session['customer_research']
+    conversation_phase = data.get('conversation_phase', session.get('conversation_phase', 'discovery'))
     total_exchanges = len([msg for msg in conversation_history if msg.get('role') == 'user'])
     
     # Determine phase if not provided
@@ -83,18 +264,31 @@ def get_question():
         conversation_phase = determine_conversation_phase(conversation_history, total_exchanges)
     
     # Get project topic if available
-    project_topic = data.get('project_topic', '')
+    project_topic = data.get('project_topic', session.get('project_topic', ''))
     
     # Generate adaptive question - pass full customer research and project topic
     print(f"💭 Generating {conversation_phase} question (exchange #{total_exchanges + 1})")
     print(f"📊 Using customer research: {len(customer_research) if customer_research else 0} characters")
     print(f"🎯 Project topic: {project_topic[:100] if project_topic else 'Not provided'}")
-    question, model_used = generate_adaptive_question(
-        conversation_history, 
-        customer_research,  # Pass full research, not truncated
-        phase=conversation_phase,
-        project_topic=project_topic  # Pass project topic
+    
+    # Serve the speculatively generated question if it was made for this exact state
+    question, model_used = question_prefetcher.take(
+        session.get('session_id'),
+        conversation_history,
+        customer_research,
+        conversation_phase,
+        project_topic
     )
+    if question:
+        print("⚡ Serving prefetched question")
+    else:
+        question, model_used = generate_adaptive_question(
+            conversation_history, 
+            customer_research,  # Pass full research, not truncated
+            phase=conversation_phase,
+            project_topic=project_topic,  # Pass project topic
+            summary=conversation_summary_for(session)
+        )
     
     if not question:
         return jsonify({'error': 'Failed to generate question'}), 500
@@ -106,37 +300,8 @@ def get_question():
         'model_used': model_used
     })
 
-@app.route('/api/submit-answer', methods=['POST'])
-def submit_answer():
-    """Submit an answer and get adaptive follow-up"""
-    data = request.json
-    question = data.get('question', '')
-    answer = data.get('answer', '').strip()
-    conversation_history = data.get('conversation_history', [])
-    customer_research = data.get('customer_research', '')
-    conversation_phase = data.get('conversation_phase', 'discovery')
-    
-    if not answer or answer.lower() in ['skip', 'done']:
-        # Move to next phase or continue
-        total_exchanges = len([msg for msg in conversation_history if msg.get('role') == 'user'])
-        new_phase = determine_conversation_phase(conversation_history, total_exchanges + 1)
-        return jsonify({
-            'success': True,
-            'skipped': True,
-            'conversation_phase': new_phase
-        })
-    
-    # Add to conversation history
-    conversation_history.append({
-        "role": "assistant",
-        "content": question
-    })
-    conversation_history.append({
-        "role": "user",
-        "content": answer
-    })
-    
-    # Get consultative follow-up or probing question
+def generate_follow_up(answer, conversation_history, conversation_phase, customer_research):
+    """Consultative follow-up or probing question for an answer, or None to move on"""
     try:
         total_exchanges = len([msg for msg in conversation_history if msg.get('role') == 'user'])
         
@@ -179,25 +344,206 @@ Output ONLY the question. No acknowledgments or filler.
         print(f"Error generating follow-up: {e}")
         ai_response = None  # Skip response on error
     
+    return ai_response
+
+def score_completeness(conversation_history, project_context, state, summary=None):
+    """
+    Score the newest exchanges on top of a completeness state
+    
+    Runs on a turn-task thread, so it only reads its arguments (pass a copy of
+    the session's state); apply_completeness stores the new state.
+    """
+    result = calculate_completeness_score(
+        conversation_history,
+        "ai_ml",
+        project_context,
+        state=state,
+        summary=summary
+    )
+    state = result.pop('state')
+    return {'state': state, 'dashboard': get_completeness_dashboard(result)}
+
+def apply_completeness(session, scored):
+    """Store a score_completeness result in the session and return its dashboard"""
+    state = scored['state']
+    with session_store.lock(session.get('session_id')):
+        # A slower task for an earlier turn must not overwrite newer state
+        current = session.get('completeness_state')
+        if not current or current.get('messages_scored', 0) <= state['messages_scored']:
+            session['completeness_state'] = state
+            persist_session(session)
+    return scored['dashboard']
+
+@app.route('/api/submit-answer', methods=['POST'])
+def submit_answer():
+    """Submit an answer and get adaptive follow-up"""
+    data = request.json
+    question = data.get('question', '')
+    answer = data.get('answer', '').strip()
+    session = resolve_session(data)
+    if session is None:
+        return session_expired_response()
+    
+    conversation_history = session['conversation_history']
+    customer_research = session['customer_research']
+    conversation_phase = data.get('conversation_phase', session.get('conversation_phase', 'discovery'))
+    
+    if not answer or answer.lower() in ['skip', 'done']:
+        # Move to next phase or continue
+        total_exchanges = len([msg for msg in conversation_history if msg.get('role') == 'user'])
+        new_phase = determine_conversation_phase(conversation_history, total_exchanges + 1)
+        if session.get('session_id') and question:
+            # Record the skip server-side, as older clients do in their local history
+            conversation_history.append({"role": "assistant", "content": question})
+            conversation_history.append({"role": "user", "content": "skip"})
+            record_turn(session, question, "skip")
+            summary = conversation_summary_for(session)
+            session['conversation_phase'] = new_phase
+            persist_session(session)
+            if total_exchanges + 1 < 15:
+                question_prefetcher.start(
+                    session['session_id'],
+                    conversation_history,
+                    customer_research,
+                    new_phase,
+                    session.get('project_topic', ''),
+                    summary
+                )
+        return jsonify({
+            'success': True,
+            'skipped': True,
+            'conversation_phase': new_phase
+        })
+    
+    # Add to conversation history
+    conversation_history.append({
+        "role": "assistant",
+        "content": question
+    })
+    conversation_history.append({
+        "role": "user",
+        "content": answer
+    })
+    record_turn(session, question, answer)
+    # Fold the new exchange into the rolling summary the next question, scorer and BRD read from
+    summary = conversation_summary_for(session)
+    
+    # The next question only depends on the history, so start it now while the follow-up is generated
+    answered_exchanges = len([msg for msg in conversation_history if msg.get('role') == 'user'])
+    if answered_exchanges < 15:
+        question_prefetcher.start(
+            session.get('session_id'),
+            conversation_history,
+            customer_research,
+            determine_conversation_phase(conversation_history, answered_exchanges),
+            session.get('project_topic', ''),
+            summary
+        )
+    
+    # Follow-up, answer validation and completeness scoring are independent, so run them together
+    history_snapshot = list(conversation_history)
+    with session_store.lock(session.get('session_id')):
+        completeness_state = copy.deepcopy(session.get('completeness_state'))
+    project_context = session.get('project_context', '')
+    recent_context = "\n".join(
+        f"{msg['role']}: {msg['content']}" for msg in history_snapshot[-6:]
+    )
+    results, pending_tasks = turn_task_runner.run(session.get('session_id'), {
+        'ai_response': (
+            lambda: generate_follow_up(answer, history_snapshot, conversation_phase, customer_research),
+            FOLLOW_UP_TIMEOUT_SECONDS
+        ),
+        'validation': (
+            lambda: validate_answer_quality(answer, question, conversation_phase, recent_context),
+            VALIDATION_TIMEOUT_SECONDS
+        ),
+        'completeness': (
+            lambda: score_completeness(history_snapshot, project_context, completeness_state, summary),
+            COMPLETENESS_TIMEOUT_SECONDS
+        )
+    })
+    ai_response = results.get('ai_response')
+    if results.get('completeness'):
+        results['completeness'] = apply_completeness(session, results['completeness'])
+    
     # Determine next phase
     total_exchanges = len([msg for msg in conversation_history if msg.get('role') == 'user'])
     new_phase = determine_conversation_phase(conversation_history, total_exchanges)
+    session['conversation_phase'] = new_phase
+    persist_session(session)
     
-    return jsonify({
+    response_data = {
         'success': True,
         'ai_response': ai_response,
-        'conversation_history': conversation_history,
+        'validation': results.get('validation'),
+        'completeness': results.get('completeness'),
+        'pending_tasks': pending_tasks,
         'conversation_phase': new_phase,
         'total_exchanges': total_exchanges,
         'should_continue': total_exchanges < 15  # Max 15 exchanges before BRD generation
+    }
+    # Session-backed clients already know the history; only stateless ones get it back
+    if not session.get('session_id'):
+        response_data['conversation_history'] = conversation_history
+    
+    return jsonify(response_data)
+
+@app.route('/api/turn-results/<session_id>', methods=['GET'])
+def turn_results(session_id):
+    """Results of submit-answer tasks that missed the latency budget"""
+    try:
+        wait_seconds = min(float(request.args.get('wait', 0)), 25.0)
+    except ValueError:
+        wait_seconds = 0.0
+    
+    results, pending_tasks = turn_task_runner.collect(session_id, wait_seconds)
+    if results.get('completeness'):
+        session = session_store.get(session_id)
+        scored = results['completeness']
+        results['completeness'] = apply_completeness(session, scored) if session is not None else scored['dashboard']
+    return jsonify({
+        'results': results,
+        'pending_tasks': pending_tasks
     })
 
+@app.route('/api/validation-stats', methods=['GET'])
+def validation_stats():
+    """How many answers the validator settled locally versus escalated to the LLM"""
+    return jsonify(validation_metrics.snapshot())
+
+@app.route('/api/sessions/<session_id>/usage', methods=['GET'])
+def session_usage_endpoint(session_id):
+    """Tokens and cost of a session's LLM calls, by stage, task, endpoint and model"""
+    return jsonify(dict(session_id=session_id, **token_ledger.session_usage(session_id)))
+
+@app.route('/api/usage', methods=['GET'])
+def usage_totals():
+    """Tokens and cost of every LLM call since startup, with the same breakdowns"""
+    return jsonify(token_ledger.totals())
+
+@app.route('/metrics', methods=['GET'])
+def metrics():
+    """Request and LLM call histograms in Prometheus text format"""
+    return Response(metrics_registry.render(), mimetype='text/plain; version=0.0.4')
+
+@app.route('/api/traces', methods=['GET'])
+def traces():
+    """Most recent request traces with their LLM call spans, newest first"""
+    try:
+        limit = min(int(request.args.get('limit', 20)), 200)
+    except ValueError:
+        limit = 20
+    return jsonify({'traces': tracer.recent_traces(limit)})
+
 @app.route('/api/add-additional-info', methods=['POST'])
 def add_additional_info():
     """Add additional information to the conversation"""
     data = request.json
     user_input = data.get('user_input', '').strip()
-    conversation_history = data.get('conversation_history', [])
+    session = resolve_session(data)
+    if session is None:
+        return session_expired_response()
+    conversation_history = session['conversation_history']
     
     if not user_input:
         return jsonify({'error': 'Input is required'}), 400
@@ -206,6 +552,7 @@ def add_additional_info():
         "role": "user",
         "content": user_input
     })
+    record_turn(session, None, user_input)
     
     try:
         ai_response, _ = get_ai_response(
@@ -226,35 +573,50 @@ def add_additional_info():
             "content": ai_response
         })
     
-    # Only add AI response if it exists and is meaningful
-    if ai_response:
-        conversation_history.append({
-            "role": "assistant",
-            "content": ai_response
-        })
+    persist_session(session)
     
-    return jsonify({
+    response_data = {
         'success': True,
-        'ai_response': ai_response if ai_response else None,
-        'conversation_history': conversation_history
-    })
+        'ai_response': ai_response if ai_response else None
+    }
+    if not session.get('session_id'):
+        response_data['conversation_history'] = conversation_history
+    
+    return jsonify(response_data)
+
+def queue_pdf_render(full_content, pdf_filename, session_id=None):
+    """Start rendering a PDF in the background, returns the job id or None if PDFs are unavailable"""
+    if not PDF_SUPPORT:
+        print(f"💡 Install 'markdown' and 'weasyprint' to generate PDF files.")
+        return None
+    try:
+        return render_queue.submit(full_content, pdf_filename, session_id)
+    except Exception as e:
+        print(f"⚠️  Could not queue PDF render: {e}")
+        return None
 
 @app.route('/api/generate-brd', methods=['POST'])
 def generate_brd_endpoint():
     """Generate the BRD document"""
     data = request.json
-    conversation_history = data.get('conversation_history', [])
-    project_context = data.get('project_context', '')
-    customer_research = data.get('customer_research', '')
-    client_name = data.get('client_name', '')
-    company_name = data.get('company_name', '')
+    session = resolve_session(data)
+    if session is None:
+        return session_expired_response()
+    
+    conversation_history = session['conversation_history']
+    project_context = session['project_context']
+    customer_research = session['customer_research']
+    client_name = session['client_name']
+    company_name = session['company_name']
     
     # Enhance project context with customer research
     if customer_research:
         project_context += f"\n\nCustomer Research Insights:\n{customer_research}"
     
     try:
-        brd_content, model_used = generate_brd(conversation_history, project_context)
+        brd_content, model_used = generate_brd(
+            conversation_history, project_context, mode=data.get('mode'), summary=conversation_summary_for(session)
+        )
         
         if not brd_content:
             return jsonify({'error': 'Failed to generate BRD'}), 500
@@ -263,54 +625,39 @@ def generate_brd_endpoint():
         project_name = f"{client_name}_{company_name}"
         
         try:
-            md_filename, pdf_filename = save_brd(brd_content, project_name, project_context)
+            md_filename, pdf_filename, full_content = save_brd_markdown(
+                brd_content, project_name, session.get('session_id')
+            )
         except Exception as save_error:
             print(f"ERROR saving BRD: {save_error}")
             import traceback
             traceback.print_exc()
             # Still return the content even if save failed
             md_filename = None
-            pdf_filename = None
+            full_content = None
         
-        # Ensure md_filename is set - generate it if save_brd failed
-        if not md_filename:
-            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-            safe_name = project_name.replace(' ', '_')
-            md_filename = f"BRD_{safe_name}_{timestamp}.md"
-            print(f"WARNING: save_brd returned None, attempting to save file directly: {md_filename}")
-            
-            # Try to save the file directly as fallback
-            try:
-                metadata = f"""---
-Generated By: AIBA (AI Business Analyst)
-Generation Date: {datetime.now().strftime("%Y-%m-%d %H:%M:%S")}
-Project: {project_name}
-Document Type: Business Requirements Document (BRD)
----
-
-"""
-                full_content = metadata + brd_content + f"\n\n---\n*Document generated by AIBA on {datetime.now().strftime("%B %d, %Y at %H:%M:%S")}*\n"
-                
-                with open(md_filename, "w", encoding="utf-8") as f:
-                    f.write(full_content)
-                print(f"✅ Fallback save successful: {md_filename}")
-            except Exception as fallback_error:
-                print(f"ERROR in fallback save: {fallback_error}")
-                import traceback
-                traceback.print_exc()
+        # The PDF renders in the background; clients poll /api/pdf-jobs/<id> for it
+        pdf_job_id = queue_pdf_render(full_content, pdf_filename, session.get('session_id')) if md_filename else None
+        pdf_filename = None
         
-        conversation_file = save_conversation(conversation_history, project_context, project_name)
+        conversation_file = save_conversation(
+            conversation_history, project_context, project_name, session.get('session_id'),
+            usage=session_usage(session)
+        )
+        if session.get('session_id'):
+            brd_repository.add_brd_version(session['session_id'], brd_content, model_used, md_filename)
         
         response_data = {
             'success': True,
             'brd_content': brd_content,
             'md_filename': md_filename,
             'pdf_filename': pdf_filename,
+            'pdf_job_id': pdf_job_id,
             'conversation_file': conversation_file,
             'model_used': model_used
         }
         
-        print(f"BRD Generation Response: md_filename={md_filename}, pdf_filename={pdf_filename}")
+        print(f"BRD Generation Response: md_filename={md_filename}, pdf_job_id={pdf_job_id}")
         
         return jsonify(response_data)
     except Exception as e:
@@ -319,51 +666,127 @@ Document Type: Business Requirements Document (BRD)
         traceback.print_exc()
         return jsonify({'error': str(e)}), 500
 
+def sse_event(event, data):
+    """Format one Server-Sent Event"""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+@app.route('/api/generate-brd/stream', methods=['POST'])
+def generate_brd_stream_endpoint():
+    """Generate the BRD document, streaming markdown chunks as Server-Sent Events"""
+    data = request.json
+    session = resolve_session(data)
+    if session is None:
+        return session_expired_response()
+    
+    conversation_history = session['conversation_history']
+    project_context = session['project_context']
+    customer_research = session['customer_research']
+    client_name = session['client_name']
+    company_name = session['company_name']
+    
+    # Enhance project context with customer research
+    if customer_research:
+        project_context += f"\n\nCustomer Research Insights:\n{customer_research}"
+    
+    # Open the stream before responding so a model failure is still a plain JSON error
+    try:
+        chunks, model_used = generate_brd_stream(
+            conversation_history, project_context, summary=conversation_summary_for(session)
+        )
+    except Exception as e:
+        print(f"ERROR in generate_brd_stream_endpoint: {str(e)}")
+        return jsonify({'error': 'Failed to generate BRD'}), 500
+    
+    project_name = f"{client_name}_{company_name}"
+    
+    def event_stream():
+        md_filename, pdf_filename = brd_filenames(project_name)
+        header = brd_header(project_name)
+        brd_parts = []
+        
+        yield sse_event('start', {'md_filename': md_filename, 'model_used': model_used})
+        
+        try:
+            # Write the markdown file as chunks arrive
+            with open(artifact_store.path(md_filename), "w", encoding="utf-8") as f:
+                f.write(header)
+                for chunk in chunks:
+                    brd_parts.append(chunk)
+                    f.write(chunk)
+                    f.flush()
+                    yield sse_event('chunk', {'text': chunk})
+                footer = brd_footer()
+                f.write(footer)
+            artifact_store.record(md_filename, "brd", session.get('session_id'))
+        except Exception as e:
+            print(f"ERROR while streaming BRD: {e}")
+            yield sse_event('error', {'error': str(e), 'md_filename': md_filename})
+            return
+        
+        brd_content = "".join(brd_parts)
+        print(f"✅ BRD streamed successfully: {md_filename}")
+        
+        pdf_job_id = queue_pdf_render(header + brd_content + footer, pdf_filename, session.get('session_id'))
+        conversation_file = save_conversation(
+            conversation_history, project_context, project_name, session.get('session_id'),
+            usage=session_usage(session)
+        )
+        if session.get('session_id'):
+            brd_repository.add_brd_version(session['session_id'], brd_content, model_used, md_filename)
+        
+        yield sse_event('done', {
+            'success': True,
+            'brd_content': brd_content,
+            'md_filename': md_filename,
+            'pdf_filename': None,
+            'pdf_job_id': pdf_job_id,
+            'conversation_file': conversation_file,
+            'model_used': model_used
+        })
+    
+    return Response(
+        stream_with_context(event_stream()),
+        mimetype='text/event-stream',
+        headers={
+            'Cache-Control': 'no-cache',
+            'X-Accel-Buffering': 'no'
+        }
+    )
+
 @app.route('/api/convert-to-pdf', methods=['POST'])
 def convert_to_pdf():
-    """Convert markdown to PDF on demand"""
+    """
+    Convert a saved BRD to PDF on demand
+    
+    Renders the stored markdown (with its header and footer), so the content
+    hash matches the render queued at generation time: that job or the cached
+    PDF is reused instead of rendering again.
+    """
     try:
         data = request.json
         md_filename = data.get('md_filename')
-        brd_content = data.get('brd_content', '')
         
         if not md_filename:
             return jsonify({'error': 'md_filename is required'}), 400
         
-        # Read markdown file if content not provided
-        if not brd_content:
-            file_path = os.path.join(os.getcwd(), md_filename)
-            if os.path.exists(file_path):
-                with open(file_path, 'r', encoding='utf-8') as f:
-                    brd_content = f.read()
-            else:
-                return jsonify({'error': 'Markdown file not found'}), 404
+        file_path = artifact_store.find(md_filename)
+        if not file_path:
+            return jsonify({'error': 'Markdown file not found'}), 404
+        with open(file_path, 'r', encoding='utf-8') as f:
+            full_content = f.read()
         
         # Generate PDF filename
         pdf_filename = md_filename.replace('.md', '.pdf')
         
-        # Import PDF generation functions
-        from interactive_brd_generator import markdown_to_html
-        
-        # Set library path for macOS Homebrew installations
-        if 'DYLD_LIBRARY_PATH' not in os.environ:
-            homebrew_lib = '/opt/homebrew/lib'
-            if os.path.exists(homebrew_lib):
-                os.environ['DYLD_LIBRARY_PATH'] = homebrew_lib
+        job_id = queue_pdf_render(full_content, pdf_filename, data.get('session_id'))
+        if not job_id:
+            return jsonify({'error': 'PDF generation not available'}), 500
         
-        try:
-            from weasyprint import HTML
-            html_content = markdown_to_html(brd_content)
-            HTML(string=html_content).write_pdf(pdf_filename)
-            
-            return jsonify({
-                'success': True,
-                'pdf_filename': pdf_filename
-            })
-        except (ImportError, OSError) as e:
-            return jsonify({'error': f'PDF generation not available: {str(e)}'}), 500
-        except Exception as e:
-            return jsonify({'error': f'Error generating PDF: {str(e)}'}), 500
+        return jsonify({
+            'success': True,
+            'job_id': job_id,
+            'status': 'queued'
+        }), 202
             
     except Exception as e:
         print(f"ERROR in convert_to_pdf: {str(e)}")
@@ -371,49 +794,62 @@ def convert_to_pdf():
         traceback.print_exc()
         return jsonify({'error': str(e)}), 500
 
+@app.route('/api/pdf-jobs/<job_id>', methods=['GET'])
+def pdf_job_status(job_id):
+    """Status of a background PDF render"""
+    status = render_queue.status(job_id)
+    if status is None:
+        return jsonify({'error': 'Unknown PDF job'}), 404
+    return jsonify(status)
+
+@app.route('/api/projects', methods=['GET'])
+def find_projects():
+    """Past projects for a customer (client or company name prefix)"""
+    customer = request.args.get('customer', '').strip()
+    if not customer:
+        return jsonify({'error': 'customer is required'}), 400
+    return jsonify({'projects': brd_repository.find_projects(customer)})
+
+@app.route('/api/search', methods=['GET'])
+def search():
+    """Full-text search over BRDs (scope=brds, default) or answers (scope=answers)"""
+    query = request.args.get('q', '').strip()
+    customer = request.args.get('customer', '').strip() or None
+    scope = request.args.get('scope', 'brds')
+    if not query:
+        return jsonify({'error': 'q is required'}), 400
+    
+    if scope == 'answers':
+        results = brd_repository.search_answers(query, customer)
+    elif scope == 'brds':
+        results = brd_repository.search_brds(query, customer)
+    else:
+        return jsonify({'error': "scope must be 'brds' or 'answers'"}), 400
+    
+    return jsonify({'results': results})
+
+@app.route('/api/sessions/<session_id>/artifacts', methods=['GET'])
+def session_artifacts(session_id):
+    """Generated files for a session, newest first"""
+    return jsonify({'artifacts': artifact_store.list_for_session(session_id)})
+
 @app.route('/api/download/<path:filename>')
 def download_file(filename):
-    """Download generated files"""
-    try:
-        # Decode URL-encoded filename
-        from urllib.parse import unquote
-        filename = unquote(filename)
-        
-        file_path = os.path.join(os.getcwd(), filename)
-        
-        # Debug logging
-        print(f"Download request for: {filename}")
-        print(f"Full path: {file_path}")
-        print(f"File exists: {os.path.exists(file_path)}")
-        
-        if not os.path.exists(file_path):
-            print(f"ERROR: File not found at {file_path}")
-            return jsonify({'error': f'File not found: {filename}'}), 404
-        
-        # Get the original filename for download
-        original_filename = os.path.basename(filename)
-        
-        # Determine MIME type based on extension
-        if filename.endswith('.pdf'):
-            mimetype = 'application/pdf'
-        elif filename.endswith('.md'):
-            mimetype = 'text/markdown'
-        else:
-            mimetype = 'application/octet-stream'
-        
-        print(f"Sending file: {original_filename} (MIME: {mimetype})")
-        
-        return send_file(
-            file_path,
-            as_attachment=True,
-            download_name=original_filename,
-            mimetype=mimetype
-        )
-    except Exception as e:
-        print(f"ERROR in download_file: {str(e)}")
-        import traceback
-        traceback.print_exc()
-        return jsonify({'error': str(e)}), 500
+    """Download generated files, with ETag/Last-Modified revalidation and Range support"""
+    file_path = artifact_store.find(filename)
+    if file_path is None:
+        return jsonify({'error': f'File not found: {filename}'}), 404
+    
+    extension = os.path.splitext(file_path)[1].lower()
+    return send_file(
+        file_path,
+        as_attachment=True,
+        download_name=os.path.basename(file_path),
+        mimetype=ARTIFACT_MIMETYPES.get(extension, 'application/octet-stream'),
+        conditional=True,
+        etag=True,
+        max_age=0
+    )
 
 if __name__ == '__main__':
     app.run(debug=True, host='0.0.0.0', port=5001)
@@ -0,0 +1,117 @@
+"""
+Artifact Store Module
+Where generated BRD, PDF and conversation files are written and served from
+"""
+import os
+import re
+import time
+import uuid
+import hashlib
+import sqlite3
+import threading
+from datetime import datetime
+from dotenv import load_dotenv
+
+load_dotenv()
+
+ARTIFACTS_DIR = os.getenv("AIBA_ARTIFACTS_DIR", "artifacts")
+INDEX_FILENAME = "index.sqlite"
+
+
+def new_artifact_stem(prefix, project_name):
+    """Collision-free base name, e.g. BRD_Acme_Corp_20251212_164519_3f9a1c2e"""
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    safe_name = re.sub(r"[^\w.-]+", "_", project_name)
+    return f"{prefix}_{safe_name}_{timestamp}_{uuid.uuid4().hex[:8]}"
+
+
+def shard_for(filename):
+    """Two levels of 256 subdirectories, picked by the hash of the name"""
+    digest = hashlib.sha256(filename.encode("utf-8")).hexdigest()
+    return os.path.join(digest[:2], digest[2:4])
+
+
+class ArtifactStore:
+    """
+    Hash-sharded directory of generated files with a small SQLite index
+
+    Artifacts are referred to by bare filename. A file lives at
+    <root>/<aa>/<bb>/<filename>, where aa/bb come from the filename's hash,
+    so no directory grows large and a lookup never lists one. The index maps
+    names to their kind and session so a session's files can be listed
+    without scanning. Each process opens its own index connection.
+    """
+
+    def __init__(self, root=ARTIFACTS_DIR):
+        # Absolute, because Flask resolves relative send_file paths against the app root
+        self.root = os.path.abspath(root)
+        self._lock = threading.Lock()
+        self._db = None
+        self._db_pid = None
+
+    def path(self, filename):
+        """Path to write an artifact to"""
+        filename = os.path.basename(filename)
+        directory = os.path.join(self.root, shard_for(filename))
+        os.makedirs(directory, exist_ok=True)
+        return os.path.join(directory, filename)
+
+    def find(self, filename):
+        """Path of an existing artifact, or None (also for names that aren't plain filenames)"""
+        if not filename or filename != os.path.basename(filename) or filename in (".", ".."):
+            return None
+        path = os.path.join(self.root, shard_for(filename), filename)
+        if not os.path.isfile(path):
+            return None
+        return path
+
+    def record(self, filename, kind, session_id=None):
+        """Add a written artifact to the index"""
+        path = self.find(filename)
+        if path is None:
+            return
+        try:
+            with self._lock:
+                db = self._connect()
+                db.execute(
+                    "INSERT OR REPLACE INTO artifacts (filename, kind, session_id, size, created_at) "
+                    "VALUES (?, ?, ?, ?, ?)",
+                    (filename, kind, session_id, os.path.getsize(path), time.time())
+                )
+                db.commit()
+        except sqlite3.Error as e:
+            print(f"⚠️  Could not index artifact {filename}: {e}")
+
+    def list_for_session(self, session_id):
+        """Artifacts recorded for a session, newest first"""
+        with self._lock:
+            rows = self._connect().execute(
+                "SELECT filename, kind, size, created_at FROM artifacts "
+                "WHERE session_id = ? ORDER BY created_at DESC",
+                (session_id,)
+            ).fetchall()
+        return [
+            {"filename": filename, "kind": kind, "size": size, "created_at": created_at}
+            for filename, kind, size, created_at in rows
+        ]
+
+    def _connect(self):
+        # Render workers are separate processes; never share a connection across a fork
+        if self._db is None or self._db_pid != os.getpid():
+            os.makedirs(self.root, exist_ok=True)
+            self._db = sqlite3.connect(
+                os.path.join(self.root, INDEX_FILENAME), timeout=10, check_same_thread=False
+            )
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS artifacts ("
+                "filename TEXT PRIMARY KEY, kind TEXT NOT NULL, session_id TEXT, "
+                "size INTEGER NOT NULL, created_at REAL NOT NULL)"
+            )
+            self._db.execute("CREATE INDEX IF NOT EXISTS artifacts_session ON artifacts (session_id, created_at)")
+            self._db.commit()
+            self._db_pid = os.getpid()
+        return self._db
+
+
+# Shared store instance
+artifact_store = ArtifactStore()
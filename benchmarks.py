@@ -0,0 +1,255 @@
+"""
+AIBA Benchmarks Module
+Microbenchmarks for the local (non-LLM) hot paths, compared against a stored baseline
+
+Usage:
+    python benchmarks.py --save          # record the baseline
+    python benchmarks.py                 # compare against it
+    python benchmarks.py --filter prompt --threshold 5
+
+Fixtures are the committed BRD_*.md and Conversation_*.json files plus a
+synthetic 50-turn session. Nothing here calls the LLM.
+"""
+import os
+import sys
+import glob
+import json
+import random
+import timeit
+import argparse
+import platform
+import statistics
+import tempfile
+from datetime import datetime
+
+# The LLM client is imported (but never called) by the modules under test
+os.environ.setdefault("GROQ_API_KEY", "benchmark")
+
+from brd_renderer import markdown_to_html, load_weasyprint, PDF_SUPPORT
+from interactive_brd_generator import extract_conversation_summary, build_brd_prompt
+from answer_validation import parse_validation_result, answer_features, prescore_answer
+from requirements_completeness import basic_section_scoring
+from keyword_index import keyword_index
+from prompt_builder import PromptBuilder, prompt_builder
+from conversation_summary import ConversationSummary
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+BASELINE_PATH = os.path.join(BASE_DIR, "benchmarks_baseline.json")
+REPEAT = 5
+# Percentage slowdown reported as a regression
+REGRESSION_THRESHOLD = 10.0
+
+PROJECT_CONTEXT = """
+Client: Adani
+Company: Supervity
+Project Topic: Accounts payable invoice automation
+Date: 2025-12-12 16:45:19
+"""
+
+VALIDATION_OUTPUT = """- Quality Score: 0.65
+- Is Valid: Yes
+- Feedback: The answer names the systems involved but gives no volumes.
+  Ask for monthly invoice counts and current cycle time.
+- Should Probe: Yes
+- Missing Aspects: invoice volumes, cycle time, exception rate"""
+
+SYNTHETIC_TOPICS = [
+    ("business objectives", "The objective is to cut invoice cycle time from {n} days to 1 and reduce manual effort by {p}%."),
+    ("current process", "Today {n} clerks key invoices from PDFs into SAP S/4HANA; about {p}% need rework."),
+    ("stakeholders", "Finance operations owns the process; procurement and {n} business-unit controllers approve."),
+    ("data", "We receive roughly {n},000 invoices a month as PDF and EDI; {p}% are handwritten or scanned."),
+    ("integration", "It must integrate with SAP, Salesforce and the DMS through REST APIs within {n} months."),
+    ("performance", "Extraction should finish in under {n} seconds per invoice at {p} concurrent uploads."),
+    ("compliance", "GST e-invoicing and SOC 2 apply; audit logs are kept for {n} years."),
+    ("risks", "Vendor master data quality is the main risk; duplicates cause {p}% of payment errors."),
+    ("scope", "Phase one covers domestic invoices only, about {p}% of volume, over {n} plants."),
+    ("success criteria", "Success is straight-through processing above {p}% within {n} months of go-live.")
+]
+
+
+def load_fixtures():
+    """Committed BRDs and conversations, plus a synthetic 50-turn session"""
+    brds = {}
+    for path in sorted(glob.glob(os.path.join(BASE_DIR, "BRD_adani_*.md"))):
+        with open(path, "r", encoding="utf-8") as f:
+            brds[os.path.basename(path)[:-3]] = f.read()
+
+    conversations = {}
+    for path in sorted(glob.glob(os.path.join(BASE_DIR, "Conversation_*.json"))):
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        conversations[os.path.basename(path)[:-5]] = data.get("conversation_history", data) if isinstance(data, dict) else data
+
+    conversations["synthetic_50_turns"] = synthetic_session(50)
+    return brds, conversations
+
+
+def synthetic_session(turns, seed=42):
+    """A reproducible discovery conversation with realistic answer lengths"""
+    rng = random.Random(seed)
+    history = []
+    for turn in range(turns):
+        topic, template = SYNTHETIC_TOPICS[turn % len(SYNTHETIC_TOPICS)]
+        history.append({
+            "role": "assistant",
+            "content": f"Turning to {topic}: what should we know about {topic} for this project (question {turn + 1})?"
+        })
+        sentences = [template.format(n=rng.randint(2, 40), p=rng.randint(5, 95)) for _ in range(rng.randint(2, 6))]
+        history.append({"role": "user", "content": " ".join(sentences)})
+    return history
+
+
+def build_benchmarks(brds, conversations):
+    """Name -> zero-argument callable for every benchmark"""
+    benchmarks = {}
+    synthetic = conversations["synthetic_50_turns"]
+
+    for name, markdown_content in brds.items():
+        benchmarks[f"markdown_to_html[{name}]"] = lambda md=markdown_content: markdown_to_html(md)
+
+    weasyprint = load_weasyprint() if PDF_SUPPORT else None
+    if weasyprint is not None:
+        HTML, stylesheet = weasyprint
+        pdf_path = os.path.join(tempfile.mkdtemp(prefix="aiba-bench-"), "bench.pdf")
+        for name, markdown_content in brds.items():
+            html_content = markdown_to_html(markdown_content, include_style=False)
+            benchmarks[f"weasyprint_pdf[{name}]"] = (
+                lambda html=html_content: HTML(string=html).write_pdf(pdf_path, stylesheets=[stylesheet])
+            )
+
+    benchmarks["parse_validation_result"] = lambda: parse_validation_result(VALIDATION_OUTPUT, False)
+
+    synthetic_text = "\n".join(f"{msg['role']}: {msg['content']}" for msg in synthetic)
+    keyword_hits = keyword_index.scan(synthetic_text)["section_hits"]
+    benchmarks["keyword_index.scan[synthetic_50_turns]"] = lambda: keyword_index.scan(synthetic_text)
+    benchmarks["basic_section_scoring"] = lambda: basic_section_scoring(keyword_hits)
+
+    answer = synthetic[-1]["content"]
+    question = synthetic[-2]["content"]
+    benchmarks["answer_prescore"] = lambda: prescore_answer(answer_features(answer, question))
+
+    for name, history in conversations.items():
+        benchmarks[f"extract_conversation_summary[{name}]"] = lambda h=history: extract_conversation_summary(h)
+        benchmarks[f"build_brd_prompt[{name}]"] = lambda h=history: build_brd_prompt(h, PROJECT_CONTEXT)
+
+    # The shared builder caches condensed exchanges (steady state); a zero-size cache shows the cold cost
+    cold_builder = PromptBuilder(cache_size=0)
+    benchmarks["prompt_transcript_warm[synthetic_50_turns]"] = lambda: prompt_builder.transcript(synthetic, 4000)
+    benchmarks["prompt_transcript_cold[synthetic_50_turns]"] = lambda: cold_builder.transcript(synthetic, 4000)
+
+    def fold_session():
+        summary = ConversationSummary()
+        for end in range(2, len(synthetic) + 1, 2):
+            summary.update(synthetic[:end])
+    benchmarks["conversation_summary_fold[synthetic_50_turns]"] = fold_session
+
+    folded = ConversationSummary()
+    folded.update(synthetic)
+    benchmarks["build_brd_prompt_with_summary[synthetic_50_turns]"] = (
+        lambda: build_brd_prompt(synthetic, PROJECT_CONTEXT, summary=folded)
+    )
+    return benchmarks
+
+
+def measure(fn, repeat=REPEAT):
+    """
+    Best and median seconds per call, over repeat runs of at least 0.2s each
+    
+    Comparisons use the best run: slower runs mostly measure other load on the machine.
+    """
+    fn()  # warm up
+    timer = timeit.Timer(fn)
+    number, _ = timer.autorange()
+    runs = [elapsed / number for elapsed in timer.repeat(repeat=repeat, number=number)]
+    return {"median_s": statistics.median(runs), "min_s": min(runs), "loops": number}
+
+
+def format_seconds(seconds):
+    if seconds >= 1:
+        return f"{seconds:.2f} s"
+    if seconds >= 1e-3:
+        return f"{seconds * 1e3:.2f} ms"
+    return f"{seconds * 1e6:.1f} µs"
+
+
+def load_baseline(path):
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark AIBA's local hot paths")
+    parser.add_argument("--baseline", default=BASELINE_PATH, help="baseline file to compare against or save to")
+    parser.add_argument("--save", action="store_true", help="save this run as the new baseline")
+    parser.add_argument("--filter", default=None, help="only run benchmarks whose name contains this text")
+    parser.add_argument("--repeat", type=int, default=REPEAT, help="timed runs per benchmark")
+    parser.add_argument("--threshold", type=float, default=REGRESSION_THRESHOLD,
+                        help="slowdown (percent) reported as a regression")
+    parser.add_argument("--json", default=None, help="also write this run's results to a JSON file")
+    settings = parser.parse_args()
+
+    brds, conversations = load_fixtures()
+    benchmarks = build_benchmarks(brds, conversations)
+    if settings.filter:
+        benchmarks = {name: fn for name, fn in benchmarks.items() if settings.filter in name}
+    if not PDF_SUPPORT or load_weasyprint() is None:
+        print("💡 WeasyPrint not available - PDF rendering benchmarks skipped")
+
+    baseline = None if settings.save else load_baseline(settings.baseline)
+    baseline_results = (baseline or {}).get("results", {})
+    if not settings.save and baseline is None:
+        print(f"💡 No baseline at {settings.baseline} - run with --save to record one")
+
+    width = max([len(name) for name in benchmarks] + [9]) + 2
+    print("\n" + "=" * (width + 46))
+    print(f"{'benchmark':<{width}}{'best':>12}{'median':>12}{'baseline':>12}{'delta':>10}")
+    print("-" * (width + 46))
+
+    results = {}
+    regressions = []
+    for name, fn in benchmarks.items():
+        result = measure(fn, settings.repeat)
+        results[name] = result
+
+        previous = baseline_results.get(name)
+        baseline_text = delta_text = ""
+        if previous:
+            delta = (result["min_s"] - previous["min_s"]) / previous["min_s"] * 100
+            baseline_text = format_seconds(previous["min_s"])
+            delta_text = f"{delta:+.1f}%"
+            if delta > settings.threshold:
+                delta_text += " ⚠️"
+                regressions.append((name, delta))
+        print(f"{name:<{width}}{format_seconds(result['min_s']):>12}{format_seconds(result['median_s']):>12}"
+              f"{baseline_text:>12}{delta_text:>10}")
+    print("=" * (width + 46))
+
+    run = {
+        "created": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "results": results
+    }
+    if settings.json:
+        with open(settings.json, "w", encoding="utf-8") as f:
+            json.dump(run, f, indent=2)
+    if settings.save:
+        # Keep baselines of benchmarks that weren't run this time (e.g. with --filter)
+        saved = load_baseline(settings.baseline) or {}
+        run["results"] = dict(saved.get("results", {}), **results)
+        with open(settings.baseline, "w", encoding="utf-8") as f:
+            json.dump(run, f, indent=2)
+        print(f"💾 Baseline saved to: {settings.baseline}")
+
+    if regressions:
+        print(f"❌ {len(regressions)} benchmark(s) slower than baseline by more than {settings.threshold}%:")
+        for name, delta in regressions:
+            print(f"   {name}: {delta:+.1f}%")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,262 @@
+"""
+BRD Renderer Module
+Warm markdown-to-HTML and WeasyPrint rendering for BRD documents
+"""
+import os
+import threading
+
+from render_cache import render_cache, render_key
+from artifact_store import artifact_store
+
+# PDF generation imports
+try:
+    import markdown
+    PDF_SUPPORT = True
+except ImportError:
+    PDF_SUPPORT = False
+
+# Use codehilite if Pygments is available (checked once, not per render)
+try:
+    import pygments
+    MARKDOWN_EXTENSIONS = ['extra', 'tables', 'codehilite']
+except ImportError:
+    MARKDOWN_EXTENSIONS = ['extra', 'tables']
+
+# Professional CSS styling for PDF
+BRD_CSS = """
+@page {
+    size: A4;
+    margin: 2cm;
+    @top-center {
+        content: "Business Requirements Document";
+        font-size: 10pt;
+        color: #666;
+    }
+    @bottom-center {
+        content: "Page " counter(page) " of " counter(pages);
+        font-size: 10pt;
+        color: #666;
+    }
+}
+body {
+    font-family: 'Helvetica', 'Arial', sans-serif;
+    font-size: 11pt;
+    line-height: 1.6;
+    color: #333;
+    max-width: 100%;
+}
+h1 {
+    color: #1a237e;
+    font-size: 24pt;
+    margin-top: 20pt;
+    margin-bottom: 12pt;
+    border-bottom: 3px solid #1a237e;
+    padding-bottom: 8pt;
+}
+h2 {
+    color: #283593;
+    font-size: 18pt;
+    margin-top: 16pt;
+    margin-bottom: 10pt;
+    border-bottom: 2px solid #283593;
+    padding-bottom: 6pt;
+}
+h3 {
+    color: #3949ab;
+    font-size: 14pt;
+    margin-top: 12pt;
+    margin-bottom: 8pt;
+}
+h4 {
+    color: #5c6bc0;
+    font-size: 12pt;
+    margin-top: 10pt;
+    margin-bottom: 6pt;
+}
+p {
+    margin: 8pt 0;
+    text-align: justify;
+}
+ul, ol {
+    margin: 8pt 0;
+    padding-left: 24pt;
+}
+li {
+    margin: 4pt 0;
+}
+table {
+    width: 100%;
+    border-collapse: collapse;
+    margin: 12pt 0;
+    page-break-inside: avoid;
+}
+th {
+    background-color: #3949ab;
+    color: white;
+    padding: 8pt;
+    text-align: left;
+    font-weight: bold;
+    border: 1px solid #283593;
+}
+td {
+    padding: 6pt 8pt;
+    border: 1px solid #ddd;
+}
+tr:nth-child(even) {
+    background-color: #f5f5f5;
+}
+code {
+    background-color: #f4f4f4;
+    padding: 2pt 4pt;
+    border-radius: 3pt;
+    font-family: 'Courier New', monospace;
+    font-size: 10pt;
+}
+pre {
+    background-color: #f4f4f4;
+    padding: 10pt;
+    border-radius: 4pt;
+    overflow-x: auto;
+    page-break-inside: avoid;
+}
+blockquote {
+    border-left: 4px solid #3949ab;
+    padding-left: 12pt;
+    margin: 8pt 0;
+    color: #555;
+    font-style: italic;
+}
+hr {
+    border: none;
+    border-top: 2px solid #ddd;
+    margin: 16pt 0;
+}
+strong {
+    color: #1a237e;
+    font-weight: bold;
+}
+.metadata {
+    background-color: #f5f5f5;
+    padding: 10pt;
+    border-radius: 4pt;
+    margin-bottom: 16pt;
+    font-size: 10pt;
+}
+"""
+
+HTML_TEMPLATE = """
+<!DOCTYPE html>
+<html>
+<head>
+    <meta charset="UTF-8">
+    <title>Business Requirements Document</title>
+{style}
+</head>
+<body>
+{body}
+</body>
+</html>
+"""
+
+_local = threading.local()
+_weasyprint_lock = threading.Lock()
+_weasyprint = None
+
+
+def get_markdown():
+    """This thread's markdown converter, reset for a new document"""
+    converter = getattr(_local, "markdown", None)
+    if converter is None:
+        converter = markdown.Markdown(extensions=MARKDOWN_EXTENSIONS)
+        _local.markdown = converter
+    return converter.reset()
+
+
+def markdown_to_html(markdown_content, include_style=True):
+    """
+    Convert markdown content to HTML
+    
+    With include_style=False the stylesheet is left out; save_brd_pdf passes
+    the pre-parsed BRD_CSS to WeasyPrint instead.
+    """
+    html_body = get_markdown().convert(markdown_content)
+    style = f"<style>\n{BRD_CSS}</style>" if include_style else ""
+    return HTML_TEMPLATE.format(style=style, body=html_body)
+
+
+def load_weasyprint():
+    """
+    Import WeasyPrint and parse BRD_CSS once per process
+    
+    Returns (HTML, stylesheet), or None if WeasyPrint can't be loaded.
+    """
+    global _weasyprint
+    if _weasyprint is not None:
+        return _weasyprint or None
+
+    with _weasyprint_lock:
+        if _weasyprint is None:
+            try:
+                # Set library path for macOS Homebrew installations
+                if 'DYLD_LIBRARY_PATH' not in os.environ:
+                    homebrew_lib = '/opt/homebrew/lib'
+                    if os.path.exists(homebrew_lib):
+                        os.environ['DYLD_LIBRARY_PATH'] = homebrew_lib
+
+                from weasyprint import HTML, CSS
+                _weasyprint = (HTML, CSS(string=BRD_CSS))
+            except (ImportError, OSError) as import_error:
+                print(f"⚠️  WeasyPrint not available: {import_error}")
+                print(f"💡 Install system dependencies for WeasyPrint or use markdown file only.")
+                _weasyprint = False
+    return _weasyprint or None
+
+
+def warm_up():
+    """Load the markdown converter and WeasyPrint ahead of the first render"""
+    if not PDF_SUPPORT:
+        return
+    get_markdown()
+    load_weasyprint()
+
+
+def save_brd_pdf(full_content, pdf_filename, session_id=None):
+    """Render the full BRD markdown to PDF in the artifact store, returns the filename or None"""
+    if not PDF_SUPPORT:
+        print(f"💡 Install 'markdown' and 'weasyprint' to generate PDF files.")
+        return None
+    
+    try:
+        pdf_path = artifact_store.path(pdf_filename)
+        
+        # Identical markdown was rendered before; reuse that PDF
+        key = render_key(full_content)
+        if render_cache.link_pdf(key, pdf_path):
+            print(f"✅ PDF reused from render cache: {pdf_filename}")
+            artifact_store.record(pdf_filename, "pdf", session_id)
+            return pdf_filename
+        
+        print(f"\n🔄 Generating PDF...")
+        weasyprint = load_weasyprint()
+        if weasyprint is None:
+            return None
+        HTML, stylesheet = weasyprint
+        
+        html_content = render_cache.get_html(key)
+        if html_content is None:
+            html_content = markdown_to_html(full_content, include_style=False)
+            render_cache.put_html(key, html_content)
+        # Render to a new file: pdf_path may be a hard link into the render cache
+        tmp_path = f"{pdf_path}.{os.getpid()}.tmp"
+        HTML(string=html_content).write_pdf(tmp_path, stylesheets=[stylesheet])
+        os.replace(tmp_path, pdf_path)
+        render_cache.put_pdf(key, pdf_path)
+        print(f"✅ PDF generated successfully!")
+        print(f"📁 PDF File: {pdf_path}")
+        print(f"📄 Size: {os.path.getsize(pdf_path)} bytes")
+        artifact_store.record(pdf_filename, "pdf", session_id)
+        return pdf_filename
+    except Exception as pdf_error:
+        print(f"⚠️  Could not generate PDF: {pdf_error}")
+        print(f"💡 Markdown file saved successfully. PDF generation skipped.")
+        return None
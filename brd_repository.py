@@ -0,0 +1,307 @@
+"""
+BRD Repository Module
+SQLite store of projects, conversation turns, research and BRD versions with full-text search
+"""
+import os
+import time
+import sqlite3
+import threading
+from dotenv import load_dotenv
+
+load_dotenv()
+
+REPOSITORY_DB_PATH = os.getenv("AIBA_REPOSITORY_DB", os.path.join("data", "aiba.sqlite"))
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS projects (
+    id INTEGER PRIMARY KEY,
+    session_id TEXT UNIQUE NOT NULL,
+    client_name TEXT COLLATE NOCASE,
+    company_name TEXT COLLATE NOCASE,
+    project_topic TEXT,
+    project_context TEXT,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS projects_client ON projects (client_name COLLATE NOCASE);
+CREATE INDEX IF NOT EXISTS projects_company ON projects (company_name COLLATE NOCASE);
+
+CREATE TABLE IF NOT EXISTS turns (
+    id INTEGER PRIMARY KEY,
+    project_id INTEGER NOT NULL REFERENCES projects (id),
+    position INTEGER NOT NULL,
+    question TEXT,
+    answer TEXT NOT NULL,
+    created_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS turns_project ON turns (project_id, position);
+
+CREATE TABLE IF NOT EXISTS research (
+    id INTEGER PRIMARY KEY,
+    project_id INTEGER NOT NULL REFERENCES projects (id),
+    research TEXT NOT NULL,
+    model TEXT,
+    created_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS research_project ON research (project_id);
+
+CREATE TABLE IF NOT EXISTS brd_versions (
+    id INTEGER PRIMARY KEY,
+    project_id INTEGER NOT NULL REFERENCES projects (id),
+    version INTEGER NOT NULL,
+    content TEXT NOT NULL,
+    model TEXT,
+    md_filename TEXT,
+    created_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS brd_versions_project ON brd_versions (project_id, version);
+"""
+
+# External-content FTS5 tables, kept in sync by triggers
+FTS_SCHEMA = """
+CREATE VIRTUAL TABLE IF NOT EXISTS turns_fts USING fts5 (
+    question, answer, content='turns', content_rowid='id'
+);
+CREATE TRIGGER IF NOT EXISTS turns_fts_insert AFTER INSERT ON turns BEGIN
+    INSERT INTO turns_fts (rowid, question, answer) VALUES (new.id, new.question, new.answer);
+END;
+CREATE TRIGGER IF NOT EXISTS turns_fts_delete AFTER DELETE ON turns BEGIN
+    INSERT INTO turns_fts (turns_fts, rowid, question, answer) VALUES ('delete', old.id, old.question, old.answer);
+END;
+
+CREATE VIRTUAL TABLE IF NOT EXISTS brd_fts USING fts5 (
+    content, content='brd_versions', content_rowid='id'
+);
+CREATE TRIGGER IF NOT EXISTS brd_fts_insert AFTER INSERT ON brd_versions BEGIN
+    INSERT INTO brd_fts (rowid, content) VALUES (new.id, new.content);
+END;
+CREATE TRIGGER IF NOT EXISTS brd_fts_delete AFTER DELETE ON brd_versions BEGIN
+    INSERT INTO brd_fts (brd_fts, rowid, content) VALUES ('delete', old.id, old.content);
+END;
+"""
+
+
+def fts_query(text):
+    """Quote each word so user input can't break FTS5 query syntax"""
+    terms = [term.replace('"', '""') for term in text.split()]
+    return " ".join(f'"{term}"' for term in terms if term)
+
+
+def like_escape(text):
+    """Escape LIKE wildcards so user input matches literally (use with ESCAPE '\\')"""
+    return text.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+class BRDRepository:
+    """
+    Projects, turns, research and BRD versions in one SQLite database
+
+    Projects are keyed by session id and indexed on client and company name
+    (case-insensitive, so customer prefix lookups use the index). Answers and
+    BRD text are full-text indexed with FTS5 when SQLite provides it; without
+    FTS5, searches fall back to LIKE scans.
+    Helpers never raise: a repository problem is logged, not surfaced to
+    the user (writes return None, lookups and searches an empty list).
+    """
+
+    def __init__(self, db_path=REPOSITORY_DB_PATH):
+        self.db_path = db_path
+        self.fts_enabled = False
+        self._lock = threading.Lock()
+        self._db = None
+
+    def _connect(self):
+        if self._db is None:
+            directory = os.path.dirname(self.db_path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            db = sqlite3.connect(self.db_path, timeout=10, check_same_thread=False)
+            db.execute("PRAGMA journal_mode=WAL")
+            db.executescript(SCHEMA)
+            try:
+                db.executescript(FTS_SCHEMA)
+                self.fts_enabled = True
+            except sqlite3.OperationalError as e:
+                print(f"⚠️  SQLite FTS5 not available, search will be slower: {e}")
+            db.commit()
+            self._db = db
+        return self._db
+
+    def _write(self, sql_fn):
+        with self._lock:
+            try:
+                db = self._connect()
+                result = sql_fn(db)
+                db.commit()
+                return result
+            except sqlite3.Error as e:
+                if self._db is not None:
+                    self._db.rollback()
+                print(f"⚠️  Repository write failed: {e}")
+                return None
+
+    def _read(self, sql_fn):
+        with self._lock:
+            try:
+                return sql_fn(self._connect())
+            except sqlite3.Error as e:
+                print(f"⚠️  Repository query failed: {e}")
+                return []
+
+    def _project_id(self, db, session_id):
+        row = db.execute("SELECT id FROM projects WHERE session_id = ?", (session_id,)).fetchone()
+        return row[0] if row else None
+
+    def save_project(self, session):
+        """Create or update the project for a session, storing its research on creation"""
+        def save(db):
+            now = time.time()
+            project_id = self._project_id(db, session["session_id"])
+            if project_id is not None:
+                db.execute(
+                    "UPDATE projects SET client_name = ?, company_name = ?, project_topic = ?, "
+                    "project_context = ?, updated_at = ? WHERE id = ?",
+                    (session.get("client_name"), session.get("company_name"), session.get("project_topic"),
+                     session.get("project_context"), now, project_id)
+                )
+                return project_id
+
+            project_id = db.execute(
+                "INSERT INTO projects (session_id, client_name, company_name, project_topic, "
+                "project_context, created_at, updated_at) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (session["session_id"], session.get("client_name"), session.get("company_name"),
+                 session.get("project_topic"), session.get("project_context"), now, now)
+            ).lastrowid
+            if session.get("customer_research"):
+                db.execute(
+                    "INSERT INTO research (project_id, research, model, created_at) VALUES (?, ?, ?, ?)",
+                    (project_id, session["customer_research"], session.get("research_model"), now)
+                )
+            return project_id
+
+        return self._write(save)
+
+    def add_turn(self, session_id, question, answer):
+        """Append a question/answer turn to a session's project"""
+        def add(db):
+            project_id = self._project_id(db, session_id)
+            if project_id is None:
+                return None
+            position = db.execute(
+                "SELECT COALESCE(MAX(position), 0) + 1 FROM turns WHERE project_id = ?", (project_id,)
+            ).fetchone()[0]
+            db.execute(
+                "INSERT INTO turns (project_id, position, question, answer, created_at) VALUES (?, ?, ?, ?, ?)",
+                (project_id, position, question, answer, time.time())
+            )
+            return position
+
+        return self._write(add)
+
+    def add_brd_version(self, session_id, content, model=None, md_filename=None):
+        """Store a generated BRD as the next version for a session's project"""
+        def add(db):
+            project_id = self._project_id(db, session_id)
+            if project_id is None:
+                return None
+            version = db.execute(
+                "SELECT COALESCE(MAX(version), 0) + 1 FROM brd_versions WHERE project_id = ?", (project_id,)
+            ).fetchone()[0]
+            db.execute(
+                "INSERT INTO brd_versions (project_id, version, content, model, md_filename, created_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (project_id, version, content, model, md_filename, time.time())
+            )
+            return version
+
+        return self._write(add)
+
+    def find_projects(self, customer, limit=50):
+        """Projects whose client or company name starts with customer, newest first"""
+        pattern = f"{like_escape(customer)}%"
+
+        def find(db):
+            return db.execute(
+                "SELECT session_id, client_name, company_name, project_topic, created_at FROM projects "
+                "WHERE client_name LIKE ? ESCAPE '\\' OR company_name LIKE ? ESCAPE '\\' "
+                "ORDER BY created_at DESC LIMIT ?",
+                (pattern, pattern, limit)
+            ).fetchall()
+
+        return [
+            {"session_id": session_id, "client_name": client_name, "company_name": company_name,
+             "project_topic": project_topic, "created_at": created_at}
+            for session_id, client_name, company_name, project_topic, created_at in self._read(find)
+        ]
+
+    def search_brds(self, text, customer=None, limit=20):
+        """BRD versions mentioning text, optionally for one customer (client or company name prefix)"""
+        def search(db):
+            if self.fts_enabled:
+                sql = (
+                    "SELECT p.session_id, p.client_name, p.company_name, b.version, b.md_filename, b.created_at, "
+                    "snippet(brd_fts, 0, '[', ']', '…', 12) "
+                    "FROM brd_fts JOIN brd_versions b ON b.id = brd_fts.rowid JOIN projects p ON p.id = b.project_id "
+                    "WHERE brd_fts MATCH ?"
+                )
+                params = [fts_query(text)]
+                order = "brd_fts.rank"
+            else:
+                sql = (
+                    "SELECT p.session_id, p.client_name, p.company_name, b.version, b.md_filename, b.created_at, "
+                    "substr(b.content, 1, 200) "
+                    "FROM brd_versions b JOIN projects p ON p.id = b.project_id "
+                    "WHERE b.content LIKE ? ESCAPE '\\'"
+                )
+                params = [f"%{like_escape(text)}%"]
+                order = "b.created_at DESC"
+            sql, params = self._for_customer(sql, params, customer)
+            return db.execute(f"{sql} ORDER BY {order} LIMIT ?", params + [limit]).fetchall()
+
+        return [
+            {"session_id": session_id, "client_name": client_name, "company_name": company_name,
+             "version": version, "md_filename": md_filename, "created_at": created_at, "snippet": snippet}
+            for session_id, client_name, company_name, version, md_filename, created_at, snippet in self._read(search)
+        ]
+
+    def search_answers(self, text, customer=None, limit=20):
+        """Conversation turns whose question or answer mentions text"""
+        def search(db):
+            if self.fts_enabled:
+                sql = (
+                    "SELECT p.session_id, p.client_name, p.company_name, t.position, t.question, t.answer "
+                    "FROM turns_fts JOIN turns t ON t.id = turns_fts.rowid JOIN projects p ON p.id = t.project_id "
+                    "WHERE turns_fts MATCH ?"
+                )
+                params = [fts_query(text)]
+                order = "turns_fts.rank"
+            else:
+                sql = (
+                    "SELECT p.session_id, p.client_name, p.company_name, t.position, t.question, t.answer "
+                    "FROM turns t JOIN projects p ON p.id = t.project_id "
+                    "WHERE (t.answer LIKE ? ESCAPE '\\' OR t.question LIKE ? ESCAPE '\\')"
+                )
+                pattern = f"%{like_escape(text)}%"
+                params = [pattern, pattern]
+                order = "t.created_at DESC"
+            sql, params = self._for_customer(sql, params, customer)
+            return db.execute(f"{sql} ORDER BY {order} LIMIT ?", params + [limit]).fetchall()
+
+        return [
+            {"session_id": session_id, "client_name": client_name, "company_name": company_name,
+             "position": position, "question": question, "answer": answer}
+            for session_id, client_name, company_name, position, question, answer in self._read(search)
+        ]
+
+    def _for_customer(self, sql, params, customer):
+        if not customer:
+            return sql, params
+        pattern = f"{like_escape(customer)}%"
+        return (
+            f"{sql} AND (p.client_name LIKE ? ESCAPE '\\' OR p.company_name LIKE ? ESCAPE '\\')",
+            params + [pattern, pattern]
+        )
+
+
+# Shared repository instance
+brd_repository = BRDRepository()
@@ -0,0 +1,130 @@
+"""
+Conversation Summary Module
+Rolling summary of a discovery conversation, updated one exchange at a time
+"""
+from keyword_index import keyword_index
+from prompt_builder import prompt_builder, split_exchanges
+
+# Answers that mean the question was passed over
+SKIPPED_ANSWERS = ("skip", "done", "quit")
+
+
+class ExchangeView:
+    """
+    (question, answer) pairs of a conversation, read from the history on demand
+
+    Exchanges already folded into a summary are located by their start
+    offsets, so indexing one never re-walks the messages before it.
+    """
+
+    def __init__(self, conversation_history, starts, messages_seen):
+        self.history = conversation_history
+        self.starts = starts
+        self.messages_seen = messages_seen
+        # Messages not yet folded into the summary (normally none, or one pending question)
+        self.tail = split_exchanges(conversation_history[messages_seen:])
+
+    def __len__(self):
+        return len(self.starts) + len(self.tail)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        if index < 0 or index >= len(self):
+            raise IndexError("exchange index out of range")
+        if index >= len(self.starts):
+            return self.tail[index - len(self.starts)]
+        end = self.starts[index + 1] if index + 1 < len(self.starts) else self.messages_seen
+        return split_exchanges(self.history[self.starts[index]:end])[0]
+
+
+class ConversationSummary:
+    """
+    Condensed lines, answered exchanges and keyword coverage of a conversation
+
+    update() folds in only the exchanges completed since the last call, so
+    keeping the summary current costs the same on turn 50 as on turn 2.
+    A question still waiting for its answer is left for the next update.
+    The state is a plain dict (to_dict/from_dict) so it can live in a session.
+    """
+
+    def __init__(self, messages_seen=0, starts=None, lines=None, answered=None, keyword_hits=None):
+        self.messages_seen = messages_seen
+        self.starts = list(starts or [])
+        self.lines = list(lines or [])
+        self.answered = list(answered or [])
+        self.keyword_hits = {section: set(hits) for section, hits in (keyword_hits or {}).items()}
+
+    @classmethod
+    def from_dict(cls, state):
+        if not state:
+            return cls()
+        return cls(
+            messages_seen=state.get("messages_seen", 0),
+            starts=state.get("starts"),
+            lines=state.get("lines"),
+            answered=state.get("answered"),
+            keyword_hits=state.get("keyword_hits")
+        )
+
+    def to_dict(self):
+        return {
+            "messages_seen": self.messages_seen,
+            "starts": list(self.starts),
+            "lines": list(self.lines),
+            "answered": list(self.answered),
+            "keyword_hits": {section: sorted(hits) for section, hits in self.keyword_hits.items()}
+        }
+
+    def update(self, conversation_history):
+        """Fold in exchanges completed since the last update; returns how many were added"""
+        if len(conversation_history) < self.messages_seen:
+            # History was replaced (e.g. a client resent a shorter one); start over
+            self.__init__()
+
+        added = 0
+        index = self.messages_seen
+        while index < len(conversation_history):
+            msg = conversation_history[index]
+            if msg.get("role") == "assistant":
+                if index + 1 >= len(conversation_history):
+                    break
+                following = conversation_history[index + 1]
+                if following.get("role") == "user":
+                    question, answer, end = msg.get("content", ""), following.get("content", ""), index + 2
+                else:
+                    question, answer, end = msg.get("content", ""), None, index + 1
+            else:
+                question, answer, end = None, msg.get("content", ""), index + 1
+
+            self._fold(index, question, answer)
+            index = end
+            added += 1
+
+        self.messages_seen = index
+        return added
+
+    def _fold(self, start, question, answer):
+        exchange_index = len(self.starts)
+        self.starts.append(start)
+        self.lines.append(prompt_builder.condense_exchange(question, answer))
+        if question is not None and answer is not None and answer.strip().lower() not in SKIPPED_ANSWERS:
+            self.answered.append(exchange_index)
+
+        section_hits = keyword_index.scan(f"{question or ''}\n{answer or ''}")["section_hits"]
+        for section, hits in section_hits.items():
+            self.keyword_hits.setdefault(section, set()).update(hits)
+
+    def exchanges(self, conversation_history):
+        """Every exchange of conversation_history, without re-walking the folded part"""
+        return ExchangeView(conversation_history, self.starts, self.messages_seen)
+
+    def questions_answered(self, conversation_history):
+        """Answered exchanges, in the extract_conversation_summary format"""
+        view = self.exchanges(conversation_history)
+        return [
+            {"question": question, "answer": answer}
+            for question, answer in (view[index] for index in self.answered)
+        ]
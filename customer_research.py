@@ -2,18 +2,41 @@
 Customer Research Module
 Performs deep research on customers to gather context
 """
-import os
-from groq import Groq
 from dotenv import load_dotenv
+from llm_client import complete_text, LLMUnavailableError
+from research_cache import research_cache
+from prompt_builder import prompt_builder, QUESTION_PROMPT_BUDGET_TOKENS
 
 load_dotenv()
 
-api_key = os.getenv("GROQ_API_KEY") or os.getenv("GROQ_API")
-client = Groq(api_key=api_key) if api_key else Groq()
+QUESTION_MAX_TOKENS = 100
+QUESTION_SYSTEM_PROMPT = "You are a senior consultant at a top-tier MBB firm (McKinsey, Bain, or BCG). You have an MBA from a top business school and specialize in strategic consulting and AI/ML solutions.\n\nCRITICAL RULES:\n- You have access to company research - DO NOT ask questions about company information (industry, size, business model, products, services, market position)\n- Focus ONLY on PROJECT-specific questions: project objectives, requirements, use cases, technical needs, constraints, success criteria\n- Your questioning style is:\n  * Strategic and hypothesis-driven\n  * Focused on PROJECT requirements and business impact\n  * Structured and methodical (MECE framework)\n  * Direct and professional\n  * Project-specific and actionable\n\nYou ask ONE direct, project-focused question at a time. No acknowledgments, no filler words, no explanations. Just the strategic question about the PROJECT."
 
-models_to_try = ["llama-3.1-70b-versatile", "llama-3.1-8b-instant", "mixtral-8x7b-32768", "gemma2-9b-it"]
-
-def research_customer(customer_name, company_name=None):
+def research_customer(customer_name, company_name=None, use_cache=True):
+    """
+    Research customer to gather context and background information
+    
+    Results are cached per normalised customer/company pair, so repeat
+    sessions for the same client start instantly. Stale entries are served
+    and refreshed in the background.
+    """
+    if use_cache:
+        cached = research_cache.get(customer_name, company_name)
+        if cached:
+            if cached["stale"]:
+                research_cache.refresh_in_background(customer_name, company_name, run_customer_research)
+            print(f"⚡ Using cached research for {customer_name}")
+            return cached["research"], cached["model"]
+    
+    research_result, model_name = run_customer_research(customer_name, company_name)
+    if research_result and use_cache:
+        try:
+            research_cache.put(customer_name, company_name, research_result, model_name)
+        except OSError as e:
+            print(f"⚠️  Could not cache research: {e}")
+    return research_result, model_name
+
+def run_customer_research(customer_name, company_name=None):
     """
     Research customer to gather context and background information
     Uses AI to synthesize information about the customer
@@ -38,76 +61,43 @@ Provide detailed, actionable insights that will help in consultative discovery c
 Format the research in a clear, structured way.
 """
         
-        # Try different models
-        for model_name in models_to_try:
-            try:
-                response = client.chat.completions.create(
-                    model=model_name,
-                    messages=[
-                        {
-                            "role": "system",
-                            "content": "You are a senior research analyst at a top-tier MBB consulting firm (McKinsey, Bain, or BCG). You have an MBA from a top business school and specialize in strategic business analysis. Your research is structured, hypothesis-driven, and focuses on actionable insights. You understand business models, competitive dynamics, and strategic initiatives. Provide comprehensive, strategic research that enables consultative discovery."
-                        },
-                        {
-                            "role": "user",
-                            "content": research_prompt
-                        }
-                    ],
-                    temperature=0.7,
-                    max_tokens=2000
-                )
-                research_result = response.choices[0].message.content
-                return research_result, model_name
-            except Exception as e:
-                continue
-        
-        return None, None
+        # Route to the first healthy model
+        try:
+            research_result, model_name = complete_text(
+                [
+                    {
+                        "role": "system",
+                        "content": "You are a senior research analyst at a top-tier MBB consulting firm (McKinsey, Bain, or BCG). You have an MBA from a top business school and specialize in strategic business analysis. Your research is structured, hypothesis-driven, and focuses on actionable insights. You understand business models, competitive dynamics, and strategic initiatives. Provide comprehensive, strategic research that enables consultative discovery."
+                    },
+                    {
+                        "role": "user",
+                        "content": research_prompt
+                    }
+                ],
+                task="research_customer",
+                temperature=0.7,
+                max_tokens=2000
+            )
+            return research_result, model_name
+        except LLMUnavailableError:
+            return None, None
     except Exception as e:
         print(f"Error in customer research: {e}")
         return None, None
 
-def generate_adaptive_question(conversation_history, customer_research, phase="discovery", project_topic=""):
-    """
-    Generate adaptive, consultative questions based on conversation history and customer research
-    
-    Phases:
-    - discovery: Initial exploratory questions
-    - consultative: Deep-dive questions based on answers
-    - technical: Technical requirements (hosting, tech stack, integrations)
-    """
-    try:
-        # Build context from conversation
-        conversation_summary = ""
-        if conversation_history:
-            recent_exchanges = conversation_history[-6:]  # Last 3 Q&A pairs
-            conversation_summary = "\n".join([
-                f"{msg['role']}: {msg['content']}" 
-                for msg in recent_exchanges
-            ])
-        
-        # Extract project context from conversation if available, or use provided project_topic
-        project_context = project_topic if project_topic else ""
-        if not project_context and conversation_history:
-            # Look for initial project topic in early messages
-            for msg in conversation_history[:4]:
-                if msg.get('role') == 'user' and msg.get('content'):
-                    content = msg.get('content', '').lower()
-                    if any(keyword in content for keyword in ['project', 'solution', 'system', 'application', 'platform']):
-                        project_context = msg.get('content', '')
-                        break
-        
-        # Phase-specific prompts - MBB consulting style
-        if phase == "discovery":
-            prompt = f"""
+def build_question_prompt(phase, research_text, project_context, conversation_summary):
+    """Phase-specific question prompt - MBB consulting style"""
+    if phase == "discovery":
+        prompt = f"""
 You are a senior consultant at a top MBB firm (McKinsey, Bain, or BCG). You're conducting a strategic discovery session to gather requirements for an AI/ML PROJECT.
 
 IMPORTANT CONTEXT - Company Information (DO NOT ask about these - they're already known):
-{customer_research if customer_research else "No research available"}
+{research_text if research_text else "No research available"}
 
 Initial Project Context (if provided):
 {project_context if project_context else "To be discovered"}
 
-Recent Conversation:
+Conversation So Far:
 {conversation_summary if conversation_summary else "Starting discovery"}
 
 CRITICAL INSTRUCTIONS:
@@ -124,14 +114,14 @@ QUESTION CATEGORIES TO COVER (prioritize what hasn't been asked):
 
 Ask ONE strategic, project-focused question from these categories. Output ONLY the question. No preamble.
 """
-        elif phase == "consultative":
-            prompt = f"""
+    elif phase == "consultative":
+        prompt = f"""
 You are a senior MBB consultant conducting a deep-dive session on the PROJECT requirements.
 
 Company Context (for reference only - DO NOT ask about this):
-{customer_research[:500] if customer_research else ""}
+{research_text}
 
-Recent Conversation:
+Conversation So Far:
 {conversation_summary}
 
 CRITICAL INSTRUCTIONS:
@@ -148,14 +138,14 @@ QUESTION CATEGORIES TO DIVE DEEPER INTO (prioritize what needs clarification):
 
 Use the "5 Whys" technique or hypothesis testing to probe deeper. Output ONLY the question. Be strategic and project-focused.
 """
-        elif phase == "technical":
-            prompt = f"""
+    elif phase == "technical":
+        prompt = f"""
 You are a senior MBB consultant specializing in AI/ML solutions. Ask ONE technical question about THIS PROJECT's requirements.
 
 Company Context (for reference only):
-{customer_research[:300] if customer_research else ""}
+{research_text}
 
-Recent Conversation:
+Conversation So Far:
 {conversation_summary}
 
 CRITICAL INSTRUCTIONS:
@@ -216,59 +206,90 @@ TECHNICAL QUESTION CATEGORIES (prioritize what hasn't been covered for THIS PROJ
 
 Ask ONE direct, project-specific technical question from these categories. No preamble.
 """
-        else:
-            prompt = f"""
+    else:
+        prompt = f"""
 Based on the conversation, ask a relevant follow-up question.
 {conversation_summary}
 """
+    
+    return prompt
+
+def generate_adaptive_question(conversation_history, customer_research, phase="discovery", project_topic="", summary=None):
+    """
+    Generate adaptive, consultative questions based on conversation history and customer research
+    
+    summary: the session's ConversationSummary; earlier exchanges are taken
+    from it instead of being re-read from the history
+    
+    Phases:
+    - discovery: Initial exploratory questions
+    - consultative: Deep-dive questions based on answers
+    - technical: Technical requirements (hosting, tech stack, integrations)
+    """
+    try:
+        # Extract project context from conversation if available, or use provided project_topic
+        project_context = project_topic if project_topic else ""
+        if not project_context and conversation_history:
+            # Look for initial project topic in early messages
+            for msg in conversation_history[:4]:
+                if msg.get('role') == 'user' and msg.get('content'):
+                    content = msg.get('content', '').lower()
+                    if any(keyword in content for keyword in ['project', 'solution', 'system', 'application', 'platform']):
+                        project_context = msg.get('content', '')
+                        break
         
-        # Get AI response
-        for model_name in models_to_try:
-            try:
-                response = client.chat.completions.create(
-                    model=model_name,
-                    messages=[
-                        {
-                            "role": "system",
-                            "content": "You are a senior consultant at a top-tier MBB firm (McKinsey, Bain, or BCG). You have an MBA from a top business school and specialize in strategic consulting and AI/ML solutions.\n\nCRITICAL RULES:\n- You have access to company research - DO NOT ask questions about company information (industry, size, business model, products, services, market position)\n- Focus ONLY on PROJECT-specific questions: project objectives, requirements, use cases, technical needs, constraints, success criteria\n- Your questioning style is:\n  * Strategic and hypothesis-driven\n  * Focused on PROJECT requirements and business impact\n  * Structured and methodical (MECE framework)\n  * Direct and professional\n  * Project-specific and actionable\n\nYou ask ONE direct, project-focused question at a time. No acknowledgments, no filler words, no explanations. Just the strategic question about the PROJECT."
-                        },
-                        {
-                            "role": "user",
-                            "content": prompt
-                        }
-                    ],
-                    temperature=0.7,
-                    max_tokens=100
-                )
-                question = response.choices[0].message.content.strip()
-                # Clean up: remove quotes, acknowledgments, and ensure it's just the question
-                question = question.strip('"').strip("'")
-                # Remove common filler phrases
-                filler_phrases = [
-                    "Thank you for that.",
-                    "Thanks for sharing.",
-                    "I understand.",
-                    "Got it.",
-                    "That's helpful.",
-                    "Let me ask",
-                    "I'd like to know",
-                    "Can you tell me",
-                    "I'm curious about"
-                ]
-                for phrase in filler_phrases:
-                    if question.lower().startswith(phrase.lower()):
-                        question = question[len(phrase):].strip()
-                        # Remove leading punctuation
-                        question = question.lstrip(',:;. ')
-                
-                # Ensure it ends with ?
-                if not question.endswith('?'):
-                    question += "?"
-                return question, model_name
-            except Exception as e:
-                continue
+        def build_messages(model_name):
+            # Research and conversation share the model's budget; research is background
+            # only after discovery, so it gets a smaller slice then
+            budget = prompt_builder.budget_for(model_name, reserve_tokens=QUESTION_MAX_TOKENS, ceiling=QUESTION_PROMPT_BUDGET_TOKENS)
+            research_share = 3 if phase == "discovery" else 10
+            research_text = prompt_builder.fit_text(customer_research or "", budget // research_share)
+            messages = [
+                {"role": "system", "content": QUESTION_SYSTEM_PROMPT},
+                {"role": "user", "content": build_question_prompt(phase, research_text, project_context, "")}
+            ]
+            conversation_summary = prompt_builder.transcript(
+                conversation_history, budget - prompt_builder.count_messages(messages), summary
+            )
+            messages[1]["content"] = build_question_prompt(phase, research_text, project_context, conversation_summary)
+            return messages
         
-        return None, None
+        # Get AI response from the first healthy model
+        try:
+            raw_question, model_name = complete_text(
+                build_messages,
+                task="adaptive_question",
+                temperature=0.7,
+                max_tokens=QUESTION_MAX_TOKENS
+            )
+        except LLMUnavailableError:
+            return None, None
+
+        question = raw_question.strip()
+        # Clean up: remove quotes, acknowledgments, and ensure it's just the question
+        question = question.strip('"').strip("'")
+        # Remove common filler phrases
+        filler_phrases = [
+            "Thank you for that.",
+            "Thanks for sharing.",
+            "I understand.",
+            "Got it.",
+            "That's helpful.",
+            "Let me ask",
+            "I'd like to know",
+            "Can you tell me",
+            "I'm curious about"
+        ]
+        for phrase in filler_phrases:
+            if question.lower().startswith(phrase.lower()):
+                question = question[len(phrase):].strip()
+                # Remove leading punctuation
+                question = question.lstrip(',:;. ')
+        
+        # Ensure it ends with ?
+        if not question.endswith('?'):
+            question += "?"
+        return question, model_name
     except Exception as e:
         print(f"Error generating adaptive question: {e}")
         return None, None
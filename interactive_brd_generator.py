@@ -1,30 +1,24 @@
 import os
-from groq import Groq
 from dotenv import load_dotenv
 import json
 from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+from llm_client import complete_text, stream_text
+from tracing import in_current_context
+from token_ledger import token_ledger
 
-# PDF generation imports
-try:
-    import markdown
-    PDF_SUPPORT = True
-except ImportError:
-    PDF_SUPPORT = False
-
-# WeasyPrint import is done inside the function to handle system library issues gracefully
+# PDF rendering lives in brd_renderer so render workers don't load the LLM client
+from brd_renderer import PDF_SUPPORT, markdown_to_html, save_brd_pdf
+from artifact_store import artifact_store, new_artifact_stem
+from prompt_builder import prompt_builder, BRD_PROMPT_BUDGET_TOKENS
 
 # Load your secret API key from the .env file
 load_dotenv()
 
-# Initialize Groq API client
-api_key = os.getenv("GROQ_API_KEY") or os.getenv("GROQ_API")
-client = Groq(api_key=api_key) if api_key else Groq()
-
-# Groq models to try
-models_to_try = ["llama-3.1-70b-versatile", "llama-3.1-8b-instant", "mixtral-8x7b-32768", "gemma2-9b-it"]
+CHAT_MAX_TOKENS = 2000
 
-def get_ai_response(prompt, conversation_history=None, model=None):
-    """Get response from Groq AI model"""
+def build_chat_messages(prompt, conversation_history=None):
+    """Build the chat messages (persona, history, prompt) sent to the model"""
     messages = []
     
     # Add system message - MBB consultant persona
@@ -40,22 +34,24 @@ def get_ai_response(prompt, conversation_history=None, model=None):
     # Add current user prompt
     messages.append({"role": "user", "content": prompt})
     
-    # Try models until one works
-    for model_name in (models_to_try if model is None else [model]):
-        try:
-            response = client.chat.completions.create(
-                model=model_name,
-                messages=messages,
-                temperature=0.7,
-                max_tokens=2000
-            )
-            return response.choices[0].message.content, model_name
-        except Exception as e:
-            if model is not None:
-                raise e
-            continue
-    
-    raise Exception("Could not get response from any model")
+    return messages
+
+def get_ai_response(prompt, conversation_history=None, model=None):
+    """Get response from Groq AI model"""
+    def build_messages(model_name):
+        # Older turns are condensed so the history fits this model's budget
+        budget = prompt_builder.budget_for(model_name, reserve_tokens=CHAT_MAX_TOKENS)
+        history_budget = budget - prompt_builder.count_messages(build_chat_messages(prompt))
+        return build_chat_messages(prompt, prompt_builder.fit_history(conversation_history, history_budget))
+    
+    # Route to the first healthy model (or only the requested one)
+    return complete_text(
+        build_messages,
+        task="chat",
+        models=None if model is None else [model],
+        temperature=0.7,
+        max_tokens=CHAT_MAX_TOKENS
+    )
 
 def extract_conversation_summary(conversation_history):
     """Extract key information from conversation history"""
@@ -77,61 +73,9 @@ def extract_conversation_summary(conversation_history):
     
     return summary
 
-def generate_brd(conversation_history, project_context):
-    """Generate comprehensive BRD from conversation history"""
-    print("\n" + "="*70)
-    print("📄 Generating Business Requirements Document (BRD)...")
-    print("="*70 + "\n")
-    
-    # Extract conversation summary
-    conversation_summary = extract_conversation_summary(conversation_history)
-    
-    # Parse project context
-    context_lines = project_context.strip().split('\n')
-    client_name = ""
-    company_name = ""
-    project_topic = ""
-    project_date = datetime.now().strftime("%B %d, %Y")
-    
-    for line in context_lines:
-        if "Client:" in line:
-            client_name = line.split("Client:")[-1].strip()
-        elif "Company:" in line:
-            company_name = line.split("Company:")[-1].strip()
-        elif "Project Topic:" in line:
-            project_topic = line.split("Project Topic:")[-1].strip()
-        elif "Date:" in line:
-            project_date = line.split("Date:")[-1].strip()
-    
-    # Create a comprehensive prompt for BRD generation - MBB consulting style
-    brd_prompt = f"""
-You are a senior consultant at a top-tier MBB firm (McKinsey, Bain, or BCG) creating a comprehensive Business Requirements Document (BRD) for an AI/ML solution project. You have an MBA from a top business school and specialize in strategic consulting and AI/ML implementations.
-
-PROJECT INFORMATION:
-- Client: {client_name}
-- Company: {company_name}
-- Project: {project_topic}
-- Document Date: {project_date}
-
-CONVERSATION SUMMARY:
-{chr(10).join(conversation_summary['key_points'])}
-
-CONVERSATION DETAILS:
-{json.dumps(conversation_history, indent=2)}
-
-INSTRUCTIONS:
-Create a comprehensive, professional BRD document following MBB consulting methodology:
-1. **Strategic Focus**: Emphasize business impact, value creation, and ROI
-2. **Structured Thinking**: Use MECE (Mutually Exclusive, Collectively Exhaustive) framework
-3. **Data-Driven**: Include measurable success criteria and KPIs
-4. **AI/ML Specific**: Include detailed technical requirements for AI/ML solutions (data infrastructure, model requirements, deployment, monitoring, etc.)
-5. **Professional**: Use proper markdown formatting with headers, subheaders, bullet points, and tables
-6. **Complete**: Fill all sections with actual information from the conversation; use "To be determined" only when necessary
-7. **Actionable**: Ensure requirements are specific, measurable, and implementable
-
-BRD STRUCTURE (create this exact structure):
-
-# BUSINESS REQUIREMENTS DOCUMENT (BRD)
+# BRD structure, one template per section (filled with str.format)
+BRD_SECTIONS = [
+    ("document_information", """# BUSINESS REQUIREMENTS DOCUMENT (BRD)
 
 ## Document Information
 - **Document Title:** Business Requirements Document
@@ -141,11 +85,8 @@ BRD STRUCTURE (create this exact structure):
 - **Document Version:** 1.0
 - **Date:** {project_date}
 - **Prepared By:** AIBA (AI Business Analyst)
-- **Status:** Draft
-
----
-
-## 1. EXECUTIVE SUMMARY
+- **Status:** Draft"""),
+    ("executive_summary", """## 1. EXECUTIVE SUMMARY
 
 ### 1.1 Project Overview
 [Provide a comprehensive overview of the project, its purpose, and what it aims to achieve]
@@ -157,11 +98,8 @@ BRD STRUCTURE (create this exact structure):
 [Detail the expected benefits and value proposition]
 
 ### 1.4 Key Highlights
-[Summarize the most important aspects of the project]
-
----
-
-## 2. PROJECT BACKGROUND
+[Summarize the most important aspects of the project]"""),
+    ("project_background", """## 2. PROJECT BACKGROUND
 
 ### 2.1 Client Information
 - **Client Name:** {client_name}
@@ -178,11 +116,8 @@ BRD STRUCTURE (create this exact structure):
 [Explain what is driving the need for this project]
 
 ### 2.5 Project Justification
-[Explain why this project is necessary and what it will achieve]
-
----
-
-## 3. STAKEHOLDERS
+[Explain why this project is necessary and what it will achieve]"""),
+    ("stakeholders", """## 3. STAKEHOLDERS
 
 ### 3.1 Primary Stakeholders
 [List and describe primary stakeholders, their roles, and interests]
@@ -194,11 +129,8 @@ BRD STRUCTURE (create this exact structure):
 [Define roles and responsibilities for each stakeholder group]
 
 ### 3.4 Stakeholder Engagement Plan
-[Outline how stakeholders will be engaged throughout the project]
-
----
-
-## 4. BUSINESS OBJECTIVES
+[Outline how stakeholders will be engaged throughout the project]"""),
+    ("business_objectives", """## 4. BUSINESS OBJECTIVES
 
 ### 4.1 Primary Objectives
 [Numbered list of primary business objectives]
@@ -210,11 +142,8 @@ BRD STRUCTURE (create this exact structure):
 [Define measurable success criteria for the project]
 
 ### 4.4 Expected Outcomes
-[Describe expected outcomes and deliverables]
-
----
-
-## 5. FUNCTIONAL REQUIREMENTS
+[Describe expected outcomes and deliverables]"""),
+    ("functional_requirements", """## 5. FUNCTIONAL REQUIREMENTS
 
 ### 5.1 Core Features
 [Detailed list of core features and functionalities required]
@@ -229,11 +158,8 @@ BRD STRUCTURE (create this exact structure):
 [Describe key business processes that need to be supported]
 
 ### 5.5 Use Cases
-[Document key use cases and scenarios]
-
----
-
-## 6. NON-FUNCTIONAL REQUIREMENTS
+[Document key use cases and scenarios]"""),
+    ("non_functional_requirements", """## 6. NON-FUNCTIONAL REQUIREMENTS
 
 ### 6.1 Performance Requirements
 [Specify performance requirements: response times, throughput, capacity]
@@ -254,11 +180,8 @@ BRD STRUCTURE (create this exact structure):
 [Define user experience and usability requirements]
 
 ### 6.7 Reliability and Availability
-[Specify uptime requirements, backup, disaster recovery]
-
----
-
-## 7. AI/ML TECHNICAL REQUIREMENTS
+[Specify uptime requirements, backup, disaster recovery]"""),
+    ("technical_requirements", """## 7. AI/ML TECHNICAL REQUIREMENTS
 
 ### 7.1 Data Infrastructure
 [Specify data requirements for AI/ML solution]
@@ -327,64 +250,52 @@ BRD STRUCTURE (create this exact structure):
 - **Compute Costs**: [Expected compute costs, budget constraints]
 - **Storage Costs**: [Data storage costs]
 - **Team Capabilities**: [Required team skills: data scientists, ML engineers, DevOps]
-- **Training Requirements**: [Training needs for client team]
-
----
-
-## 8. SCOPE
+- **Training Requirements**: [Training needs for client team]"""),
+    ("scope", """## 8. SCOPE
 
-### 7.1 In Scope
+### 8.1 In Scope
 [Clearly define what is included in the project scope]
 
-### 7.2 Out of Scope
+### 8.2 Out of Scope
 [Explicitly state what is NOT included]
 
-### 7.3 Assumptions
+### 8.3 Assumptions
 [List assumptions made during requirements gathering]
 
-### 7.4 Constraints
+### 8.4 Constraints
 [Document constraints: budget, time, resources, technical limitations]
 
-### 7.5 Dependencies
-[Identify dependencies on other projects, systems, or resources]
-
----
+### 8.5 Dependencies
+[Identify dependencies on other projects, systems, or resources]"""),
+    ("timeline", """## 9. TIMELINE & MILESTONES
 
-## 8. TIMELINE & MILESTONES
-
-### 8.1 Project Timeline
+### 9.1 Project Timeline
 [Provide overall project timeline]
 
-### 8.2 Key Milestones
+### 9.2 Key Milestones
 [Table or list of key milestones with dates]
 
 | Milestone | Description | Target Date | Status |
 |-----------|-------------|-------------|--------|
 | [Milestone 1] | [Description] | [Date] | [Status] |
 
-### 8.3 Phases
-[Break down project into phases if applicable]
-
----
-
-## 10. RISKS & MITIGATION
+### 9.3 Phases
+[Break down project into phases if applicable]"""),
+    ("risks", """## 10. RISKS & MITIGATION
 
-### 9.1 Identified Risks
+### 10.1 Identified Risks
 [Table of identified risks]
 
 | Risk ID | Risk Description | Impact | Probability | Mitigation Strategy |
 |---------|------------------|--------|-------------|---------------------|
 | R1 | [Risk] | [High/Medium/Low] | [High/Medium/Low] | [Strategy] |
 
-### 9.2 Risk Mitigation Strategies
+### 10.2 Risk Mitigation Strategies
 [Detailed mitigation strategies for each risk]
 
-### 9.3 Contingency Plans
-[Contingency plans for high-impact risks]
-
----
-
-## 11. SUCCESS METRICS
+### 10.3 Contingency Plans
+[Contingency plans for high-impact risks]"""),
+    ("success_metrics", """## 11. SUCCESS METRICS
 
 ### 11.1 Key Performance Indicators (KPIs)
 [Define KPIs to measure project success]
@@ -397,11 +308,8 @@ BRD STRUCTURE (create this exact structure):
 [How success will be measured and evaluated]
 
 ### 11.3 Acceptance Criteria
-[Define acceptance criteria for project deliverables]
-
----
-
-## 12. APPENDICES
+[Define acceptance criteria for project deliverables]"""),
+    ("appendices", """## 12. APPENDICES
 
 ### 12.1 Glossary
 [Define key terms and acronyms]
@@ -414,7 +322,115 @@ BRD STRUCTURE (create this exact structure):
 
 | Version | Date | Author | Changes |
 |---------|------|--------|---------|
-| 1.0 | {project_date} | AIBA | Initial version |
+| 1.0 | {project_date} | AIBA | Initial version |""")
+]
+
+# Section groups generated concurrently in parallel mode.
+# Keywords pick out the Q&A pairs each group actually needs.
+BRD_SECTION_GROUPS = [
+    {
+        "name": "background",
+        "sections": ["project_background", "stakeholders"],
+        "keywords": ["current", "process", "problem", "challenge", "pain", "manual", "today", "stakeholder", "user", "team", "department", "role", "owner", "sponsor", "customer"]
+    },
+    {
+        "name": "objectives",
+        "sections": ["business_objectives", "functional_requirements"],
+        "keywords": ["objective", "goal", "outcome", "roi", "impact", "benefit", "saving", "revenue", "feature", "function", "workflow", "use case", "rule", "capabilit", "automat", "report"]
+    },
+    {
+        "name": "non_functional",
+        "sections": ["non_functional_requirements"],
+        "keywords": ["performance", "response time", "latency", "security", "access", "scal", "volume", "compliance", "regulat", "gdpr", "integrat", "availab", "uptime", "backup", "usab"]
+    },
+    {
+        "name": "technical",
+        "sections": ["technical_requirements"],
+        "keywords": ["data", "model", "accuracy", "train", "deploy", "cloud", "aws", "azure", "gcp", "premise", "api", "integrat", "sap", "erp", "crm", "gpu", "pipeline", "monitor", "mlops", "infrastructure"]
+    },
+    {
+        "name": "delivery",
+        "sections": ["scope", "timeline", "risks"],
+        "keywords": ["scope", "include", "exclude", "assum", "constraint", "budget", "depend", "timeline", "deadline", "milestone", "phase", "month", "week", "quarter", "launch", "risk", "concern"]
+    },
+    {
+        "name": "success",
+        "sections": ["success_metrics", "appendices"],
+        "keywords": ["kpi", "metric", "measure", "success", "target", "accept", "baseline", "%", "term", "acronym"]
+    }
+]
+
+# BRD generation mode: "single" (one call for the whole document) or "parallel" (section groups)
+BRD_GENERATION_MODE = os.getenv("AIBA_BRD_MODE", "single")
+BRD_SECTION_MAX_TOKENS = int(os.getenv("AIBA_BRD_SECTION_MAX_TOKENS", "1500"))
+
+BRD_INSTRUCTIONS = """INSTRUCTIONS:
+Create a comprehensive, professional BRD document following MBB consulting methodology:
+1. **Strategic Focus**: Emphasize business impact, value creation, and ROI
+2. **Structured Thinking**: Use MECE (Mutually Exclusive, Collectively Exhaustive) framework
+3. **Data-Driven**: Include measurable success criteria and KPIs
+4. **AI/ML Specific**: Include detailed technical requirements for AI/ML solutions (data infrastructure, model requirements, deployment, monitoring, etc.)
+5. **Professional**: Use proper markdown formatting with headers, subheaders, bullet points, and tables
+6. **Complete**: Fill all sections with actual information from the conversation; use "To be determined" only when necessary
+7. **Actionable**: Ensure requirements are specific, measurable, and implementable"""
+
+def parse_project_context(project_context):
+    """Pull client, company, topic and date out of the project context block"""
+    brd_info = {
+        "client_name": "",
+        "company_name": "",
+        "project_topic": "",
+        "project_date": datetime.now().strftime("%B %d, %Y")
+    }
+    
+    for line in project_context.strip().split('\n'):
+        if "Client:" in line:
+            brd_info["client_name"] = line.split("Client:")[-1].strip()
+        elif "Company:" in line:
+            brd_info["company_name"] = line.split("Company:")[-1].strip()
+        elif "Project Topic:" in line:
+            brd_info["project_topic"] = line.split("Project Topic:")[-1].strip()
+        elif "Date:" in line:
+            brd_info["project_date"] = line.split("Date:")[-1].strip()
+    
+    return brd_info
+
+def render_brd_sections(brd_info, section_keys=None):
+    """Render BRD section templates (all of them by default) in document order"""
+    templates = dict(BRD_SECTIONS)
+    keys = section_keys if section_keys else [key for key, _ in BRD_SECTIONS]
+    return "\n\n---\n\n".join(templates[key].format(**brd_info) for key in keys)
+
+# Marks where the conversation goes once the rest of the prompt is measured
+CONVERSATION_PLACEHOLDER = "{{CONVERSATION}}"
+
+def build_brd_prompt(conversation_history, project_context, model_name=None, summary=None):
+    """
+    Build the full BRD generation prompt from the conversation and project context
+    
+    summary: the session's ConversationSummary, if it has one
+    """
+    # Parse project context
+    brd_info = parse_project_context(project_context)
+    
+    # Create a comprehensive prompt for BRD generation - MBB consulting style
+    brd_prompt = f"""
+You are a senior consultant at a top-tier MBB firm (McKinsey, Bain, or BCG) creating a comprehensive Business Requirements Document (BRD) for an AI/ML solution project. You have an MBA from a top business school and specialize in strategic consulting and AI/ML implementations.
+
+PROJECT INFORMATION:
+- Client: {brd_info['client_name']}
+- Company: {brd_info['company_name']}
+- Project: {brd_info['project_topic']}
+- Document Date: {brd_info['project_date']}
+
+CONVERSATION:
+{CONVERSATION_PLACEHOLDER}
+
+{BRD_INSTRUCTIONS}
+
+BRD STRUCTURE (create this exact structure):
+
+{render_brd_sections(brd_info)}
 
 ---
 
@@ -423,192 +439,241 @@ BRD STRUCTURE (create this exact structure):
 Now create the complete BRD following this structure exactly. Fill in all sections with detailed, specific information from the conversation. Make it professional and comprehensive.
 """
     
-    try:
-        print("🔄 Processing conversation and generating BRD...")
-        brd_content, model_used = get_ai_response(brd_prompt, model="llama-3.1-70b-versatile")
-        print(f"✅ BRD generated successfully using model: {model_used}")
-        return brd_content, model_used
-    except Exception as e:
-        print(f"⚠️  Error with primary model, trying alternative...")
-        try:
-            brd_content, model_used = get_ai_response(brd_prompt)
-            print(f"✅ BRD generated successfully using model: {model_used}")
-            return brd_content, model_used
-        except Exception as e2:
-            print(f"❌ Error generating BRD: {e2}")
-            return None, None
+    # The conversation gets whatever the model's budget leaves after the template
+    budget = prompt_builder.budget_for(model_name, reserve_tokens=CHAT_MAX_TOKENS, ceiling=BRD_PROMPT_BUDGET_TOKENS)
+    conversation_budget = budget - prompt_builder.count_messages(build_chat_messages(brd_prompt))
+    conversation_text = prompt_builder.transcript(conversation_history, conversation_budget, summary)
+    return brd_prompt.replace(CONVERSATION_PLACEHOLDER, conversation_text or "No discovery answers recorded.")
 
+def select_relevant_exchanges(questions_answered, keywords, always_include=2):
+    """
+    Pick the Q&A pairs that matter to a section group
+    
+    The opening exchanges are always kept because they frame the project;
+    short conversations are passed through whole.
+    """
+    if len(questions_answered) <= always_include * 2:
+        return questions_answered
+    
+    relevant = []
+    for index, qa in enumerate(questions_answered):
+        text = f"{qa['question']} {qa['answer']}".lower()
+        if index < always_include or any(keyword in text for keyword in keywords):
+            relevant.append(qa)
+    
+    return relevant
+
+def strip_to_first_heading(markdown_text):
+    """Drop any preamble the model wrote before the first section heading"""
+    lines = markdown_text.strip().split('\n')
+    for index, line in enumerate(lines):
+        if line.startswith('## '):
+            return '\n'.join(lines[index:]).strip()
+    return markdown_text.strip()
 
-def markdown_to_html(markdown_content):
-    """Convert markdown content to HTML"""
-    # Try to use extensions, but handle if they're not available
-    extensions = ['extra', 'tables']
+def generate_section_group(group, questions_answered, brd_info):
+    """Generate one group of BRD sections from the Q&A relevant to it"""
+    exchanges = select_relevant_exchanges(questions_answered, group["keywords"])
     
-    # Try to add codehilite if Pygments is available
-    try:
-        import pygments
-        extensions.append('codehilite')
-    except ImportError:
-        pass
+    section_prompt = f"""
+You are a senior consultant at a top-tier MBB firm (McKinsey, Bain, or BCG) writing part of a Business Requirements Document (BRD) for an AI/ML solution project. Other consultants are writing the remaining sections in parallel.
+
+PROJECT INFORMATION:
+- Client: {brd_info['client_name']}
+- Company: {brd_info['company_name']}
+- Project: {brd_info['project_topic']}
+- Document Date: {brd_info['project_date']}
+
+RELEVANT CONVERSATION:
+{CONVERSATION_PLACEHOLDER}
+
+{BRD_INSTRUCTIONS}
+
+Write ONLY the following sections, using this exact structure and numbering. Do not write any other sections, a title, or a preamble:
+
+{render_brd_sections(brd_info, group["sections"])}
+"""
     
-    # nl2br is not a standard extension, so we'll skip it
-    # The 'extra' extension handles most formatting needs
+    def build_messages(model_name):
+        budget = prompt_builder.budget_for(model_name, reserve_tokens=BRD_SECTION_MAX_TOKENS, ceiling=BRD_PROMPT_BUDGET_TOKENS)
+        conversation_budget = budget - prompt_builder.count_messages(build_chat_messages(section_prompt))
+        exchanges_text = prompt_builder.fit_transcript(
+            [(qa["question"], qa["answer"]) for qa in exchanges], conversation_budget
+        )
+        return build_chat_messages(section_prompt.replace(
+            CONVERSATION_PLACEHOLDER, exchanges_text or "No discovery answers recorded for these sections."
+        ))
+    
+    content, model_used = complete_text(
+        build_messages,
+        task=f"generate_brd_{group['name']}",
+        temperature=0.7,
+        max_tokens=BRD_SECTION_MAX_TOKENS
+    )
+    return strip_to_first_heading(content), model_used
+
+def generate_executive_summary(body_markdown, brd_info):
+    """
+    Reduce step: write the Executive Summary from the drafted sections and
+    flag contradictions between them
     
-    html_body = markdown.markdown(
-        markdown_content,
-        extensions=extensions
+    Returns:
+        tuple of (executive summary markdown, list of consistency notes, model_name)
+    """
+    summary_prompt = f"""
+You are a senior MBB engagement manager reviewing a draft Business Requirements Document (BRD) whose sections were written by different consultants.
+
+PROJECT INFORMATION:
+- Client: {brd_info['client_name']}
+- Company: {brd_info['company_name']}
+- Project: {brd_info['project_topic']}
+
+DRAFT SECTIONS:
+{body_markdown}
+
+TASKS:
+1. Write the Executive Summary using exactly this structure, consistent with the draft sections:
+
+{render_brd_sections(brd_info, ["executive_summary"])}
+
+2. Then write a line "CONSISTENCY NOTES:" followed by a bullet list of contradictions between sections (numbers, dates, scope, systems, stakeholders). Write "- None" if the sections are consistent.
+
+Output only these two parts.
+"""
+    
+    content, model_used = complete_text(
+        build_chat_messages(summary_prompt),
+        task="generate_brd_summary",
+        temperature=0.3,
+        max_tokens=800
     )
     
-    # Professional CSS styling for PDF
-    css_style = """
-    <style>
-        @page {
-            size: A4;
-            margin: 2cm;
-            @top-center {
-                content: "Business Requirements Document";
-                font-size: 10pt;
-                color: #666;
-            }
-            @bottom-center {
-                content: "Page " counter(page) " of " counter(pages);
-                font-size: 10pt;
-                color: #666;
-            }
-        }
-        body {
-            font-family: 'Helvetica', 'Arial', sans-serif;
-            font-size: 11pt;
-            line-height: 1.6;
-            color: #333;
-            max-width: 100%;
-        }
-        h1 {
-            color: #1a237e;
-            font-size: 24pt;
-            margin-top: 20pt;
-            margin-bottom: 12pt;
-            border-bottom: 3px solid #1a237e;
-            padding-bottom: 8pt;
-        }
-        h2 {
-            color: #283593;
-            font-size: 18pt;
-            margin-top: 16pt;
-            margin-bottom: 10pt;
-            border-bottom: 2px solid #283593;
-            padding-bottom: 6pt;
-        }
-        h3 {
-            color: #3949ab;
-            font-size: 14pt;
-            margin-top: 12pt;
-            margin-bottom: 8pt;
-        }
-        h4 {
-            color: #5c6bc0;
-            font-size: 12pt;
-            margin-top: 10pt;
-            margin-bottom: 6pt;
-        }
-        p {
-            margin: 8pt 0;
-            text-align: justify;
-        }
-        ul, ol {
-            margin: 8pt 0;
-            padding-left: 24pt;
-        }
-        li {
-            margin: 4pt 0;
-        }
-        table {
-            width: 100%;
-            border-collapse: collapse;
-            margin: 12pt 0;
-            page-break-inside: avoid;
-        }
-        th {
-            background-color: #3949ab;
-            color: white;
-            padding: 8pt;
-            text-align: left;
-            font-weight: bold;
-            border: 1px solid #283593;
-        }
-        td {
-            padding: 6pt 8pt;
-            border: 1px solid #ddd;
-        }
-        tr:nth-child(even) {
-            background-color: #f5f5f5;
-        }
-        code {
-            background-color: #f4f4f4;
-            padding: 2pt 4pt;
-            border-radius: 3pt;
-            font-family: 'Courier New', monospace;
-            font-size: 10pt;
-        }
-        pre {
-            background-color: #f4f4f4;
-            padding: 10pt;
-            border-radius: 4pt;
-            overflow-x: auto;
-            page-break-inside: avoid;
-        }
-        blockquote {
-            border-left: 4px solid #3949ab;
-            padding-left: 12pt;
-            margin: 8pt 0;
-            color: #555;
-            font-style: italic;
-        }
-        hr {
-            border: none;
-            border-top: 2px solid #ddd;
-            margin: 16pt 0;
-        }
-        strong {
-            color: #1a237e;
-            font-weight: bold;
-        }
-        .metadata {
-            background-color: #f5f5f5;
-            padding: 10pt;
-            border-radius: 4pt;
-            margin-bottom: 16pt;
-            font-size: 10pt;
-        }
-    </style>
+    summary_text, _, notes_text = content.partition("CONSISTENCY NOTES:")
+    notes = [
+        line.strip().lstrip('-*').strip()
+        for line in notes_text.split('\n')
+        if line.strip().startswith(('-', '*'))
+    ]
+    notes = [note for note in notes if note and note.lower().rstrip('.') != "none"]
+    return strip_to_first_heading(summary_text), notes, model_used
+
+def generate_brd_parallel(conversation_history, project_context, summary=None):
     """
+    Generate the BRD as concurrent section groups, then stitch them together
     
-    html_content = f"""
-    <!DOCTYPE html>
-    <html>
-    <head>
-        <meta charset="UTF-8">
-        <title>Business Requirements Document</title>
-        {css_style}
-    </head>
-    <body>
-        {html_body}
-    </body>
-    </html>
+    Map: every group in BRD_SECTION_GROUPS is generated at the same time from
+    only the Q&A relevant to it, each with its own token budget.
+    Reduce: the Executive Summary is written from the drafted sections, which
+    also surfaces contradictions between them.
+    
+    Returns:
+        tuple of (brd_content, model_used) or (None, None) on failure
     """
+    print("🔄 Generating BRD section groups in parallel...")
+    
+    if summary is not None:
+        questions_answered = summary.questions_answered(conversation_history)
+    else:
+        questions_answered = extract_conversation_summary(conversation_history)["questions_answered"]
+    brd_info = parse_project_context(project_context)
+    
+    try:
+        with ThreadPoolExecutor(max_workers=len(BRD_SECTION_GROUPS)) as executor:
+            futures = [
+                executor.submit(in_current_context(generate_section_group), group, questions_answered, brd_info)
+                for group in BRD_SECTION_GROUPS
+            ]
+            group_results = [future.result() for future in futures]
+        
+        body_markdown = "\n\n---\n\n".join(content for content, _ in group_results)
+        executive_summary, consistency_notes, summary_model = generate_executive_summary(body_markdown, brd_info)
+    except Exception as e:
+        print(f"⚠️  Parallel BRD generation failed: {e}")
+        return None, None
+    
+    if consistency_notes:
+        print(f"⚠️  {len(consistency_notes)} consistency note(s) found between sections")
+        body_markdown += "\n\n### 12.4 Consistency Notes\n" + "\n".join(f"- {note}" for note in consistency_notes)
+    
+    document_information = render_brd_sections(brd_info, ["document_information"])
+    document_information = document_information.replace("[Project Name]", brd_info["project_topic"] or brd_info["client_name"])
+    
+    brd_content = "\n\n---\n\n".join([document_information, executive_summary, body_markdown])
+    brd_content += "\n\n---\n\n**END OF DOCUMENT**\n"
     
-    return html_content
+    models_used = sorted(set([model for _, model in group_results] + [summary_model]))
+    return brd_content, ", ".join(models_used)
 
-def save_brd(brd_content, project_name, project_context=""):
-    """Save BRD to markdown and PDF files"""
-    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-    safe_name = project_name.replace(' ', '_')
-    md_filename = f"BRD_{safe_name}_{timestamp}.md"
-    pdf_filename = f"BRD_{safe_name}_{timestamp}.pdf"
+def generate_brd(conversation_history, project_context, mode=None, summary=None):
+    """
+    Generate comprehensive BRD from conversation history
+    
+    mode: "single" (one call) or "parallel" (section groups); defaults to AIBA_BRD_MODE
+    summary: the session's ConversationSummary, so the history isn't re-read
+    """
+    print("\n" + "="*70)
+    print("📄 Generating Business Requirements Document (BRD)...")
+    print("="*70 + "\n")
+    
+    if (mode or BRD_GENERATION_MODE) == "parallel":
+        brd_content, model_used = generate_brd_parallel(conversation_history, project_context, summary)
+        if brd_content:
+            print(f"✅ BRD generated successfully using model(s): {model_used}")
+            return brd_content, model_used
+        print("⚠️  Falling back to single-call BRD generation...")
     
     try:
-        # Add document metadata at the top
-        metadata = f"""---
+        print("🔄 Processing conversation and generating BRD...")
+        # The router already prefers the primary model and skips it while it is failing;
+        # the prompt is fitted to whichever model takes the request
+        brd_content, model_used = complete_text(
+            lambda model_name: build_chat_messages(
+                build_brd_prompt(conversation_history, project_context, model_name, summary)
+            ),
+            task="generate_brd",
+            temperature=0.7,
+            max_tokens=CHAT_MAX_TOKENS
+        )
+        print(f"✅ BRD generated successfully using model: {model_used}")
+        return brd_content, model_used
+    except Exception as e:
+        print(f"❌ Error generating BRD: {e}")
+        return None, None
+
+def generate_brd_stream(conversation_history, project_context, summary=None):
+    """
+    Start streaming BRD generation
+    
+    Returns:
+        tuple of (iterator of markdown chunks, model_name)
+    
+    Raises:
+        LLMUnavailableError if no model could start the stream
+    """
+    print("\n" + "="*70)
+    print("📄 Streaming Business Requirements Document (BRD)...")
+    print("="*70 + "\n")
+    
+    chunks, model_used = stream_text(
+        lambda model_name: build_chat_messages(
+            build_brd_prompt(conversation_history, project_context, model_name, summary)
+        ),
+        task="generate_brd",
+        temperature=0.7,
+        max_tokens=CHAT_MAX_TOKENS
+    )
+    print(f"🔄 Streaming BRD from model: {model_used}")
+    return chunks, model_used
+
+
+def brd_filenames(project_name):
+    """Build unique markdown and PDF filenames for a BRD"""
+    stem = new_artifact_stem("BRD", project_name)
+    return f"{stem}.md", f"{stem}.pdf"
+
+def brd_header(project_name):
+    """Document metadata written at the top of every saved BRD"""
+    return f"""---
 Generated By: AIBA (AI Business Analyst)
 Generation Date: {datetime.now().strftime("%Y-%m-%d %H:%M:%S")}
 Project: {project_name}
@@ -616,58 +681,53 @@ Document Type: Business Requirements Document (BRD)
 ---
 
 """
-        
-        full_content = metadata + brd_content + f"\n\n---\n*Document generated by AIBA on {datetime.now().strftime("%B %d, %Y at %H:%M:%S")}*\n"
+
+def brd_footer():
+    """Generation note appended to the end of every saved BRD"""
+    return f"\n\n---\n*Document generated by AIBA on {datetime.now().strftime("%B %d, %Y at %H:%M:%S")}*\n"
+
+def save_brd_markdown(brd_content, project_name, session_id=None):
+    """
+    Save BRD markdown with header and footer
+    
+    Returns (md_filename, pdf_filename, full_content), where pdf_filename is
+    the name the matching PDF should get; (None, None, None) on failure.
+    """
+    md_filename, pdf_filename = brd_filenames(project_name)
+    
+    try:
+        # Add document metadata at the top
+        full_content = brd_header(project_name) + brd_content + brd_footer()
         
         # Save markdown file
-        with open(md_filename, "w", encoding="utf-8") as f:
+        md_path = artifact_store.path(md_filename)
+        with open(md_path, "w", encoding="utf-8") as f:
             f.write(full_content)
         
         print(f"\n✅ BRD saved successfully!")
-        print(f"📁 Markdown File: {md_filename}")
-        print(f"📄 Size: {os.path.getsize(md_filename)} bytes")
+        print(f"📁 Markdown File: {md_path}")
+        print(f"📄 Size: {os.path.getsize(md_path)} bytes")
+        artifact_store.record(md_filename, "brd", session_id)
         
-        # Generate PDF if supported
-        if PDF_SUPPORT:
-            try:
-                print(f"\n🔄 Generating PDF...")
-                # Import WeasyPrint here to handle system library issues gracefully
-                try:
-                    # Set library path for macOS Homebrew installations
-                    import os
-                    if 'DYLD_LIBRARY_PATH' not in os.environ:
-                        homebrew_lib = '/opt/homebrew/lib'
-                        if os.path.exists(homebrew_lib):
-                            os.environ['DYLD_LIBRARY_PATH'] = homebrew_lib
-                    
-                    from weasyprint import HTML
-                except (ImportError, OSError) as import_error:
-                    print(f"⚠️  WeasyPrint not available: {import_error}")
-                    print(f"💡 Install system dependencies for WeasyPrint or use markdown file only.")
-                    return md_filename, None
-                
-                html_content = markdown_to_html(full_content)
-                HTML(string=html_content).write_pdf(pdf_filename)
-                print(f"✅ PDF generated successfully!")
-                print(f"📁 PDF File: {pdf_filename}")
-                print(f"📄 Size: {os.path.getsize(pdf_filename)} bytes")
-                return md_filename, pdf_filename
-            except Exception as pdf_error:
-                print(f"⚠️  Could not generate PDF: {pdf_error}")
-                print(f"💡 Markdown file saved successfully. PDF generation skipped.")
-                return md_filename, None
-        else:
-            print(f"💡 Install 'markdown' and 'weasyprint' to generate PDF files.")
-            return md_filename, None
+        return md_filename, pdf_filename, full_content
             
     except Exception as e:
         print(f"❌ Error saving BRD: {e}")
+        return None, None, None
+
+def save_brd(brd_content, project_name, project_context=""):
+    """Save BRD to markdown and PDF files"""
+    md_filename, pdf_filename, full_content = save_brd_markdown(brd_content, project_name)
+    if not md_filename:
         return None, None
+    
+    # Generate PDF if supported
+    return md_filename, save_brd_pdf(full_content, pdf_filename)
 
-def save_conversation(conversation_history, project_context, project_name):
-    """Save conversation history for future reference"""
+def save_conversation(conversation_history, project_context, project_name, session_id=None, usage=None):
+    """Save conversation history for future reference, with the session's token usage if given"""
     timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-    filename = f"Conversation_{project_name.replace(' ', '_')}_{timestamp}.json"
+    filename = f"{new_artifact_stem('Conversation', project_name)}.json"
     
     try:
         data = {
@@ -675,9 +735,13 @@ def save_conversation(conversation_history, project_context, project_name):
             "conversation_history": conversation_history,
             "timestamp": timestamp
         }
-        with open(filename, "w", encoding="utf-8") as f:
+        if usage is not None:
+            data["token_usage"] = usage
+        path = artifact_store.path(filename)
+        with open(path, "w", encoding="utf-8") as f:
             json.dump(data, f, indent=2, ensure_ascii=False)
-        print(f"💾 Conversation saved to: {filename}")
+        print(f"💾 Conversation saved to: {path}")
+        artifact_store.record(filename, "conversation", session_id)
         return filename
     except Exception as e:
         print(f"⚠️  Could not save conversation: {e}")
@@ -868,7 +932,7 @@ Date: {datetime.now().strftime("%Y-%m-%d %H:%M:%S")}
         # Save BRD and conversation
         project_name = f"{client_name}_{company_name}"
         md_filename, pdf_filename = save_brd(brd_content, project_name, project_context)
-        save_conversation(conversation_history, project_context, project_name)
+        save_conversation(conversation_history, project_context, project_name, usage=token_ledger.session_usage(None))
         
         print(f"\n✅ BRD Generation Complete!")
         if md_filename:
@@ -0,0 +1,83 @@
+"""
+Keyword Index Module
+Single-pass keyword and vague-phrase matching for the heuristic fallbacks
+"""
+import re
+
+
+# Keywords for the fallback scoring of each requirements section
+SECTION_KEYWORDS = {
+    "business_objectives": ["objective", "goal", "purpose", "aim", "target", "success"],
+    "functional_requirements": ["feature", "function", "capability", "requirement", "need"],
+    "technical_requirements": ["technical", "infrastructure", "system", "architecture", "data", "model"],
+    "non_functional": ["performance", "security", "scalability", "compliance", "reliability"],
+    "stakeholders": ["stakeholder", "user", "persona", "role", "team"],
+    "scope": ["scope", "include", "exclude", "assumption", "constraint"],
+    "timeline": ["timeline", "schedule", "milestone", "phase", "deadline"]
+}
+
+# Phrases that mark an answer as vague
+VAGUE_INDICATORS = [
+    "i don't know", "not sure", "maybe", "possibly",
+    "it depends", "probably", "i think", "not really"
+]
+
+
+def _alternation(terms):
+    # Longest first so a term never loses to one of its own prefixes
+    return "|".join(re.escape(term) for term in sorted(set(terms), key=len, reverse=True))
+
+
+class KeywordIndex:
+    """
+    One compiled regex for all section keywords and vague phrases
+
+    Keywords match at the start of a word and may be followed by more word
+    characters ("feature" matches "features", "aim" does not match "claim").
+    Vague phrases must match whole words. scan() finds everything in a
+    single pass over the text.
+    """
+
+    def __init__(self, section_keywords=SECTION_KEYWORDS, vague_phrases=VAGUE_INDICATORS):
+        self.sections = list(section_keywords.keys())
+        self._keyword_sections = {}
+        for section, keywords in section_keywords.items():
+            for keyword in keywords:
+                self._keyword_sections.setdefault(keyword, []).append(section)
+
+        self._pattern = re.compile(
+            rf"\b(?P<vague>{_alternation(vague_phrases)})\b"
+            rf"|\b(?P<keyword>{_alternation(self._keyword_sections)})\w*"
+        )
+
+    def scan(self, text):
+        """
+        Match keywords and vague phrases in text
+
+        Returns:
+            dict with:
+                - section_hits: dict of section -> set of distinct keywords found
+                - section_counts: dict of section -> number of distinct keywords found
+                - vague_hits: list of distinct vague phrases found
+        """
+        section_hits = {section: set() for section in self.sections}
+        vague_hits = []
+
+        normalized = text.lower().replace("’", "'")
+        for match in self._pattern.finditer(normalized):
+            keyword = match.group("keyword")
+            if keyword is not None:
+                for section in self._keyword_sections[keyword]:
+                    section_hits[section].add(keyword)
+            elif match.group("vague") not in vague_hits:
+                vague_hits.append(match.group("vague"))
+
+        return {
+            "section_hits": section_hits,
+            "section_counts": {section: len(hits) for section, hits in section_hits.items()},
+            "vague_hits": vague_hits
+        }
+
+
+# Shared index, built once at import
+keyword_index = KeywordIndex()
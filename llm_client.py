@@ -0,0 +1,595 @@
+"""
+Shared LLM Client Module
+One pooled Groq client plus a failure- and latency-aware model router used by every module
+"""
+import os
+import json
+import math
+import time
+import random
+import hashlib
+import threading
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+import httpx
+from groq import Groq
+from dotenv import load_dotenv
+from tracing import tracer, take_queue_seconds, Span
+
+load_dotenv()
+
+# Groq models in order of preference
+models_to_try = ["llama-3.1-70b-versatile", "llama-3.1-8b-instant", "mixtral-8x7b-32768", "gemma2-9b-it"]
+
+# Circuit breaker settings
+FAILURE_THRESHOLD = int(os.getenv("AIBA_MODEL_FAILURE_THRESHOLD", "2"))
+COOLDOWN_SECONDS = float(os.getenv("AIBA_MODEL_COOLDOWN_SECONDS", "60"))
+DEAD_MODEL_COOLDOWN_SECONDS = float(os.getenv("AIBA_DEAD_MODEL_COOLDOWN_SECONDS", "3600"))
+
+# Connection pool settings - one pool shared by every module
+MAX_CONNECTIONS = int(os.getenv("AIBA_LLM_MAX_CONNECTIONS", "50"))
+MAX_KEEPALIVE_CONNECTIONS = int(os.getenv("AIBA_LLM_MAX_KEEPALIVE", "20"))
+MAX_RETRIES = int(os.getenv("AIBA_LLM_MAX_RETRIES", "1"))
+
+# Response cache for deterministic evaluator calls (see complete_text(cache=True))
+RESPONSE_CACHE_ENABLED = os.getenv("AIBA_LLM_CACHE", "1") != "0"
+RESPONSE_CACHE_SIZE = int(os.getenv("AIBA_LLM_CACHE_SIZE", "1024"))
+RESPONSE_CACHE_TTL_SECONDS = float(os.getenv("AIBA_LLM_CACHE_TTL_SECONDS", "3600"))
+
+# Quality tier of each model, and the lowest tier each task accepts (unlisted tasks need "high")
+MODEL_TIERS = {
+    "llama-3.1-70b-versatile": "high",
+    "mixtral-8x7b-32768": "standard",
+    "llama-3.1-8b-instant": "fast",
+    "gemma2-9b-it": "fast"
+}
+TIER_RANKS = {"fast": 0, "standard": 1, "high": 2}
+TASK_TIERS = {
+    "adaptive_question": "fast",
+    "probing_question": "fast",
+    "chat": "standard",
+    "validate_answer": "standard",
+    "analyze_sections": "standard"
+}
+
+# Latency-aware routing: within a task's tier, try the model expected to answer fastest first
+LATENCY_ROUTING = os.getenv("AIBA_LATENCY_ROUTING", "1") != "0"
+LATENCY_EWMA_ALPHA = float(os.getenv("AIBA_LATENCY_EWMA_ALPHA", "0.3"))
+LATENCY_WINDOW = int(os.getenv("AIBA_LATENCY_WINDOW", "50"))
+# Share of calls sent to the runner-up in the tier, so the estimates of slower models stay current
+LATENCY_EXPLORE_RATE = float(os.getenv("AIBA_LATENCY_EXPLORE_RATE", "0.05"))
+
+# Hedged requests: if the first model hasn't answered by its p95 latency, ask the next model in the tier too
+HEDGE_REQUESTS = os.getenv("AIBA_HEDGE_REQUESTS", "1") != "0"
+# Deadline used until a model has HEDGE_MIN_SAMPLES latencies for a task
+HEDGE_AFTER_SECONDS = float(os.getenv("AIBA_HEDGE_AFTER_SECONDS", "4"))
+HEDGE_MIN_SECONDS = float(os.getenv("AIBA_HEDGE_MIN_SECONDS", "0.5"))
+HEDGE_MIN_SAMPLES = 5
+HEDGE_WORKERS = int(os.getenv("AIBA_HEDGE_WORKERS", str(MAX_CONNECTIONS)))
+
+# Error text that means the model itself is gone, not just busy
+DEAD_MODEL_MARKERS = ["decommissioned", "model_not_found", "does not exist", "not supported"]
+
+
+class LLMUnavailableError(Exception):
+    """Raised when no model could answer a request"""
+
+
+def task_tier(task):
+    return TASK_TIERS.get(task, "high")
+
+
+def meets_tier(model_name, tier):
+    return TIER_RANKS[MODEL_TIERS.get(model_name, "fast")] >= TIER_RANKS[tier]
+
+
+class LatencyTracker:
+    """EWMA and recent-window p95 of successful call latency, per model and task"""
+
+    def __init__(self, alpha=LATENCY_EWMA_ALPHA, window=LATENCY_WINDOW):
+        self.alpha = alpha
+        self.window = window
+        self._stats = {}
+        self._lock = threading.Lock()
+
+    def record(self, model_name, task, seconds):
+        with self._lock:
+            entry = self._stats.get((model_name, task))
+            if entry is None:
+                self._stats[(model_name, task)] = {"ewma": seconds, "samples": deque([seconds], maxlen=self.window)}
+                return
+            entry["ewma"] = self.alpha * seconds + (1 - self.alpha) * entry["ewma"]
+            entry["samples"].append(seconds)
+
+    def estimate(self, model_name, task):
+        """EWMA latency in seconds, or None if the model hasn't answered this task yet"""
+        with self._lock:
+            entry = self._stats.get((model_name, task))
+            return entry["ewma"] if entry else None
+
+    def p95(self, model_name, task, min_samples=HEDGE_MIN_SAMPLES):
+        """95th percentile of recent latencies, or None with fewer than min_samples"""
+        with self._lock:
+            entry = self._stats.get((model_name, task))
+            samples = sorted(entry["samples"]) if entry else []
+        if len(samples) < min_samples:
+            return None
+        return samples[math.ceil(0.95 * len(samples)) - 1]
+
+    def snapshot(self):
+        with self._lock:
+            entries = [(key, entry["ewma"], sorted(entry["samples"])) for key, entry in self._stats.items()]
+        return [
+            {
+                "model": model_name,
+                "task": task,
+                "ewma_s": round(ewma, 3),
+                "p95_s": round(samples[math.ceil(0.95 * len(samples)) - 1], 3),
+                "samples": len(samples)
+            }
+            for (model_name, task), ewma, samples in sorted(entries)
+        ]
+
+
+class ModelRouter:
+    """
+    Tracks model health with a per-model circuit breaker, and latency per task
+
+    A model opens after FAILURE_THRESHOLD consecutive failures (or immediately
+    if the API says it is decommissioned) and is skipped until its cooldown
+    expires. After the cooldown the model is tried again (half-open): success
+    closes the circuit, a single further failure re-opens it.
+
+    With a task, healthy models good enough for the task's quality tier are
+    ordered by expected latency, ahead of the models below the tier. A model
+    not yet measured on the task is expected to be instant, so each one is
+    tried once; after that the EWMA decides, with the configured model order
+    breaking ties. A small share of calls (explore_rate) goes to the runner-up
+    to keep its estimate current. hedge_for() says when to send a duplicate
+    request to the runner-up.
+    """
+
+    def __init__(self, models, failure_threshold=FAILURE_THRESHOLD,
+                 cooldown_seconds=COOLDOWN_SECONDS, dead_cooldown_seconds=DEAD_MODEL_COOLDOWN_SECONDS,
+                 latency_routing=LATENCY_ROUTING, hedge_requests=HEDGE_REQUESTS,
+                 explore_rate=LATENCY_EXPLORE_RATE):
+        self.models = list(models)
+        self.failure_threshold = failure_threshold
+        self.cooldown_seconds = cooldown_seconds
+        self.dead_cooldown_seconds = dead_cooldown_seconds
+        self.latency_routing = latency_routing
+        self.hedge_requests = hedge_requests
+        self.explore_rate = explore_rate
+        self.latency = LatencyTracker()
+        self._lock = threading.Lock()
+        self._state = {}
+
+    def _entry(self, model_name):
+        if model_name not in self._state:
+            self._state[model_name] = {
+                "failures": 0,
+                "open_until": 0.0,
+                "last_error": None
+            }
+        return self._state[model_name]
+
+    def plan(self, models=None, task=None):
+        """
+        Return the order in which models should be tried
+
+        Healthy models keep their preference order, or for a task are ranked
+        by expected latency within its tier. Open circuits are moved to the
+        end (soonest to recover first) so a request still has somewhere to go
+        when every model is marked down.
+        """
+        candidates = list(models) if models else self.models
+        now = time.monotonic()
+        healthy = []
+        tripped = []
+
+        with self._lock:
+            for model_name in candidates:
+                entry = self._entry(model_name)
+                if entry["open_until"] <= now:
+                    healthy.append(model_name)
+                else:
+                    tripped.append((entry["open_until"], model_name))
+
+        if task is not None and self.latency_routing:
+            healthy = self._rank(healthy, task)
+        tripped.sort()
+        return healthy + [model_name for _, model_name in tripped]
+
+    def _rank(self, healthy, task):
+        tier = task_tier(task)
+        in_tier = [model_name for model_name in healthy if meets_tier(model_name, tier)]
+        below_tier = [model_name for model_name in healthy if not meets_tier(model_name, tier)]
+        # Stable sort: equal estimates keep preference order
+        in_tier.sort(key=lambda model_name: self.expected_seconds(model_name, task))
+        if len(in_tier) > 1 and random.random() < self.explore_rate:
+            in_tier[0], in_tier[1] = in_tier[1], in_tier[0]
+        return in_tier + below_tier
+
+    def expected_seconds(self, model_name, task):
+        """EWMA latency on task, or 0.0 (optimistic) until the model has been measured"""
+        estimate = self.latency.estimate(model_name, task)
+        return 0.0 if estimate is None else estimate
+
+    def hedge_for(self, plan, task):
+        """
+        Runner-up for a hedged request on plan[0], and how long to wait before sending it
+
+        The runner-up must be healthy and in the task's tier. The wait is
+        plan[0]'s p95 latency on this task (HEDGE_AFTER_SECONDS until it has
+        enough samples). Returns (None, None) when the request shouldn't be hedged.
+        """
+        if not (self.hedge_requests and task is not None and len(plan) > 1):
+            return None, None
+        hedge_model = plan[1]
+        with self._lock:
+            available = self._entry(hedge_model)["open_until"] <= time.monotonic()
+        if not available or not meets_tier(hedge_model, task_tier(task)):
+            return None, None
+        p95 = self.latency.p95(plan[0], task)
+        return hedge_model, max(HEDGE_MIN_SECONDS, HEDGE_AFTER_SECONDS if p95 is None else p95)
+
+    def record_success(self, model_name, task=None, seconds=None):
+        if task is not None and seconds is not None:
+            self.latency.record(model_name, task, seconds)
+        with self._lock:
+            entry = self._entry(model_name)
+            entry["failures"] = 0
+            entry["open_until"] = 0.0
+            entry["last_error"] = None
+
+    def record_failure(self, model_name, error):
+        status_code = getattr(error, "status_code", None)
+        if status_code in (401, 403):
+            # Credential problems are not the model's fault
+            return
+
+        message = str(error).lower()
+        is_dead = any(marker in message for marker in DEAD_MODEL_MARKERS)
+
+        with self._lock:
+            entry = self._entry(model_name)
+            entry["failures"] += 1
+            entry["last_error"] = str(error)[:200]
+            if is_dead:
+                entry["open_until"] = time.monotonic() + self.dead_cooldown_seconds
+            elif entry["failures"] >= self.failure_threshold:
+                entry["open_until"] = time.monotonic() + self.cooldown_seconds
+
+        if is_dead:
+            print(f"⚠️  Model {model_name} looks decommissioned - skipping it for {int(self.dead_cooldown_seconds)}s")
+
+    def snapshot(self):
+        """Current breaker state for each known model"""
+        now = time.monotonic()
+        with self._lock:
+            return {
+                model_name: {
+                    "available": entry["open_until"] <= now,
+                    "failures": entry["failures"],
+                    "retry_in": max(0.0, round(entry["open_until"] - now, 1)),
+                    "last_error": entry["last_error"]
+                }
+                for model_name, entry in self._state.items()
+            }
+
+
+class ResponseCache:
+    """
+    LRU cache of completions with a time-to-live
+
+    Entries are keyed by a hash of the model, messages and request parameters.
+    chat_completion looks up the key of every model a request may be routed
+    to, so an identical request hits whichever model answered it. Meant for
+    low-temperature evaluator calls, where a repeat would get the same answer.
+    """
+
+    def __init__(self, max_entries=RESPONSE_CACHE_SIZE, ttl_seconds=RESPONSE_CACHE_TTL_SECONDS):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def key(self, model_name, messages, params):
+        payload = json.dumps([model_name, messages, params], ensure_ascii=False, sort_keys=True, default=str)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def get(self, key):
+        return self.lookup([key])[1]
+
+    def lookup(self, keys):
+        """
+        First live entry among keys, counted as one hit or one miss
+
+        Returns:
+            tuple of (key, response), or (None, None) if none of the keys is cached
+        """
+        now = time.monotonic()
+        with self._lock:
+            for key in keys:
+                entry = self._entries.get(key)
+                if entry is None:
+                    continue
+                if entry[0] <= now:
+                    del self._entries[key]
+                    continue
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return key, entry[1]
+            self.misses += 1
+            return None, None
+
+    def put(self, key, response):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl_seconds, response)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def stats(self):
+        with self._lock:
+            return {"entries": len(self._entries), "hits": self.hits, "misses": self.misses}
+
+
+def _create_client():
+    """Create the Groq client with a shared, keep-alive connection pool"""
+    api_key = os.getenv("GROQ_API_KEY") or os.getenv("GROQ_API")
+    http_client = httpx.Client(
+        limits=httpx.Limits(
+            max_connections=MAX_CONNECTIONS,
+            max_keepalive_connections=MAX_KEEPALIVE_CONNECTIONS
+        ),
+        timeout=httpx.Timeout(60.0, connect=5.0)
+    )
+    if api_key:
+        return Groq(api_key=api_key, http_client=http_client, max_retries=MAX_RETRIES)
+    return Groq(http_client=http_client, max_retries=MAX_RETRIES)
+
+
+# Initialize the shared Groq API client and router
+client = _create_client()
+router = ModelRouter(models_to_try)
+response_cache = ResponseCache()
+
+
+def messages_for(messages, model_name):
+    """Resolve messages given either as a list or as a per-model builder"""
+    if callable(messages):
+        return messages(model_name)
+    return messages
+
+
+def usage_attributes(usage):
+    """Span attributes for a response's token usage (empty when the API didn't report it)"""
+    if usage is None:
+        return {}
+    return {
+        "prompt_tokens": getattr(usage, "prompt_tokens", None),
+        "completion_tokens": getattr(usage, "completion_tokens", None)
+    }
+
+
+def chat_completion(messages, task="chat", models=None, cache=False, **params):
+    """
+    Send a chat completion to the first healthy model
+
+    Models are tried fastest first within the task's quality tier. If the
+    first one is slower than usual, the request is hedged: the runner-up is
+    asked too and whichever answers first is used. Each call is traced as an
+    "llm" span (model, attempts, tokens, queue time) under the current
+    request span.
+
+    Args:
+        messages: Chat messages to send, or a function of the model name that
+            builds them (so a prompt can be fitted to each model's budget)
+        task: Short name of the calling task (for routing, logs and traces)
+        models: Optional list of models to restrict the request to
+        cache: Serve an identical earlier request from response_cache; only for
+            deterministic (low-temperature) calls
+        **params: Extra parameters passed to the completions API
+
+    Returns:
+        tuple of (response, model_name)
+
+    Raises:
+        LLMUnavailableError if every candidate model failed
+    """
+    last_error = None
+
+    with tracer.span(f"llm {task}", kind="llm", task=task, attempts=0,
+                     queue_ms=round(take_queue_seconds() * 1000, 1)) as span:
+        plan = router.plan(models, task)
+        cache_keys = {}
+        if cache and RESPONSE_CACHE_ENABLED:
+            # Routing and hedging change which model answers, so any of them may hold the answer
+            cache_keys = {
+                model_name: response_cache.key(model_name, messages_for(messages, model_name), params)
+                for model_name in plan
+            }
+            cache_key, response = response_cache.lookup(cache_keys.values())
+            if cache_key is not None:
+                model_name = next(m for m, key in cache_keys.items() if key == cache_key)
+                span.set(model=model_name, cache_hit=True)
+                return response, model_name
+
+        while plan:
+            model_name = plan.pop(0)
+            request_messages = messages_for(messages, model_name)
+            hedge_model, hedge_after = router.hedge_for([model_name] + plan, task)
+            span.set(attempts=span.attributes["attempts"] + 1)
+            try:
+                if hedge_model is None:
+                    response = _create(model_name, request_messages, task, params)
+                else:
+                    response, model_name = _create_hedged(
+                        model_name, request_messages, hedge_model, hedge_after, messages, task, params, span
+                    )
+            except HedgeFailedError as e:
+                # Both models were tried
+                plan.remove(hedge_model)
+                last_error = e.__cause__
+                continue
+            except Exception as e:
+                last_error = e
+                continue
+
+            if model_name in cache_keys:
+                response_cache.put(cache_keys[model_name], response)
+            span.set(model=model_name, **usage_attributes(getattr(response, "usage", None)))
+            return response, model_name
+
+        raise LLMUnavailableError(f"Could not get response from any model for {task}: {last_error}") from last_error
+
+
+class HedgeFailedError(Exception):
+    """Raised (from the last error) when both calls of a hedged request failed"""
+
+
+# Runs the calls of hedged requests, so the caller can wait on whichever answers first
+hedge_executor = ThreadPoolExecutor(max_workers=HEDGE_WORKERS, thread_name_prefix="llm-hedge")
+
+
+def _create(model_name, request_messages, task, params):
+    """One completions call, with its outcome and latency recorded on the router"""
+    started = time.monotonic()
+    try:
+        response = client.chat.completions.create(
+            model=model_name,
+            messages=request_messages,
+            **params
+        )
+    except Exception as e:
+        router.record_failure(model_name, e)
+        raise
+    router.record_success(model_name, task, time.monotonic() - started)
+    return response
+
+
+def _create_hedged(model_name, request_messages, hedge_model, hedge_after, messages, task, params, span):
+    """
+    Call model_name, adding a duplicate call to hedge_model after hedge_after seconds
+
+    The slower call is left to finish in the background; its tokens are
+    still charged, in a child span of span.
+
+    Returns:
+        tuple of (response, model_name) of the first call to succeed
+
+    Raises:
+        the primary call's error if it failed before the deadline,
+        HedgeFailedError if both calls failed
+    """
+    primary = hedge_executor.submit(_create, model_name, request_messages, task, params)
+    done, _ = wait([primary], timeout=hedge_after)
+    if done:
+        return primary.result(), model_name
+
+    hedge_messages = messages_for(messages, hedge_model)
+    secondary = hedge_executor.submit(_create, hedge_model, hedge_messages, task, params)
+    span.set(attempts=span.attributes["attempts"] + 1, hedged=True, hedge_model=hedge_model,
+             hedge_after_ms=round(hedge_after * 1000, 1))
+
+    pending = {primary: model_name, secondary: hedge_model}
+    last_error = None
+    while pending:
+        done, _ = wait(list(pending), return_when=FIRST_COMPLETED)
+        for future in done:
+            answered_by = pending.pop(future)
+            if future.exception() is not None:
+                last_error = future.exception()
+                continue
+            for loser, loser_model in pending.items():
+                _charge_hedge_loser(loser, loser_model, task, span)
+            span.set(hedge_winner="hedge" if answered_by == hedge_model else "primary")
+            return future.result(), answered_by
+
+    raise HedgeFailedError(f"Hedged request to {model_name} and {hedge_model} failed") from last_error
+
+
+def _charge_hedge_loser(future, model_name, task, parent):
+    """Record the tokens of the hedged call whose answer wasn't used, once it finishes"""
+    span = Span(tracer, f"llm {task}", kind="llm", parent=parent,
+                attributes={"task": task, "model": model_name, "hedge_loser": True})
+
+    def finished(future):
+        if future.cancelled() or future.exception() is not None:
+            span.fail(future.exception() if not future.cancelled() else "cancelled")
+        else:
+            span.set(**usage_attributes(getattr(future.result(), "usage", None)))
+        span.finish()
+    future.add_done_callback(finished)
+
+
+def complete_text(messages, task="chat", models=None, cache=False, **params):
+    """Like chat_completion, but returns (content, model_name)"""
+    response, model_name = chat_completion(messages, task=task, models=models, cache=cache, **params)
+    return response.choices[0].message.content, model_name
+
+
+def stream_text(messages, task="chat", models=None, **params):
+    """
+    Open a streaming chat completion on the first healthy model
+
+    Models are ordered as for chat_completion but never hedged. Falling back
+    to the next model is only possible until the stream is open; errors after
+    that are raised from the returned iterator. The call's span stays open
+    until the iterator is exhausted or closed.
+
+    Returns:
+        tuple of (iterator of text chunks, model_name)
+    """
+    last_error = None
+    span = tracer.start_span(f"llm {task}", kind="llm", task=task, stream=True, attempts=0,
+                             queue_ms=round(take_queue_seconds() * 1000, 1))
+
+    for model_name in router.plan(models, task):
+        span.set(attempts=span.attributes["attempts"] + 1)
+        try:
+            stream = client.chat.completions.create(
+                model=model_name,
+                messages=messages_for(messages, model_name),
+                stream=True,
+                **params
+            )
+        except Exception as e:
+            router.record_failure(model_name, e)
+            last_error = e
+            continue
+
+        router.record_success(model_name)
+        span.set(model=model_name, open_ms=round(span.elapsed() * 1000, 1))
+        return _iter_stream_text(stream, span), model_name
+
+    error = LLMUnavailableError(f"Could not get response from any model for {task}: {last_error}")
+    span.fail(error)
+    span.finish()
+    raise error from last_error
+
+
+def _iter_stream_text(stream, span):
+    """Yield the text content of each streamed chunk, finishing span at the end"""
+    try:
+        for chunk in stream:
+            # Groq reports usage on the final chunk
+            x_groq = getattr(chunk, "x_groq", None)
+            usage = getattr(x_groq, "usage", None) or getattr(chunk, "usage", None)
+            if usage is not None:
+                span.set(**usage_attributes(usage))
+            if not chunk.choices:
+                continue
+            text = chunk.choices[0].delta.content
+            if text:
+                if "first_token_ms" not in span.attributes:
+                    span.set(first_token_ms=round(span.elapsed() * 1000, 1))
+                yield text
+    except Exception as e:
+        span.fail(e)
+        raise
+    finally:
+        span.finish()
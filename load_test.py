@@ -0,0 +1,518 @@
+"""
+AIBA Load Test Module
+Drives simulated consultants through the web app against a local fake Groq server
+
+Usage:
+    python load_test.py --consultants 50 --answers 8 --latency 0.5 --token-rate 400
+
+By default the app is started from serve.py in a temporary workspace, pointed
+at the fake server through GROQ_BASE_URL. Use --target to load an app that is
+already running (start it with GROQ_BASE_URL set to the printed stub address).
+"""
+import os
+import re
+import sys
+import json
+import time
+import uuid
+import random
+import shutil
+import argparse
+import tempfile
+import threading
+import subprocess
+import urllib.error
+import urllib.request
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+SAMPLE_ANSWERS = [
+    "Our AP team of 12 processes roughly 5,000 invoices a month in SAP S/4HANA and we want to cut cycle time from 5 days to 1.",
+    "The main users are the finance operations team in Ahmedabad and the procurement leads in each business unit.",
+    "Success means fewer than 2% exceptions, 40% less manual effort and a payback period under 12 months.",
+    "We need integration with SAP, Salesforce and our document management system, hosted on Azure in India.",
+    "Data comes from scanned PDFs and EDI feeds, about 200 GB a year, and must be retained for 8 years for audit.",
+    "Response time should be under 2 seconds at the 95th percentile with up to 300 concurrent users at month end.",
+    "I'm not sure yet, maybe the IT team knows.",
+    "The biggest risk is vendor master data quality; duplicates cause around 15% of payment errors today.",
+    "Phase one covers domestic invoices only; foreign currency and intercompany are out of scope for now.",
+    "We must comply with GST e-invoicing rules and SOC 2, and every approval needs an audit trail."
+]
+
+# pdf-render is not a request: it times convert-to-pdf until its background job is done or failed
+ENDPOINTS = ["start-project", "get-question", "submit-answer", "generate-brd", "convert-to-pdf", "pdf-render"]
+DERIVED_ENDPOINTS = {"pdf-render"}
+
+# How often and how long a consultant polls /api/pdf-jobs/<id> for the rendered PDF
+PDF_POLL_SECONDS = 0.25
+PDF_TIMEOUT_SECONDS = 300
+
+
+def percentile(sorted_values, pct):
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, int(round(pct / 100.0 * len(sorted_values))))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+
+class FakeGroqHandler(BaseHTTPRequestHandler):
+    """
+    Answers /openai/v1/chat/completions like Groq does, with simulated timing
+
+    Replies are shaped after the request: JSON section scores for JSON-mode
+    calls, a structured assessment for answer validation, markdown for
+    long completions and a single question otherwise. Each reply waits
+    latency (+ jitter, or the model's own latency) plus its length divided
+    by the token rate.
+    """
+
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length", 0))
+        request = json.loads(self.rfile.read(length) or b"{}")
+        stub = self.server.stub
+        stub.count("requests")
+
+        if not self.path.endswith("/chat/completions"):
+            self._send_json(404, {"error": {"message": "not found", "type": "invalid_request_error"}})
+            return
+        if random.random() < stub.error_rate:
+            stub.count("injected_errors")
+            time.sleep(stub.latency_for(request))
+            self._send_json(stub.error_status, {"error": {"message": "Injected failure", "type": "server_error"}})
+            return
+
+        content = stub.reply_for(request)
+        completion_tokens = len(content.split())
+        time.sleep(max(0.0, stub.latency_for(request) + random.uniform(-stub.jitter, stub.jitter)))
+
+        if request.get("stream"):
+            self._stream(request, content)
+            return
+
+        if stub.token_rate:
+            time.sleep(completion_tokens / stub.token_rate)
+        self._send_json(200, {
+            "id": f"chatcmpl-{uuid.uuid4().hex}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": request.get("model"),
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": content},
+                "finish_reason": "stop"
+            }],
+            "usage": {
+                "prompt_tokens": stub.prompt_tokens(request),
+                "completion_tokens": completion_tokens,
+                "total_tokens": stub.prompt_tokens(request) + completion_tokens
+            }
+        })
+
+    def _stream(self, request, content):
+        stub = self.server.stub
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Connection", "close")
+        self.end_headers()
+        self.close_connection = True
+
+        chunk_id = f"chatcmpl-{uuid.uuid4().hex}"
+        words = content.split(" ")
+        for start in range(0, len(words), 8):
+            piece = " ".join(words[start:start + 8]) + (" " if start + 8 < len(words) else "")
+            if stub.token_rate:
+                time.sleep(len(words[start:start + 8]) / stub.token_rate)
+            self._write_event({
+                "id": chunk_id,
+                "object": "chat.completion.chunk",
+                "created": int(time.time()),
+                "model": request.get("model"),
+                "choices": [{"index": 0, "delta": {"content": piece}, "finish_reason": None}]
+            })
+        self._write_event({
+            "id": chunk_id,
+            "object": "chat.completion.chunk",
+            "created": int(time.time()),
+            "model": request.get("model"),
+            "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}],
+            # Groq reports a stream's usage on its final chunk
+            "x_groq": {"usage": {
+                "prompt_tokens": stub.prompt_tokens(request),
+                "completion_tokens": len(words),
+                "total_tokens": stub.prompt_tokens(request) + len(words)
+            }}
+        })
+        self.wfile.write(b"data: [DONE]\n\n")
+        self.wfile.flush()
+
+    def _write_event(self, payload):
+        self.wfile.write(f"data: {json.dumps(payload)}\n\n".encode("utf-8"))
+        self.wfile.flush()
+
+    def _send_json(self, status, payload):
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+class FakeGroqServer:
+    """Threaded OpenAI/Groq-compatible stub on a local port"""
+
+    def __init__(self, port=0, latency=0.3, jitter=0.1, token_rate=0.0, error_rate=0.0,
+                 error_status=503, reply_tokens=1200, model_latency=None):
+        self.latency = latency
+        # Per-model latency overrides, to exercise latency-aware routing
+        self.model_latency = dict(model_latency or {})
+        self.jitter = min(jitter, latency)
+        self.token_rate = token_rate
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.reply_tokens = reply_tokens
+        self.counters = {"requests": 0, "injected_errors": 0}
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer(("127.0.0.1", port), FakeGroqHandler)
+        self._server.daemon_threads = True
+        self._server.stub = self
+        self._thread = None
+
+    @property
+    def base_url(self):
+        return f"http://127.0.0.1:{self._server.server_address[1]}"
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, name="fake-groq", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def count(self, name):
+        with self._lock:
+            self.counters[name] += 1
+
+    def latency_for(self, request):
+        return self.model_latency.get(request.get("model"), self.latency)
+
+    def prompt_tokens(self, request):
+        return sum(len(str(msg.get("content", ""))) for msg in request.get("messages", [])) // 4
+
+    def reply_for(self, request):
+        messages = request.get("messages", [])
+        prompt = str(messages[-1].get("content", "")) if messages else ""
+        max_tokens = request.get("max_tokens") or self.reply_tokens
+
+        if (request.get("response_format") or {}).get("type") == "json_object":
+            sections = re.findall(r'"(\w+)": 0\.0-1\.0', prompt)
+            return json.dumps({section: round(random.uniform(0.2, 0.9), 2) for section in sections})
+        if "Quality Score:" in prompt:
+            score = round(random.uniform(0.4, 0.9), 2)
+            return (
+                f"- Quality Score: {score}\n- Is Valid: Yes\n- Feedback: Useful answer, add figures where possible.\n"
+                f"- Should Probe: {'Yes' if score < 0.7 else 'No'}\n- Missing Aspects: none"
+            )
+        if max_tokens <= 150:
+            return "What measurable outcome would make this project a success for your finance team?"
+
+        words = min(max_tokens, self.reply_tokens)
+        paragraph = ("The solution automates invoice capture, matching and approval for the finance team "
+                     "with clear KPIs, integrations and controls. ").split()
+        body = " ".join(paragraph[i % len(paragraph)] for i in range(words))
+        return f"## 1. Executive Summary\n\n{body}\n\nCONSISTENCY NOTES:\n- None"
+
+
+class LoadStats:
+    """Latency samples and error counts per endpoint"""
+
+    def __init__(self):
+        self.latencies = {endpoint: [] for endpoint in ENDPOINTS}
+        self.errors = {endpoint: 0 for endpoint in ENDPOINTS}
+        self.error_samples = {}
+        self.sessions_completed = 0
+        self._lock = threading.Lock()
+
+    def record(self, endpoint, seconds, error=None):
+        with self._lock:
+            self.latencies[endpoint].append(seconds)
+            if error:
+                self.errors[endpoint] += 1
+                self.error_samples.setdefault(endpoint, error)
+
+    def session_done(self):
+        with self._lock:
+            self.sessions_completed += 1
+
+    def report(self, wall_seconds):
+        endpoints = {}
+        total_requests = 0
+        for endpoint in ENDPOINTS:
+            samples = sorted(self.latencies[endpoint])
+            if endpoint not in DERIVED_ENDPOINTS:
+                total_requests += len(samples)
+            if not samples:
+                continue
+            endpoints[endpoint] = {
+                "requests": len(samples),
+                "errors": self.errors[endpoint],
+                "error_rate": round(self.errors[endpoint] / len(samples), 4),
+                "throughput_rps": round(len(samples) / wall_seconds, 2),
+                "p50_ms": round(percentile(samples, 50) * 1000, 1),
+                "p95_ms": round(percentile(samples, 95) * 1000, 1),
+                "p99_ms": round(percentile(samples, 99) * 1000, 1),
+                "max_ms": round(samples[-1] * 1000, 1)
+            }
+        return {
+            "wall_seconds": round(wall_seconds, 2),
+            "total_requests": total_requests,
+            "throughput_rps": round(total_requests / wall_seconds, 2) if wall_seconds else 0.0,
+            "sessions_completed": self.sessions_completed,
+            "endpoints": endpoints,
+            "error_samples": dict(self.error_samples)
+        }
+
+
+def call_api(target, endpoint, path, payload, stats, timeout=300):
+    """POST payload to the app, recording the latency under endpoint; returns the JSON body or None"""
+    request = urllib.request.Request(
+        f"{target}{path}",
+        data=json.dumps(payload).encode("utf-8"),
+        headers={"Content-Type": "application/json"},
+        method="POST"
+    )
+    started = time.perf_counter()
+    try:
+        with urllib.request.urlopen(request, timeout=timeout) as response:
+            body = json.loads(response.read() or b"{}")
+        stats.record(endpoint, time.perf_counter() - started)
+        return body
+    except urllib.error.HTTPError as e:
+        stats.record(endpoint, time.perf_counter() - started, f"HTTP {e.code}: {e.read()[:200]!r}")
+    except Exception as e:
+        stats.record(endpoint, time.perf_counter() - started, f"{type(e).__name__}: {e}")
+    return None
+
+
+def wait_for_pdf(target, job_id, stats, started, timeout=PDF_TIMEOUT_SECONDS):
+    """Poll a PDF job until it is done or failed, recording the time since started under pdf-render"""
+    deadline = started + timeout
+    while True:
+        try:
+            with urllib.request.urlopen(f"{target}/api/pdf-jobs/{job_id}", timeout=30) as response:
+                job = json.loads(response.read() or b"{}")
+        except urllib.error.HTTPError as e:
+            stats.record("pdf-render", time.perf_counter() - started, f"HTTP {e.code}: {e.read()[:200]!r}")
+            return None
+        except Exception as e:
+            stats.record("pdf-render", time.perf_counter() - started, f"{type(e).__name__}: {e}")
+            return None
+
+        if job.get("status") == "done":
+            stats.record("pdf-render", time.perf_counter() - started)
+            return job
+        if job.get("status") == "failed":
+            stats.record("pdf-render", time.perf_counter() - started, f"failed: {job.get('error')}")
+            return None
+        if time.perf_counter() >= deadline:
+            stats.record("pdf-render", time.perf_counter() - started, f"timed out after {timeout}s ({job.get('status')})")
+            return None
+        time.sleep(PDF_POLL_SECONDS)
+
+
+def run_consultant(index, target, answers, stats):
+    """One simulated consultant: start, answer questions, generate the BRD and wait for its PDF"""
+    started = call_api(target, "start-project", "/api/start-project", {
+        # Distinct customers so research isn't served from the cache every time
+        "client_name": f"LoadTest Customer {index} {uuid.uuid4().hex[:6]}",
+        "company_name": "LoadTest Corp",
+        "project_topic": "Accounts payable invoice automation"
+    }, stats)
+    if not started or not started.get("session_id"):
+        return
+    session_id = started["session_id"]
+
+    for turn in range(answers):
+        asked = call_api(target, "get-question", "/api/get-question", {"session_id": session_id}, stats)
+        if not asked or not asked.get("question"):
+            return
+        call_api(target, "submit-answer", "/api/submit-answer", {
+            "session_id": session_id,
+            "question": asked["question"],
+            "answer": SAMPLE_ANSWERS[(index + turn) % len(SAMPLE_ANSWERS)],
+            "conversation_phase": asked.get("conversation_phase")
+        }, stats)
+
+    brd = call_api(target, "generate-brd", "/api/generate-brd", {"session_id": session_id}, stats)
+    if not brd or not brd.get("md_filename"):
+        return
+    pdf_started = time.perf_counter()
+    queued = call_api(target, "convert-to-pdf", "/api/convert-to-pdf", {
+        "md_filename": brd["md_filename"],
+        "session_id": session_id
+    }, stats)
+    if not queued or not queued.get("job_id"):
+        return
+    # convert-to-pdf only queues the render; the consultant waits for the file
+    if not wait_for_pdf(target, queued["job_id"], stats, pdf_started):
+        return
+    stats.session_done()
+
+
+def start_app(stub_url, port, workspace):
+    """Run serve.py against the stub in a throwaway workspace; returns (process, base url, log path)"""
+    env = dict(os.environ)
+    env.update({
+        "GROQ_BASE_URL": stub_url,
+        "GROQ_API_KEY": "load-test",
+        "AIBA_HOST": "127.0.0.1",
+        "AIBA_PORT": str(port),
+        "AIBA_ARTIFACTS_DIR": os.path.join(workspace, "artifacts"),
+        "AIBA_REPOSITORY_DB": os.path.join(workspace, "aiba.sqlite"),
+        "AIBA_RESEARCH_CACHE_DIR": os.path.join(workspace, "research"),
+        "AIBA_RENDER_CACHE_DIR": os.path.join(workspace, "render"),
+        "PYTHONUNBUFFERED": "1"
+    })
+    log_path = os.path.join(workspace, "app.log")
+    log_file = open(log_path, "w", encoding="utf-8")
+    process = subprocess.Popen(
+        [sys.executable, "serve.py"],
+        cwd=os.path.dirname(os.path.abspath(__file__)),
+        env=env,
+        stdout=log_file,
+        stderr=subprocess.STDOUT
+    )
+    base_url = f"http://127.0.0.1:{port}"
+
+    deadline = time.time() + 60
+    while time.time() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"App exited during startup, see {log_path}")
+        try:
+            with urllib.request.urlopen(f"{base_url}/", timeout=2):
+                return process, base_url, log_path
+        except Exception:
+            time.sleep(0.5)
+    process.terminate()
+    raise RuntimeError(f"App did not start within 60s, see {log_path}")
+
+
+def print_report(report, stub_counters, settings):
+    print("\n" + "=" * 92)
+    print("AIBA LOAD TEST REPORT")
+    print("=" * 92)
+    print(f"Consultants: {settings.consultants} (concurrency {settings.concurrency}), answers each: {settings.answers}")
+    print(f"Fake LLM: latency {settings.latency}s ±{settings.jitter}s, token rate "
+          f"{settings.token_rate or 'unlimited'}/s, error rate {settings.error_rate:.0%}")
+    if settings.model_latency:
+        print(f"Model latency: {', '.join(settings.model_latency)}")
+    print(f"Wall time: {report['wall_seconds']}s, requests: {report['total_requests']} "
+          f"({report['throughput_rps']} req/s), sessions completed: {report['sessions_completed']}")
+    if stub_counters:
+        print(f"LLM calls: {stub_counters['requests']} ({stub_counters['injected_errors']} injected failures)")
+    print("-" * 92)
+    print(f"{'endpoint':<16}{'requests':>9}{'errors':>8}{'err %':>8}{'req/s':>8}"
+          f"{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'max ms':>10}")
+    for endpoint, row in report["endpoints"].items():
+        print(f"{endpoint:<16}{row['requests']:>9}{row['errors']:>8}{row['error_rate'] * 100:>7.1f}%"
+              f"{row['throughput_rps']:>8}{row['p50_ms']:>10}{row['p95_ms']:>10}{row['p99_ms']:>10}{row['max_ms']:>10}")
+    for endpoint, error in report["error_samples"].items():
+        print(f"⚠️  {endpoint}: {error}")
+    print("=" * 92)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test AIBA against a local fake Groq server")
+    parser.add_argument("--consultants", type=int, default=10, help="simulated consultants (sessions)")
+    parser.add_argument("--concurrency", type=int, default=None, help="consultants active at once (default: all)")
+    parser.add_argument("--answers", type=int, default=8, help="questions answered per consultant")
+    parser.add_argument("--ramp-seconds", type=float, default=0.0, help="spread consultant start times over this long")
+    parser.add_argument("--latency", type=float, default=0.3, help="fake LLM time to first token, seconds")
+    parser.add_argument("--jitter", type=float, default=0.1, help="random ± added to the latency, seconds")
+    parser.add_argument("--model-latency", action="append", default=[], metavar="MODEL=SECONDS",
+                        help="latency of one model instead of --latency (repeatable)")
+    parser.add_argument("--token-rate", type=float, default=0.0, help="fake LLM output tokens per second (0 = instant)")
+    parser.add_argument("--reply-tokens", type=int, default=1200, help="length of long completions, tokens")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of LLM calls that fail")
+    parser.add_argument("--error-status", type=int, default=503, help="HTTP status of injected failures")
+    parser.add_argument("--stub-port", type=int, default=0, help="fake Groq server port (default: any free port)")
+    parser.add_argument("--app-port", type=int, default=5099, help="port for the app started by the load test")
+    parser.add_argument("--target", default=None, help="URL of an already running app instead of starting one")
+    parser.add_argument("--json", default=None, help="also write the report to this JSON file")
+    settings = parser.parse_args()
+    settings.concurrency = settings.concurrency or settings.consultants
+
+    stub = FakeGroqServer(
+        port=settings.stub_port,
+        latency=settings.latency,
+        jitter=settings.jitter,
+        token_rate=settings.token_rate,
+        error_rate=settings.error_rate,
+        error_status=settings.error_status,
+        reply_tokens=settings.reply_tokens,
+        model_latency={
+            model_name: float(seconds)
+            for model_name, seconds in (item.split("=", 1) for item in settings.model_latency)
+        }
+    ).start()
+    print(f"🧪 Fake Groq server on {stub.base_url}")
+
+    process = None
+    workspace = None
+    target = settings.target
+    try:
+        if not target:
+            workspace = tempfile.mkdtemp(prefix="aiba-load-")
+            process, target, log_path = start_app(stub.base_url, settings.app_port, workspace)
+            print(f"🚀 App running on {target} (log: {log_path})")
+        else:
+            print(f"🎯 Targeting {target}; it must be started with GROQ_BASE_URL={stub.base_url}")
+
+        stats = LoadStats()
+        slots = threading.Semaphore(settings.concurrency)
+
+        def consultant(index):
+            with slots:
+                run_consultant(index, target, settings.answers, stats)
+
+        threads = []
+        started = time.perf_counter()
+        for index in range(settings.consultants):
+            thread = threading.Thread(target=consultant, args=(index,), daemon=True)
+            thread.start()
+            threads.append(thread)
+            if settings.ramp_seconds:
+                time.sleep(settings.ramp_seconds / settings.consultants)
+        for thread in threads:
+            thread.join()
+        wall_seconds = time.perf_counter() - started
+
+        report = stats.report(wall_seconds)
+        report["llm_calls"] = dict(stub.counters)
+        report["settings"] = vars(settings)
+        print_report(report, stub.counters, settings)
+        if settings.json:
+            with open(settings.json, "w", encoding="utf-8") as f:
+                json.dump(report, f, indent=2)
+            print(f"💾 Report saved to: {settings.json}")
+    finally:
+        if process is not None:
+            process.terminate()
+            try:
+                process.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                process.kill()
+        stub.stop()
+        if workspace and not os.getenv("AIBA_LOAD_TEST_KEEP_WORKSPACE"):
+            shutil.rmtree(workspace, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
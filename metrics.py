@@ -0,0 +1,192 @@
+"""
+Metrics Module
+Counters and histograms built from finished spans, in Prometheus text format for /metrics
+"""
+import math
+import threading
+from tracing import tracer
+
+# Seconds; LLM calls range from sub-second validations to minute-long BRDs
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 20.0, 30.0, 60.0, 120.0)
+QUEUE_BUCKETS = (0.001, 0.005, 0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+TOKEN_BUCKETS = (50, 100, 250, 500, 1000, 2000, 4000, 8000, 16000)
+ATTEMPT_BUCKETS = (1, 2, 3, 4)
+
+
+def escape_label(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def format_labels(labels):
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{name}="{escape_label(value)}"' for name, value in labels) + "}"
+
+
+def format_value(value):
+    if value == math.inf:
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class Counter:
+    """Monotonic count per label combination"""
+
+    type_name = "counter"
+
+    def __init__(self, name, help_text, labelnames=()):
+        self.name = name
+        self.help_text = help_text
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        key = tuple(str(labels.get(name, "")) for name in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def samples(self):
+        with self._lock:
+            values = dict(self._values)
+        for key, value in sorted(values.items()):
+            yield self.name, list(zip(self.labelnames, key)), value
+
+
+class Histogram:
+    """Bucketed observations per label combination (cumulative buckets, sum and count)"""
+
+    type_name = "histogram"
+
+    def __init__(self, name, help_text, labelnames=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets)) + (math.inf,)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = tuple(str(labels.get(name, "")) for name in self.labelnames)
+        with self._lock:
+            entry = self._values.get(key)
+            if entry is None:
+                entry = self._values[key] = {"counts": [0] * len(self.buckets), "sum": 0.0, "count": 0}
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    entry["counts"][index] += 1
+                    break
+            entry["sum"] += value
+            entry["count"] += 1
+
+    def samples(self):
+        with self._lock:
+            values = {key: dict(entry, counts=list(entry["counts"])) for key, entry in self._values.items()}
+        for key, entry in sorted(values.items()):
+            labels = list(zip(self.labelnames, key))
+            cumulative = 0
+            for bound, count in zip(self.buckets, entry["counts"]):
+                cumulative += count
+                yield f"{self.name}_bucket", labels + [("le", format_value(bound))], cumulative
+            yield f"{self.name}_sum", labels, entry["sum"]
+            yield f"{self.name}_count", labels, entry["count"]
+
+
+class MetricsRegistry:
+    """
+    The metrics exposed on /metrics
+
+    Counters and histograms are updated as spans finish. Collectors are
+    functions called at scrape time that return (name, type, help, samples)
+    tuples, for state other modules already keep (cache and router stats).
+    """
+
+    def __init__(self):
+        self._metrics = []
+        self._collectors = []
+
+    def counter(self, name, help_text, labelnames=()):
+        metric = Counter(name, help_text, labelnames)
+        self._metrics.append(metric)
+        return metric
+
+    def histogram(self, name, help_text, labelnames=(), buckets=LATENCY_BUCKETS):
+        metric = Histogram(name, help_text, labelnames, buckets)
+        self._metrics.append(metric)
+        return metric
+
+    def add_collector(self, collector):
+        self._collectors.append(collector)
+
+    def render(self):
+        """Every metric in the Prometheus text exposition format (version 0.0.4)"""
+        families = [(m.name, m.type_name, m.help_text, list(m.samples())) for m in self._metrics]
+        for collector in self._collectors:
+            try:
+                families.extend(collector())
+            except Exception as e:
+                print(f"⚠️  Metrics collector failed: {e}")
+
+        lines = []
+        for name, type_name, help_text, samples in families:
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {type_name}")
+            for sample_name, labels, value in samples:
+                lines.append(f"{sample_name}{format_labels(labels)} {format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+
+# Shared registry and the metrics recorded from spans
+metrics_registry = MetricsRegistry()
+
+http_request_seconds = metrics_registry.histogram(
+    "aiba_http_request_seconds", "Flask request latency", ("route", "method", "status"))
+llm_call_seconds = metrics_registry.histogram(
+    "aiba_llm_call_seconds", "LLM call latency, including fallbacks to other models", ("task", "model", "outcome"))
+llm_queue_seconds = metrics_registry.histogram(
+    "aiba_llm_queue_seconds", "Time an LLM task waited for a worker thread", ("task",), QUEUE_BUCKETS)
+llm_attempts = metrics_registry.histogram(
+    "aiba_llm_attempts", "Models tried per LLM call", ("task",), ATTEMPT_BUCKETS)
+llm_tokens = metrics_registry.histogram(
+    "aiba_llm_tokens", "Tokens per LLM call", ("task", "model", "type"), TOKEN_BUCKETS)
+llm_tokens_total = metrics_registry.counter(
+    "aiba_llm_tokens_total", "Tokens used by LLM calls", ("task", "model", "type"))
+llm_hedges_total = metrics_registry.counter(
+    "aiba_llm_hedges_total", "LLM calls hedged to a second model, by which call answered first", ("task", "winner"))
+
+
+def record_span(span):
+    """Tracer listener: fold a finished span into the histograms"""
+    if span.kind == "http":
+        http_request_seconds.observe(
+            span.duration,
+            route=span.attributes.get("route", ""),
+            method=span.attributes.get("method", ""),
+            status=span.attributes.get("status_code", "")
+        )
+    elif span.kind == "llm":
+        task = span.attributes.get("task", "")
+        model = span.attributes.get("model") or "none"
+        if span.status != "ok":
+            outcome = "error"
+        elif span.attributes.get("cache_hit"):
+            outcome = "cache_hit"
+        else:
+            outcome = "ok"
+        # The unused half of a hedged request only counts towards tokens
+        if not span.attributes.get("hedge_loser"):
+            llm_call_seconds.observe(span.duration, task=task, model=model, outcome=outcome)
+            llm_queue_seconds.observe(span.attributes.get("queue_ms", 0.0) / 1000, task=task)
+            llm_attempts.observe(span.attributes.get("attempts", 0), task=task)
+        if span.attributes.get("hedged"):
+            llm_hedges_total.inc(task=task, winner=span.attributes.get("hedge_winner", "neither"))
+        for token_type in ("prompt", "completion"):
+            tokens = span.attributes.get(f"{token_type}_tokens")
+            if tokens:
+                llm_tokens.observe(tokens, task=task, model=model, type=token_type)
+                llm_tokens_total.inc(tokens, task=task, model=model, type=token_type)
+
+
+tracer.add_listener(record_span)
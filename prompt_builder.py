@@ -0,0 +1,261 @@
+"""
+Prompt Builder Module
+Fits conversation history and research into a per-model token budget
+"""
+import os
+import hashlib
+import threading
+from collections import OrderedDict
+from dotenv import load_dotenv
+
+load_dotenv()
+
+try:
+    import tiktoken
+    TIKTOKEN_AVAILABLE = True
+except ImportError:
+    TIKTOKEN_AVAILABLE = False
+
+# Context window of each model, in tokens
+MODEL_CONTEXT_TOKENS = {
+    "llama-3.1-70b-versatile": 131072,
+    "llama-3.1-8b-instant": 131072,
+    "mixtral-8x7b-32768": 32768,
+    "gemma2-9b-it": 8192
+}
+DEFAULT_CONTEXT_TOKENS = 8192
+
+# Prompt size ceilings, so cost and latency stay flat as sessions grow
+PROMPT_BUDGET_TOKENS = int(os.getenv("AIBA_PROMPT_BUDGET_TOKENS", "6000"))
+BRD_PROMPT_BUDGET_TOKENS = int(os.getenv("AIBA_BRD_PROMPT_BUDGET_TOKENS", "12000"))
+QUESTION_PROMPT_BUDGET_TOKENS = int(os.getenv("AIBA_QUESTION_PROMPT_BUDGET_TOKENS", "3000"))
+
+# Exchanges kept word for word; older ones are condensed
+RECENT_EXCHANGES = int(os.getenv("AIBA_PROMPT_RECENT_EXCHANGES", "4"))
+SUMMARY_CACHE_SIZE = int(os.getenv("AIBA_PROMPT_SUMMARY_CACHE_SIZE", "4096"))
+
+# Token counts are estimates (the models don't use tiktoken's vocabulary), so leave headroom
+SAFETY_MARGIN = 0.9
+# Per-message overhead of the chat format
+MESSAGE_OVERHEAD_TOKENS = 4
+CONDENSED_QUESTION_WORDS = 25
+CONDENSED_ANSWER_WORDS = 60
+
+
+def split_exchanges(conversation_history):
+    """Pair assistant questions with the user answers that follow them"""
+    exchanges = []
+    question = None
+    for msg in conversation_history or []:
+        if msg.get("role") == "assistant":
+            if question is not None:
+                exchanges.append((question, None))
+            question = msg.get("content", "")
+        elif msg.get("role") == "user":
+            exchanges.append((question, msg.get("content", "")))
+            question = None
+    if question is not None:
+        exchanges.append((question, None))
+    return exchanges
+
+
+def exchange_messages(exchanges):
+    """Turn (question, answer) pairs back into chat messages"""
+    messages = []
+    for question, answer in exchanges:
+        if question is not None:
+            messages.append({"role": "assistant", "content": question})
+        if answer is not None:
+            messages.append({"role": "user", "content": answer})
+    return messages
+
+
+def condense_text(text, max_words):
+    """Leading sentences of text, up to max_words"""
+    words = " ".join(text.split()).split(" ")
+    if len(words) <= max_words:
+        return " ".join(words)
+    clipped = " ".join(words[:max_words])
+    # End on a sentence boundary when one is reasonably close
+    sentence_end = max(clipped.rfind(". "), clipped.rfind("? "), clipped.rfind("! "))
+    if sentence_end > len(clipped) // 2:
+        return clipped[:sentence_end + 1]
+    return clipped + "…"
+
+
+class PromptBuilder:
+    """
+    Counts tokens locally and trims prompts to fit a model's budget
+
+    The most recent exchanges are kept verbatim. Older ones are condensed to
+    a line each (cached, so every exchange is condensed once) and the oldest
+    lines are dropped if even the condensed history doesn't fit. Counting
+    uses tiktoken when it's installed and a characters/4 estimate otherwise.
+    """
+
+    def __init__(self, recent_exchanges=RECENT_EXCHANGES, cache_size=SUMMARY_CACHE_SIZE):
+        self.recent_exchanges = recent_exchanges
+        self.cache_size = cache_size
+        self._condensed = OrderedDict()
+        self._lock = threading.Lock()
+        self._encoding = None
+        self._encoding_loaded = False
+
+    def _get_encoding(self):
+        if not self._encoding_loaded:
+            self._encoding_loaded = True
+            if TIKTOKEN_AVAILABLE:
+                try:
+                    self._encoding = tiktoken.get_encoding("cl100k_base")
+                except Exception as e:
+                    # The vocabulary is downloaded on first use and may be unreachable
+                    print(f"⚠️  tiktoken encoding unavailable, estimating token counts: {e}")
+        return self._encoding
+
+    def count_tokens(self, text):
+        if not text:
+            return 0
+        encoding = self._get_encoding()
+        if encoding is not None:
+            return len(encoding.encode(text, disallowed_special=()))
+        return (len(text) + 3) // 4
+
+    def count_messages(self, messages):
+        return sum(self.count_tokens(msg.get("content", "")) + MESSAGE_OVERHEAD_TOKENS for msg in messages)
+
+    def budget_for(self, model_name, reserve_tokens=0, ceiling=PROMPT_BUDGET_TOKENS):
+        """Prompt tokens available on model_name, leaving reserve_tokens for the reply"""
+        context_tokens = MODEL_CONTEXT_TOKENS.get(model_name, DEFAULT_CONTEXT_TOKENS)
+        return max(0, int(min(ceiling, context_tokens - reserve_tokens) * SAFETY_MARGIN))
+
+    def fit_text(self, text, max_tokens):
+        """text cut down to at most max_tokens"""
+        if not text or max_tokens <= 0:
+            return ""
+        if self.count_tokens(text) <= max_tokens:
+            return text
+        encoding = self._get_encoding()
+        if encoding is not None:
+            clipped = encoding.decode(encoding.encode(text, disallowed_special=())[:max_tokens - 1])
+        else:
+            clipped = text[:(max_tokens - 1) * 4]
+        # Don't end mid-word
+        if " " in clipped:
+            clipped = clipped[:clipped.rfind(" ")]
+        return clipped + "…"
+
+    def condense_exchange(self, question, answer):
+        """One-line version of an exchange, cached by content"""
+        key = hashlib.sha1(f"{question}\0{answer}".encode("utf-8")).hexdigest()
+        with self._lock:
+            line = self._condensed.get(key)
+            if line is not None:
+                self._condensed.move_to_end(key)
+                return line
+
+        parts = []
+        if question:
+            parts.append(f"Q: {condense_text(question, CONDENSED_QUESTION_WORDS)}")
+        if answer is not None:
+            if answer.strip().lower() in ("skip", "done", "quit"):
+                parts.append("A: (skipped)")
+            else:
+                parts.append(f"A: {condense_text(answer, CONDENSED_ANSWER_WORDS)}")
+        line = " → ".join(parts)
+
+        with self._lock:
+            self._condensed[key] = line
+            while len(self._condensed) > self.cache_size:
+                self._condensed.popitem(last=False)
+        return line
+
+    def fit_exchanges(self, exchanges, max_tokens, condensed=None):
+        """
+        Split exchanges into condensed older lines and verbatim recent ones
+
+        Args:
+            exchanges: Sequence of (question, answer) pairs
+            max_tokens: Token budget for the result
+            condensed: Optional one-line versions of the first exchanges (e.g. from a
+                ConversationSummary), used instead of condensing them again
+
+        Returns:
+            tuple of (list of condensed lines, list of recent (question, answer) pairs)
+        """
+        if max_tokens <= 0 or not exchanges:
+            return [], []
+
+        split_at = max(0, len(exchanges) - self.recent_exchanges)
+        recent = exchanges[split_at:]
+        # Verbatim turns get at most three quarters of the budget
+        while len(recent) > 1 and self._exchanges_tokens(recent) > max_tokens * 3 // 4:
+            recent = recent[1:]
+            split_at += 1
+        if self._exchanges_tokens(recent) > max_tokens:
+            question, answer = recent[0]
+            answer_budget = max_tokens - self.count_tokens(question or "") - 2 * MESSAGE_OVERHEAD_TOKENS
+            recent = [(question, self.fit_text(answer or "", answer_budget) if answer is not None else None)]
+
+        remaining = max_tokens - self._exchanges_tokens(recent)
+        lines = []
+        for index in range(split_at - 1, -1, -1):
+            if condensed is not None and index < len(condensed):
+                line = condensed[index]
+            else:
+                line = self.condense_exchange(*exchanges[index])
+            cost = self.count_tokens(line) + 1
+            if cost > remaining:
+                break
+            lines.append(line)
+            remaining -= cost
+        lines.reverse()
+
+        omitted = split_at - len(lines)
+        if omitted:
+            lines.insert(0, f"({omitted} earlier exchange(s) omitted)")
+        return lines, recent
+
+    def fit_history(self, conversation_history, max_tokens):
+        """Chat messages for conversation_history that fit in max_tokens"""
+        lines, recent = self.fit_exchanges(split_exchanges(conversation_history), max_tokens)
+        messages = []
+        if lines:
+            messages.append({
+                "role": "system",
+                "content": "Earlier in this conversation (condensed):\n" + "\n".join(lines)
+            })
+        messages.extend(exchange_messages(recent))
+        return messages
+
+    def transcript(self, conversation_history, max_tokens, summary=None):
+        """
+        Plain-text Q/A transcript of conversation_history that fits in max_tokens
+
+        With the session's ConversationSummary, older exchanges come from its
+        condensed lines instead of a fresh pass over the history.
+        """
+        if summary is not None:
+            return self.fit_transcript(summary.exchanges(conversation_history), max_tokens, summary.lines)
+        return self.fit_transcript(split_exchanges(conversation_history), max_tokens)
+
+    def fit_transcript(self, exchanges, max_tokens, condensed=None):
+        """Plain-text transcript of (question, answer) pairs that fits in max_tokens"""
+        lines, recent = self.fit_exchanges(exchanges, max_tokens, condensed)
+        blocks = []
+        if lines:
+            blocks.append("Earlier exchanges (condensed):\n" + "\n".join(f"- {line}" for line in lines))
+        for question, answer in recent:
+            block = []
+            if question is not None:
+                block.append(f"Q: {question}")
+            if answer is not None:
+                block.append(f"A: {answer}")
+            blocks.append("\n".join(block))
+        return "\n\n".join(blocks)
+
+    def _exchanges_tokens(self, exchanges):
+        return self.count_messages(exchange_messages(exchanges))
+
+
+# Shared builder instance
+prompt_builder = PromptBuilder()
@@ -0,0 +1,106 @@
+"""
+Question Prefetch Module
+Speculatively generates the next adaptive question in the background
+"""
+import os
+import json
+import hashlib
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from dotenv import load_dotenv
+
+from customer_research import generate_adaptive_question
+from tracing import in_current_context
+
+load_dotenv()
+
+PREFETCH_ENABLED = os.getenv("AIBA_PREFETCH_QUESTIONS", "1") != "0"
+PREFETCH_WORKERS = int(os.getenv("AIBA_PREFETCH_WORKERS", "8"))
+# How long a request waits for an in-flight prefetch before giving up on it
+PREFETCH_WAIT_SECONDS = float(os.getenv("AIBA_PREFETCH_WAIT_SECONDS", "30"))
+
+
+def prefetch_key(conversation_history, customer_research, phase, project_topic):
+    """Hash of everything generate_adaptive_question depends on"""
+    payload = json.dumps(
+        [conversation_history, customer_research, phase, project_topic],
+        ensure_ascii=False,
+        sort_keys=True
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class QuestionPrefetcher:
+    """
+    Holds at most one speculative question per session
+
+    start() kicks off generation for the history as it stands now; take()
+    returns that question only if the history, research, phase and topic
+    of the real request hash to the same key. Anything else is discarded.
+    """
+
+    def __init__(self, max_workers=PREFETCH_WORKERS):
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="question-prefetch")
+        self._pending = {}
+        self._lock = threading.Lock()
+
+    def start(self, session_id, conversation_history, customer_research, phase, project_topic, summary=None):
+        """Begin generating the next question for this session in the background"""
+        if not PREFETCH_ENABLED or not session_id:
+            return
+
+        # Snapshot the history so later appends don't change what is generated
+        history = list(conversation_history)
+        key = prefetch_key(history, customer_research, phase, project_topic)
+        future = self._executor.submit(
+            in_current_context(generate_adaptive_question),
+            history,
+            customer_research,
+            phase=phase,
+            project_topic=project_topic,
+            summary=summary
+        )
+
+        with self._lock:
+            previous = self._pending.pop(session_id, None)
+            self._pending[session_id] = (key, future)
+        if previous:
+            previous[1].cancel()
+
+    def take(self, session_id, conversation_history, customer_research, phase, project_topic):
+        """
+        Return the prefetched (question, model_used) if it matches this request
+
+        Returns (None, None) on a miss; a mismatched or failed prefetch is thrown away.
+        """
+        if not session_id:
+            return None, None
+
+        with self._lock:
+            entry = self._pending.pop(session_id, None)
+        if entry is None:
+            return None, None
+
+        key, future = entry
+        if key != prefetch_key(conversation_history, customer_research, phase, project_topic):
+            future.cancel()
+            print("🗑️  Discarding prefetched question (conversation changed)")
+            return None, None
+
+        try:
+            question, model_used = future.result(timeout=PREFETCH_WAIT_SECONDS)
+        except Exception as e:
+            print(f"⚠️  Prefetched question unavailable: {e}")
+            return None, None
+
+        return question, model_used
+
+    def discard(self, session_id):
+        with self._lock:
+            entry = self._pending.pop(session_id, None)
+        if entry:
+            entry[1].cancel()
+
+
+# Shared prefetcher instance
+question_prefetcher = QuestionPrefetcher()
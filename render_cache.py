@@ -0,0 +1,138 @@
+"""
+Render Cache Module
+Content-addressed cache of rendered BRD HTML and PDF files
+"""
+import os
+import shutil
+import hashlib
+import threading
+from dotenv import load_dotenv
+
+load_dotenv()
+
+CACHE_DIR = os.getenv("AIBA_RENDER_CACHE_DIR", os.path.join(".aiba_cache", "render"))
+MAX_BYTES = int(float(os.getenv("AIBA_RENDER_CACHE_MAX_MB", "200")) * 1024 * 1024)
+# Bump when the HTML template or stylesheet changes so old renders are not reused
+RENDER_VERSION = "2"
+
+
+def render_key(markdown_content):
+    """Content address for a BRD's markdown"""
+    payload = f"{RENDER_VERSION}\0{markdown_content}"
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class RenderCache:
+    """
+    Rendered HTML and PDF files named by the hash of their markdown
+
+    A hit costs a stat plus a hard link (or copy) to the requested output
+    name. Reads touch the file's mtime, and once the cache grows past
+    max_bytes the least recently used files are evicted. Files are written
+    atomically, so worker processes can share the directory.
+    """
+
+    def __init__(self, cache_dir=CACHE_DIR, max_bytes=MAX_BYTES):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+
+    def _path(self, key, extension):
+        return os.path.join(self.cache_dir, f"{key}.{extension}")
+
+    def get_html(self, key):
+        path = self._path(key, "html")
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                html_content = f.read()
+        except OSError:
+            return None
+        self._touch(path)
+        return html_content
+
+    def put_html(self, key, html_content):
+        self._write(self._path(key, "html"), html_content.encode("utf-8"))
+
+    def link_pdf(self, key, pdf_filename):
+        """Place the cached PDF at pdf_filename; returns False on a miss"""
+        path = self._path(key, "pdf")
+        if not os.path.exists(path):
+            return False
+        try:
+            self._place(path, pdf_filename)
+        except OSError as e:
+            print(f"⚠️  Could not reuse cached PDF: {e}")
+            return False
+        self._touch(path)
+        return True
+
+    def put_pdf(self, key, pdf_filename):
+        """Store a freshly rendered PDF file in the cache"""
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            self._place(pdf_filename, self._path(key, "pdf"))
+        except OSError as e:
+            print(f"⚠️  Could not cache PDF: {e}")
+            return
+        self._evict()
+
+    def _place(self, src, dest):
+        # Hard link where possible (no copy), atomically replacing dest
+        tmp_path = f"{dest}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            os.link(src, tmp_path)
+        except OSError:
+            shutil.copyfile(src, tmp_path)
+        os.replace(tmp_path, dest)
+
+    def _write(self, path, data):
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(tmp_path, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            print(f"⚠️  Could not write render cache entry: {e}")
+            return
+        self._evict()
+
+    def _touch(self, path):
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+
+    def _evict(self):
+        """Remove least recently used files until the cache fits in max_bytes"""
+        with self._lock:
+            entries = []
+            total = 0
+            try:
+                names = os.listdir(self.cache_dir)
+            except OSError:
+                return
+            for name in names:
+                if name.endswith(".tmp"):
+                    continue
+                path = os.path.join(self.cache_dir, name)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, path))
+                total += stat.st_size
+
+            entries.sort()
+            for _, size, path in entries:
+                if total <= self.max_bytes:
+                    break
+                try:
+                    os.remove(path)
+                    total -= size
+                except OSError:
+                    pass
+
+
+# Shared cache instance
+render_cache = RenderCache()
@@ -0,0 +1,139 @@
+"""
+Render Queue Module
+Renders BRD PDFs in a process pool, off the request path
+"""
+import os
+import time
+import uuid
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, Future
+from concurrent.futures.process import BrokenProcessPool
+from dotenv import load_dotenv
+
+from render_cache import render_cache, render_key
+from brd_renderer import save_brd_pdf, warm_up
+from artifact_store import artifact_store
+
+load_dotenv()
+
+RENDER_WORKERS = int(os.getenv("AIBA_RENDER_WORKERS", str(os.cpu_count() or 2)))
+# Finished jobs are forgotten after this long
+JOB_TTL_SECONDS = float(os.getenv("AIBA_RENDER_JOB_TTL_SECONDS", "3600"))
+
+
+def render_pdf_job(full_content, pdf_filename, session_id=None):
+    """Runs in a worker process: render the markdown to pdf_filename"""
+    if not save_brd_pdf(full_content, pdf_filename, session_id):
+        raise RuntimeError("PDF generation failed or is not available")
+    return pdf_filename
+
+
+class RenderQueue:
+    """
+    Process pool for PDF rendering, with job ids for polling
+
+    WeasyPrint rendering is CPU-bound, so it runs in separate processes
+    (one per core by default) instead of request threads. Workers are
+    spawned rather than forked, so they don't inherit the server's threads,
+    and each loads the renderer once at startup.
+    """
+
+    def __init__(self, max_workers=RENDER_WORKERS):
+        self.max_workers = max_workers
+        self._executor = None
+        self._jobs = {}
+        self._lock = threading.Lock()
+
+    def _get_executor(self):
+        # Created on first use so importing the module never starts processes
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.max_workers,
+                mp_context=multiprocessing.get_context("spawn"),
+                # Load markdown, WeasyPrint and the stylesheet before the first job
+                initializer=warm_up
+            )
+        return self._executor
+
+    def submit(self, full_content, pdf_filename, session_id=None):
+        """
+        Queue a PDF render and return its job id
+
+        A job already queued, rendering or done for the same markdown and
+        file name is returned instead of starting another one.
+        """
+        key = render_key(full_content)
+        with self._lock:
+            self._prune()
+            for existing_id, job in self._jobs.items():
+                if job["key"] == key and job["pdf_filename"] == pdf_filename and not self._failed(job["future"]):
+                    print(f"✅ PDF render {existing_id} already queued: {pdf_filename}")
+                    return existing_id
+
+            job_id = uuid.uuid4().hex
+            cached = render_cache.link_pdf(key, artifact_store.path(pdf_filename))
+            if cached:
+                # Same markdown as an earlier render; nothing to queue
+                artifact_store.record(pdf_filename, "pdf", session_id)
+                future = Future()
+                future.set_result(pdf_filename)
+            else:
+                try:
+                    future = self._get_executor().submit(render_pdf_job, full_content, pdf_filename, session_id)
+                except BrokenProcessPool:
+                    # A worker died (e.g. crashed in a native library); start a fresh pool
+                    print("⚠️  PDF render pool broken, restarting it")
+                    self._executor = None
+                    future = self._get_executor().submit(render_pdf_job, full_content, pdf_filename, session_id)
+            self._jobs[job_id] = {
+                "key": key,
+                "future": future,
+                "pdf_filename": pdf_filename,
+                "submitted_at": time.time()
+            }
+
+        if cached:
+            print(f"✅ PDF reused from render cache: {pdf_filename}")
+        else:
+            print(f"🖨️  Queued PDF render {job_id}: {pdf_filename}")
+        return job_id
+
+    def status(self, job_id):
+        """
+        Current state of a render job, or None if the id is unknown
+
+        Returns:
+            dict with job_id, status (queued, rendering, done, failed),
+            pdf_filename once done, and error if it failed
+        """
+        with self._lock:
+            job = self._jobs.get(job_id)
+        if job is None:
+            return None
+
+        future = job["future"]
+        result = {"job_id": job_id, "status": "queued", "pdf_filename": None}
+        if future.done():
+            try:
+                result["pdf_filename"] = future.result()
+                result["status"] = "done"
+            except Exception as e:
+                result["status"] = "failed"
+                result["error"] = str(e)
+        elif future.running():
+            result["status"] = "rendering"
+        return result
+
+    def _failed(self, future):
+        return future.done() and (future.cancelled() or future.exception() is not None)
+
+    def _prune(self):
+        cutoff = time.time() - JOB_TTL_SECONDS
+        for job_id in [job_id for job_id, job in self._jobs.items()
+                       if job["future"].done() and job["submitted_at"] < cutoff]:
+            del self._jobs[job_id]
+
+
+# Shared queue instance
+render_queue = RenderQueue()
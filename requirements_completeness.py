@@ -2,18 +2,13 @@
 Requirements Completeness Scoring Module
 Tracks and scores completeness of requirements across different BRD sections
 """
-import os
-from groq import Groq
 from dotenv import load_dotenv
 import json
+from llm_client import complete_text, LLMUnavailableError
+from keyword_index import keyword_index
 
 load_dotenv()
 
-api_key = os.getenv("GROQ_API_KEY") or os.getenv("GROQ_API")
-client = Groq(api_key=api_key) if api_key else Groq()
-
-models_to_try = ["llama-3.1-70b-versatile", "llama-3.1-8b-instant", "mixtral-8x7b-32768", "gemma2-9b-it"]
-
 
 # Define required sections for different project types
 REQUIREMENT_SECTIONS = {
@@ -58,7 +53,103 @@ REQUIREMENT_SECTIONS = {
 }
 
 
-def calculate_completeness_score(conversation_history, project_type="ai_ml", project_context=""):
+# Most new conversation text sent to the LLM in one scoring call
+MAX_BATCH_CHARS = 4000
+
+
+class CompletenessTracker:
+    """
+    Per-section completeness state, updated from new exchanges only
+
+    Each update() scores just the messages added since the previous call,
+    given the current section scores, so the cost per turn stays flat as
+    the conversation grows. Scores never go down. Keyword hits are kept
+    per section for the fallback used when the LLM is unavailable.
+    The state is a plain dict (to_dict/from_dict) so it can live in a session.
+    """
+
+    def __init__(self, project_type="ai_ml", section_scores=None, keyword_hits=None, messages_scored=0):
+        self.project_type = project_type
+        self.sections = REQUIREMENT_SECTIONS.get(project_type, REQUIREMENT_SECTIONS["general"])
+        self.section_scores = {section: 0.0 for section in self.sections}
+        self.section_scores.update(section_scores or {})
+        self.keyword_hits = {section: set((keyword_hits or {}).get(section, [])) for section in self.sections}
+        self.messages_scored = messages_scored
+
+    @classmethod
+    def from_dict(cls, state, project_type="ai_ml"):
+        if not state or state.get("project_type", project_type) != project_type:
+            return cls(project_type)
+        return cls(
+            project_type,
+            section_scores=state.get("section_scores"),
+            keyword_hits=state.get("keyword_hits"),
+            messages_scored=state.get("messages_scored", 0)
+        )
+
+    def to_dict(self):
+        return {
+            "project_type": self.project_type,
+            "section_scores": dict(self.section_scores),
+            "keyword_hits": {section: sorted(hits) for section, hits in self.keyword_hits.items()},
+            "messages_scored": self.messages_scored
+        }
+
+    def update(self, conversation_history, project_context="", summary=None):
+        """
+        Score the messages added since the last update
+
+        With the session's ConversationSummary, its keyword hits are used
+        instead of scanning the new messages again.
+        """
+        if len(conversation_history) < self.messages_scored:
+            # History was replaced (e.g. a client resent a shorter one); start over
+            self.__init__(self.project_type)
+
+        if summary is not None:
+            for section in self.sections:
+                self.keyword_hits[section].update(summary.keyword_hits.get(section, ()))
+
+        new_messages = conversation_history[self.messages_scored:]
+        for batch in batch_exchanges(new_messages):
+            self._score_batch(batch, project_context, scan_keywords=summary is None)
+        self.messages_scored = len(conversation_history)
+
+    def _score_batch(self, exchange_text, project_context, scan_keywords=True):
+        if scan_keywords:
+            section_hits = keyword_index.scan(exchange_text)["section_hits"]
+            for section in self.sections:
+                self.keyword_hits[section].update(section_hits.get(section, ()))
+
+        scores = analyze_new_exchanges(exchange_text, self.section_scores, self.project_type, project_context)
+        if scores is None:
+            scores = basic_section_scoring(self.keyword_hits)
+
+        for section, score in scores.items():
+            if section in self.section_scores:
+                self.section_scores[section] = max(self.section_scores[section], score)
+
+    def result(self):
+        """Completeness result in the calculate_completeness_score format"""
+        overall_score = 0.0
+        for section_name, section_config in self.sections.items():
+            weight = section_config.get("weight", 0.1)
+            overall_score += weight * self.section_scores.get(section_name, 0.0)
+
+        section_scores = dict(self.section_scores)
+        missing_items = identify_missing_items(section_scores, self.sections)
+        recommendations = generate_recommendations(section_scores, missing_items, self.project_type)
+
+        return {
+            "overall_score": round(overall_score, 2),
+            "section_scores": section_scores,
+            "missing_items": missing_items,
+            "recommendations": recommendations,
+            "ready_for_brd": overall_score >= 0.7  # 70% threshold
+        }
+
+
+def calculate_completeness_score(conversation_history, project_type="ai_ml", project_context="", state=None, summary=None):
     """
     Calculate overall requirements completeness score
     
@@ -66,6 +157,9 @@ def calculate_completeness_score(conversation_history, project_type="ai_ml", pro
         conversation_history: List of conversation messages
         project_type: Type of project (ai_ml, general, etc.)
         project_context: Project context string
+        state: Tracker state from a previous call (CompletenessTracker.to_dict());
+               only messages added since then are scored
+        summary: The session's ConversationSummary, for its keyword coverage
     
     Returns:
         dict with:
@@ -73,57 +167,56 @@ def calculate_completeness_score(conversation_history, project_type="ai_ml", pro
             - section_scores: dict of section scores
             - missing_items: list of missing requirements
             - recommendations: list of recommendations
+            - state: tracker state to pass to the next call
     """
-    # Extract key information from conversation
-    conversation_text = "\n".join([
-        f"{msg['role']}: {msg['content']}" 
-        for msg in conversation_history
-    ])
-    
-    # Get section scores using AI analysis
-    section_scores = analyze_sections(conversation_text, project_type, project_context)
-    
-    # Calculate weighted overall score
-    sections = REQUIREMENT_SECTIONS.get(project_type, REQUIREMENT_SECTIONS["general"])
-    overall_score = 0.0
+    tracker = CompletenessTracker.from_dict(state, project_type)
+    tracker.update(conversation_history, project_context, summary)
     
-    for section_name, section_config in sections.items():
-        weight = section_config.get("weight", 0.1)
-        score = section_scores.get(section_name, 0.0)
-        overall_score += weight * score
-    
-    # Identify missing items
-    missing_items = identify_missing_items(section_scores, sections)
-    
-    # Generate recommendations
-    recommendations = generate_recommendations(section_scores, missing_items, project_type)
-    
-    return {
-        "overall_score": round(overall_score, 2),
-        "section_scores": section_scores,
-        "missing_items": missing_items,
-        "recommendations": recommendations,
-        "ready_for_brd": overall_score >= 0.7  # 70% threshold
-    }
-
-
-def analyze_sections(conversation_text, project_type, project_context):
-    """Analyze conversation and score each section"""
+    result = tracker.result()
+    result["state"] = tracker.to_dict()
+    return result
+
+
+def batch_exchanges(messages, max_chars=MAX_BATCH_CHARS):
+    """Group new messages into conversation text batches of at most max_chars"""
+    batches = []
+    current = []
+    current_len = 0
+    for msg in messages:
+        line = f"{msg['role']}: {msg['content']}"[:max_chars]
+        if current and current_len + len(line) > max_chars:
+            batches.append("\n".join(current))
+            current = []
+            current_len = 0
+        current.append(line)
+        current_len += len(line) + 1
+    if current:
+        batches.append("\n".join(current))
+    return batches
+
+
+def analyze_new_exchanges(exchange_text, current_scores, project_type, project_context):
+    """
+    Update section scores with new conversation exchanges
     
+    Returns the updated scores, or None if the LLM could not be used.
+    """
     sections = REQUIREMENT_SECTIONS.get(project_type, REQUIREMENT_SECTIONS["general"])
+    expected_scores = ",\n".join(f'    "{section}": 0.0-1.0' for section in sections)
     
     analysis_prompt = f"""
-You are a requirements analyst evaluating the completeness of a requirements discovery conversation.
+You are a requirements analyst tracking the completeness of a requirements discovery conversation.
 
 Project Context: {project_context[:300]}
 
-Conversation:
-{conversation_text[-2000]}  # Last 2000 chars for context
+Current completeness scores from the conversation so far (0.0 = not covered, 1.0 = fully covered):
+{json.dumps(current_scores, indent=2)}
 
-Evaluate completeness for each section (0.0 = not covered, 1.0 = fully covered):
+New exchanges:
+{exchange_text}
 
-Sections to evaluate:
-{', '.join(sections.keys())}
+Update the score for each section, taking the new exchanges into account on top of what is already covered.
+A score only goes up when the new exchanges add information for that section.
 
 For each section, assess:
 - Is information present?
@@ -132,80 +225,51 @@ For each section, assess:
 
 Respond in JSON format:
 {{
-    "business_objectives": 0.0-1.0,
-    "functional_requirements": 0.0-1.0,
-    "technical_requirements": 0.0-1.0,
-    "non_functional": 0.0-1.0,
-    "stakeholders": 0.0-1.0,
-    "scope": 0.0-1.0,
-    "timeline": 0.0-1.0
+{expected_scores}
 }}
 
-Only include sections that exist. Be strict but fair.
+Be strict but fair.
 """
     
     try:
-        for model_name in models_to_try:
-            try:
-                response = client.chat.completions.create(
-                    model=model_name,
-                    messages=[
-                        {
-                            "role": "system",
-                            "content": "You are a requirements analyst. Evaluate completeness objectively. Respond only with valid JSON."
-                        },
-                        {
-                            "role": "user",
-                            "content": analysis_prompt
-                        }
-                    ],
-                    temperature=0.3,
-                    max_tokens=500,
-                    response_format={"type": "json_object"}
-                )
-                
-                result_text = response.choices[0].message.content
-                scores = json.loads(result_text)
-                
-                # Ensure all sections have scores
-                default_scores = {section: 0.0 for section in sections.keys()}
-                default_scores.update(scores)
-                
-                return default_scores
-            except Exception as e:
-                continue
+        result_text, _ = complete_text(
+            [
+                {
+                    "role": "system",
+                    "content": "You are a requirements analyst. Evaluate completeness objectively. Respond only with valid JSON."
+                },
+                {
+                    "role": "user",
+                    "content": analysis_prompt
+                }
+            ],
+            task="analyze_sections",
+            cache=True,
+            temperature=0.3,
+            max_tokens=500,
+            response_format={"type": "json_object"}
+        )
+        scores = json.loads(result_text)
         
-        # Fallback: basic keyword-based scoring
-        return basic_section_scoring(conversation_text, sections)
+        return {
+            section: min(1.0, max(0.0, float(score)))
+            for section, score in scores.items()
+            if section in sections
+        }
+    except LLMUnavailableError:
+        return None
     except Exception as e:
         print(f"Error analyzing sections: {e}")
-        return basic_section_scoring(conversation_text, sections)
+        return None
 
 
-def basic_section_scoring(conversation_text, sections):
+def basic_section_scoring(keyword_hits):
     """Basic keyword-based scoring fallback"""
-    text_lower = conversation_text.lower()
-    
-    scores = {}
-    
-    # Keywords for each section
-    keywords = {
-        "business_objectives": ["objective", "goal", "purpose", "aim", "target", "success"],
-        "functional_requirements": ["feature", "function", "capability", "requirement", "need"],
-        "technical_requirements": ["technical", "infrastructure", "system", "architecture", "data", "model"],
-        "non_functional": ["performance", "security", "scalability", "compliance", "reliability"],
-        "stakeholders": ["stakeholder", "user", "persona", "role", "team"],
-        "scope": ["scope", "include", "exclude", "assumption", "constraint"],
-        "timeline": ["timeline", "schedule", "milestone", "phase", "deadline"]
+    # Simple scoring: more keywords = higher score (capped at 0.8)
+    return {
+        section: min(0.8, len(hits) * 0.2)
+        for section, hits in keyword_hits.items()
     }
-    
-    for section in sections.keys():
-        section_keywords = keywords.get(section, [])
-        matches = sum(1 for keyword in section_keywords if keyword in text_lower)
-        # Simple scoring: more keywords = higher score (capped at 0.8)
-        scores[section] = min(0.8, matches * 0.2)
-    
-    return scores
 
 
 def identify_missing_items(section_scores, sections):
@@ -0,0 +1,160 @@
+"""
+Customer Research Cache Module
+Persistent, content-addressed cache of customer research results
+"""
+import os
+import re
+import json
+import time
+import hashlib
+import threading
+from dotenv import load_dotenv
+from tracing import in_current_context
+
+load_dotenv()
+
+CACHE_DIR = os.getenv("AIBA_RESEARCH_CACHE_DIR", os.path.join(".aiba_cache", "research"))
+TTL_SECONDS = float(os.getenv("AIBA_RESEARCH_TTL_SECONDS", str(7 * 24 * 3600)))
+REFRESH_AFTER_SECONDS = float(os.getenv("AIBA_RESEARCH_REFRESH_AFTER_SECONDS", str(24 * 3600)))
+MAX_ENTRIES = int(os.getenv("AIBA_RESEARCH_CACHE_MAX_ENTRIES", "500"))
+
+# Legal suffixes that don't change who the customer is
+COMPANY_SUFFIXES = {"ltd", "limited", "inc", "incorporated", "llc", "llp", "plc", "pvt", "private", "corp", "corporation", "co", "gmbh"}
+
+
+def normalize_name(name):
+    """Normalise a customer/company name so spelling variants share a cache entry"""
+    if not name:
+        return ""
+    words = re.sub(r"[^\w&]+", " ", name.casefold()).split()
+    while words and words[-1] in COMPANY_SUFFIXES:
+        words.pop()
+    return " ".join(words)
+
+
+def research_cache_key(customer_name, company_name=None):
+    """Content address for a customer/company pair"""
+    identity = f"{normalize_name(customer_name)}|{normalize_name(company_name)}"
+    return hashlib.sha256(identity.encode("utf-8")).hexdigest()
+
+
+class ResearchCache:
+    """
+    One JSON file per research result, named by its content address
+
+    Entries older than ttl_seconds are dropped on read. Entries older than
+    refresh_after_seconds are still served but flagged as stale so callers
+    can refresh them in the background. Once more than max_entries are
+    stored the oldest ones are evicted.
+    """
+
+    def __init__(self, cache_dir=CACHE_DIR, ttl_seconds=TTL_SECONDS,
+                 refresh_after_seconds=REFRESH_AFTER_SECONDS, max_entries=MAX_ENTRIES):
+        self.cache_dir = cache_dir
+        self.ttl_seconds = ttl_seconds
+        self.refresh_after_seconds = refresh_after_seconds
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._refreshing = set()
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, f"{key}.json")
+
+    def get(self, customer_name, company_name=None):
+        """Return the cached entry (with a 'stale' flag) or None"""
+        path = self._path(research_cache_key(customer_name, company_name))
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            return None
+
+        age = time.time() - entry.get("created_at", 0)
+        if age > self.ttl_seconds:
+            self._remove(path)
+            return None
+
+        entry["stale"] = age > self.refresh_after_seconds
+        return entry
+
+    def put(self, customer_name, company_name, research, model):
+        """Store a research result and evict old entries if over capacity"""
+        key = research_cache_key(customer_name, company_name)
+        entry = {
+            "customer_name": customer_name,
+            "company_name": company_name,
+            "research": research,
+            "model": model,
+            "created_at": time.time()
+        }
+
+        with self._lock:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            # Write to a temp file first so readers never see a partial entry
+            tmp_path = self._path(key) + f".{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(entry, f, ensure_ascii=False)
+            os.replace(tmp_path, self._path(key))
+            self._evict()
+
+    def _evict(self):
+        """Drop expired entries, then the oldest ones until within max_entries"""
+        try:
+            names = [name for name in os.listdir(self.cache_dir) if name.endswith(".json")]
+        except OSError:
+            return
+
+        if len(names) <= self.max_entries:
+            return
+
+        entries = []
+        now = time.time()
+        for name in names:
+            path = os.path.join(self.cache_dir, name)
+            try:
+                modified = os.path.getmtime(path)
+            except OSError:
+                continue
+            if now - modified > self.ttl_seconds:
+                self._remove(path)
+            else:
+                entries.append((modified, path))
+
+        entries.sort()
+        for _, path in entries[:max(0, len(entries) - self.max_entries)]:
+            self._remove(path)
+
+    def _remove(self, path):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+    def refresh_in_background(self, customer_name, company_name, research_fn):
+        """
+        Re-run research_fn(customer_name, company_name) in a daemon thread and
+        store the result; only one refresh per key runs at a time
+        """
+        key = research_cache_key(customer_name, company_name)
+        with self._lock:
+            if key in self._refreshing:
+                return
+            self._refreshing.add(key)
+
+        def refresh():
+            try:
+                research, model = research_fn(customer_name, company_name)
+                if research:
+                    self.put(customer_name, company_name, research, model)
+                    print(f"🔄 Refreshed cached research for {customer_name}")
+            except Exception as e:
+                print(f"⚠️  Background research refresh failed: {e}")
+            finally:
+                with self._lock:
+                    self._refreshing.discard(key)
+
+        threading.Thread(target=in_current_context(refresh), daemon=True).start()
+
+
+# Shared cache instance
+research_cache = ResearchCache()
@@ -0,0 +1,46 @@
+"""
+AIBA Server Module
+Serves the web app cooperatively so requests waiting on the LLM don't hold OS threads
+"""
+import os
+
+try:
+    # Must run before anything imports socket, ssl or threading
+    from gevent import monkey
+    monkey.patch_all()
+    GEVENT_AVAILABLE = True
+except ImportError:
+    GEVENT_AVAILABLE = False
+
+# Each in-flight request is a greenlet, so the worker pools can be much larger than with OS threads
+if GEVENT_AVAILABLE:
+    os.environ.setdefault("AIBA_LLM_MAX_CONNECTIONS", "500")
+    os.environ.setdefault("AIBA_LLM_MAX_KEEPALIVE", "100")
+    os.environ.setdefault("AIBA_TURN_WORKERS", "512")
+    os.environ.setdefault("AIBA_PREFETCH_WORKERS", "256")
+
+from app import app
+
+HOST = os.getenv("AIBA_HOST", "0.0.0.0")
+PORT = int(os.getenv("AIBA_PORT", "5001"))
+# Most requests served at once; the rest wait in the accept queue
+MAX_CONCURRENT_REQUESTS = int(os.getenv("AIBA_MAX_CONCURRENT_REQUESTS", "1000"))
+
+
+def main():
+    if not GEVENT_AVAILABLE:
+        print("⚠️  gevent not installed - falling back to the threaded Flask server")
+        print("   Install with: pip install gevent")
+        app.run(host=HOST, port=PORT, threaded=True)
+        return
+
+    from gevent.pool import Pool
+    from gevent.pywsgi import WSGIServer
+
+    server = WSGIServer((HOST, PORT), app, spawn=Pool(MAX_CONCURRENT_REQUESTS))
+    print(f"🚀 Serving AIBA on http://{HOST}:{PORT} (gevent, up to {MAX_CONCURRENT_REQUESTS} concurrent requests)")
+    server.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,133 @@
+"""
+Session Store Module
+Keeps conversation state on the server so clients only send what changed
+"""
+import os
+import json
+import time
+import uuid
+import sqlite3
+import threading
+from collections import OrderedDict
+from dotenv import load_dotenv
+
+load_dotenv()
+
+MAX_SESSIONS = int(os.getenv("AIBA_SESSION_CACHE_SIZE", "256"))
+# Optional SQLite file; without it sessions live in memory only
+SESSION_DB_PATH = os.getenv("AIBA_SESSION_DB", "")
+# Sessions share this many locks (see SessionStore.lock)
+SESSION_LOCK_STRIPES = 64
+
+
+def new_session_id():
+    return uuid.uuid4().hex
+
+
+def new_session(client_name, company_name, project_topic, project_context, customer_research, research_model,
+                session_id=None):
+    """Build the initial state for a new discovery session"""
+    now = time.time()
+    return {
+        "session_id": session_id or new_session_id(),
+        "client_name": client_name,
+        "company_name": company_name,
+        "project_topic": project_topic,
+        "project_context": project_context,
+        "customer_research": customer_research or "",
+        "research_model": research_model,
+        "conversation_history": [],
+        "conversation_phase": "discovery",
+        "created_at": now,
+        "updated_at": now
+    }
+
+
+class SessionStore:
+    """
+    In-memory LRU of sessions with optional write-through SQLite backing
+
+    Without a database, the least recently used sessions are dropped once
+    max_sessions is reached. With one, evicted sessions are reloaded from
+    disk on their next request.
+    """
+
+    def __init__(self, max_sessions=MAX_SESSIONS, db_path=SESSION_DB_PATH):
+        self.max_sessions = max_sessions
+        self.db_path = db_path
+        self._sessions = OrderedDict()
+        self._lock = threading.Lock()
+        self._session_locks = [threading.RLock() for _ in range(SESSION_LOCK_STRIPES)]
+        self._db = None
+
+        if db_path:
+            self._db = sqlite3.connect(db_path, check_same_thread=False)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS sessions ("
+                "session_id TEXT PRIMARY KEY, data TEXT NOT NULL, updated_at REAL NOT NULL)"
+            )
+            self._db.commit()
+
+    def get(self, session_id):
+        """Return the session dict, or None if it is unknown or was evicted"""
+        if not session_id:
+            return None
+
+        with self._lock:
+            session = self._sessions.get(session_id)
+            if session is not None:
+                self._sessions.move_to_end(session_id)
+                return session
+
+            if self._db is None:
+                return None
+
+            row = self._db.execute(
+                "SELECT data FROM sessions WHERE session_id = ?", (session_id,)
+            ).fetchone()
+            if row is None:
+                return None
+
+            session = json.loads(row[0])
+            self._remember(session_id, session)
+            return session
+
+    def lock(self, session_id):
+        """
+        Lock to hold while changing or saving a session that another thread may touch
+
+        Re-entrant; sessions are spread over a fixed set of locks, so memory
+        doesn't grow with the number of sessions.
+        """
+        return self._session_locks[hash(session_id) % len(self._session_locks)]
+
+    def save(self, session):
+        """Store (or update) a session"""
+        session["updated_at"] = time.time()
+        session_id = session["session_id"]
+
+        with self._lock:
+            self._remember(session_id, session)
+            if self._db is not None:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO sessions (session_id, data, updated_at) VALUES (?, ?, ?)",
+                    (session_id, json.dumps(session, ensure_ascii=False), session["updated_at"])
+                )
+                self._db.commit()
+
+    def delete(self, session_id):
+        with self._lock:
+            self._sessions.pop(session_id, None)
+            if self._db is not None:
+                self._db.execute("DELETE FROM sessions WHERE session_id = ?", (session_id,))
+                self._db.commit()
+
+    def _remember(self, session_id, session):
+        self._sessions[session_id] = session
+        self._sessions.move_to_end(session_id)
+        while len(self._sessions) > self.max_sessions:
+            self._sessions.popitem(last=False)
+
+
+# Shared store instance
+session_store = SessionStore()
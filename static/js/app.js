@@ -1,6 +1,7 @@
 
 let state = {
     currentStep: 'project-setup',
+    sessionId: null,
     projectContext: null,
     clientName: '',
     companyName: '',
@@ -9,12 +10,48 @@ let state = {
     conversationPhase: 'discovery',
     totalExchanges: 0,
     customerResearch: '',
+    answerValidation: null,
+    completeness: null,
     brdData: null
 };
 
 // API Base URL
 const API_BASE = '';
 
+// The server keeps the conversation state; requests only carry the session id and what changed
+function getFullSessionState() {
+    return {
+        session_id: state.sessionId,
+        conversation_history: state.conversationHistory,
+        customer_research: state.customerResearch,
+        project_context: state.projectContext,
+        project_topic: state.projectTopic,
+        client_name: state.clientName,
+        company_name: state.companyName,
+        conversation_phase: state.conversationPhase
+    };
+}
+
+async function postWithSession(path, body) {
+    const send = (payload) => fetch(`${API_BASE}${path}`, {
+        method: 'POST',
+        headers: {
+            'Content-Type': 'application/json'
+        },
+        body: JSON.stringify(payload)
+    });
+
+    let response = await send(Object.assign({ session_id: state.sessionId }, body));
+    if (response.status === 404) {
+        const errorData = await response.clone().json().catch(() => ({}));
+        if (errorData.error_code === 'session_expired') {
+            // The server lost the session - resend the full state once so it can be restored
+            response = await send(Object.assign(getFullSessionState(), body));
+        }
+    }
+    return response;
+}
+
 // Initialize
 document.addEventListener('DOMContentLoaded', () => {
     initializeEventListeners();
@@ -129,6 +166,7 @@ async function handleProjectSetup(e) {
         const data = await response.json();
         
         if (data.success) {
+            state.sessionId = data.session_id || null;
             state.projectContext = data.project_context;
             state.clientName = data.client_name;
             state.companyName = data.company_name;
@@ -162,17 +200,8 @@ async function loadNextQuestion() {
     }
     
     try {
-        const response = await fetch(`${API_BASE}/api/get-question`, {
-            method: 'POST',
-            headers: {
-                'Content-Type': 'application/json'
-            },
-            body: JSON.stringify({
-                conversation_history: state.conversationHistory,
-                customer_research: state.customerResearch,
-                project_topic: state.projectTopic,
-                conversation_phase: state.conversationPhase
-            })
+        const response = await postWithSession('/api/get-question', {
+            conversation_phase: state.conversationPhase
         });
         
         if (!response.ok) {
@@ -254,18 +283,10 @@ async function handleSubmitAnswer() {
     const question = questionElement.textContent;
     
     try {
-        const response = await fetch(`${API_BASE}/api/submit-answer`, {
-            method: 'POST',
-            headers: {
-                'Content-Type': 'application/json'
-            },
-            body: JSON.stringify({
-                question: question,
-                answer: answer,
-                conversation_history: state.conversationHistory,
-                customer_research: state.customerResearch,
-                conversation_phase: state.conversationPhase
-            })
+        const response = await postWithSession('/api/submit-answer', {
+            question: question,
+            answer: answer,
+            conversation_phase: state.conversationPhase
         });
         
         if (!response.ok) {
@@ -279,12 +300,19 @@ async function handleSubmitAnswer() {
             addMessage('assistant', question);
             addMessage('user', answer);
             
-            // Only add AI response if it's a real question (contains ?), skip acknowledgments
-            if (data.ai_response && data.ai_response.trim() && data.ai_response.includes('?')) {
-                addMessage('assistant', data.ai_response);
+            applyTurnResults(data);
+            if (data.pending_tasks && data.pending_tasks.length && state.sessionId) {
+                // Results that missed the server's latency budget arrive later
+                pollTurnResults(state.sessionId);
             }
             
-            state.conversationHistory = data.conversation_history || state.conversationHistory;
+            if (data.conversation_history) {
+                state.conversationHistory = data.conversation_history;
+            } else {
+                // Mirror the server-side history locally
+                state.conversationHistory.push({ "role": "assistant", "content": question });
+                state.conversationHistory.push({ "role": "user", "content": answer });
+            }
             state.conversationPhase = data.conversation_phase || state.conversationPhase;
             state.totalExchanges = data.total_exchanges || state.totalExchanges;
             
@@ -306,11 +334,58 @@ async function handleSubmitAnswer() {
     }
 }
 
+// Follow-up, validation and completeness results for the last answer
+function applyTurnResults(results) {
+    // Only add AI response if it's a real question (contains ?), skip acknowledgments
+    if (results.ai_response && results.ai_response.trim() && results.ai_response.includes('?')) {
+        addMessage('assistant', results.ai_response);
+    }
+    if (results.validation) {
+        state.answerValidation = results.validation;
+    }
+    if (results.completeness) {
+        state.completeness = results.completeness;
+    }
+}
+
+async function pollTurnResults(sessionId) {
+    for (let attempt = 0; attempt < 10 && sessionId === state.sessionId; attempt++) {
+        try {
+            const response = await fetch(`${API_BASE}/api/turn-results/${sessionId}?wait=5`);
+            if (!response.ok) {
+                return;
+            }
+            const data = await response.json();
+            applyTurnResults(data.results || {});
+            if (!data.pending_tasks || !data.pending_tasks.length) {
+                return;
+            }
+        } catch (error) {
+            console.error('Error fetching turn results:', error);
+            return;
+        }
+    }
+}
+
 async function handleSkipQuestion() {
     // Add skip to conversation history if there is a current question
     const currentQuestionDiv = document.getElementById('current-question');
     if (currentQuestionDiv && currentQuestionDiv.querySelector('p')) {
         const question = currentQuestionDiv.querySelector('p').textContent;
+        if (state.sessionId) {
+            // Record the skip in the server-side session
+            try {
+                const response = await postWithSession('/api/submit-answer', {
+                    question: question,
+                    answer: 'skip',
+                    conversation_phase: state.conversationPhase
+                });
+                const data = await response.json();
+                state.conversationPhase = data.conversation_phase || state.conversationPhase;
+            } catch (error) {
+                console.error('Error recording skip:', error);
+            }
+        }
         state.conversationHistory.push({
             "role": "assistant",
             "content": question
@@ -349,15 +424,8 @@ async function handleAddAdditionalInfo() {
     }
     
     try {
-        const response = await fetch(`${API_BASE}/api/add-additional-info`, {
-            method: 'POST',
-            headers: {
-                'Content-Type': 'application/json'
-            },
-            body: JSON.stringify({
-                user_input: input,
-                conversation_history: state.conversationHistory
-            })
+        const response = await postWithSession('/api/add-additional-info', {
+            user_input: input
         });
         
         if (!response.ok) {
@@ -372,7 +440,15 @@ async function handleAddAdditionalInfo() {
             if (data.ai_response && data.ai_response.trim() && data.ai_response.includes('?')) {
                 addAdditionalMessage('assistant', data.ai_response);
             }
-            state.conversationHistory = data.conversation_history || state.conversationHistory;
+            if (data.conversation_history) {
+                state.conversationHistory = data.conversation_history;
+            } else {
+                // Mirror the server-side history locally
+                state.conversationHistory.push({ "role": "user", "content": input });
+                if (data.ai_response && data.ai_response.trim()) {
+                    state.conversationHistory.push({ "role": "assistant", "content": data.ai_response });
+                }
+            }
             document.getElementById('additional-input').value = '';
         }
     } catch (error) {
@@ -382,23 +458,108 @@ async function handleAddAdditionalInfo() {
 }
 
 // BRD Generation
+
 async function handleGenerateBRD() {
     showStep('step-brd-generation');
-    
+
+    // Stream the BRD as it is written; fall back to the blocking endpoint if streaming isn't available
+    if (window.ReadableStream && window.TextDecoder) {
+        try {
+            const streamed = await streamBRD();
+            if (streamed) {
+                return;
+            }
+        } catch (error) {
+            console.error('Streaming error:', error);
+            alert('An error occurred generating the BRD: ' + (error.message || 'Unknown error'));
+            showStep('step-additional-info');
+            return;
+        }
+    }
+
+    await generateBRDBlocking();
+}
+
+async function streamBRD() {
+    const response = await postWithSession('/api/generate-brd/stream', {});
+
+    const contentType = response.headers.get('Content-Type') || '';
+    if (!response.ok || !response.body || !contentType.includes('text/event-stream')) {
+        if (response.status === 404) {
+            return false;  // Server without streaming support
+        }
+        const errorData = await response.json().catch(() => ({ error: `HTTP ${response.status}` }));
+        throw new Error(errorData.error || `HTTP error! status: ${response.status}`);
+    }
+
+    const previewDiv = document.getElementById('brd-preview');
+    const reader = response.body.getReader();
+    const decoder = new TextDecoder();
+    let buffer = '';
+    let started = false;
+    let result = null;
+
+    while (true) {
+        const { value, done } = await reader.read();
+        if (done) {
+            break;
+        }
+        buffer += decoder.decode(value, { stream: true });
+
+        // Events are separated by a blank line
+        let boundary = buffer.indexOf('\n\n');
+        while (boundary !== -1) {
+            const event = parseSSEEvent(buffer.slice(0, boundary));
+            buffer = buffer.slice(boundary + 2);
+            boundary = buffer.indexOf('\n\n');
+
+            if (!event) {
+                continue;
+            }
+            if (event.type === 'chunk') {
+                if (!started) {
+                    // Show the document as soon as the first content arrives
+                    showStep('step-brd-result');
+                    previewDiv.textContent = '';
+                    started = true;
+                }
+                previewDiv.textContent += event.data.text;
+            } else if (event.type === 'done') {
+                result = event.data;
+            } else if (event.type === 'error') {
+                throw new Error(event.data.error || 'BRD generation failed');
+            }
+        }
+    }
+
+    if (!result) {
+        throw new Error('BRD stream ended unexpectedly');
+    }
+
+    state.brdData = result;
+    displayBRDResult(result);
+    return true;
+}
+
+function parseSSEEvent(rawEvent) {
+    let type = 'message';
+    const dataLines = [];
+    rawEvent.split('\n').forEach(line => {
+        if (line.startsWith('event:')) {
+            type = line.slice(6).trim();
+        } else if (line.startsWith('data:')) {
+            dataLines.push(line.slice(5).trim());
+        }
+    });
+    if (!dataLines.length) {
+        return null;
+    }
+    return { type: type, data: JSON.parse(dataLines.join('\n')) };
+}
+
+async function generateBRDBlocking() {
     try {
-        const response = await fetch(`${API_BASE}/api/generate-brd`, {
-            method: 'POST',
-            headers: {
-                'Content-Type': 'application/json'
-            },
-            body: JSON.stringify({
-                conversation_history: state.conversationHistory,
-                project_context: state.projectContext,
-                customer_research: state.customerResearch,
-                client_name: state.clientName,
-                company_name: state.companyName
-            })
-        });
+        const response = await postWithSession('/api/generate-brd', {});
         
         if (!response.ok) {
             throw new Error(`HTTP error! status: ${response.status}`);
@@ -438,6 +599,19 @@ function displayBRDResult(data) {
         }
     }
     
+    // The PDF renders in the background; show the button once it is ready
+    if (!data.pdf_filename && data.pdf_job_id) {
+        const brdData = state.brdData;
+        waitForPdfJob(data.pdf_job_id).then(pdfFilename => {
+            if (pdfFilename && state.brdData === brdData) {
+                state.brdData.pdf_filename = pdfFilename;
+                if (pdfBtn) {
+                    pdfBtn.style.display = 'inline-flex';
+                }
+            }
+        });
+    }
+    
     // Debug logging
     console.log('BRD Generation Result:', {
         md_filename: data.md_filename,
@@ -466,6 +640,32 @@ function displayBRDResult(data) {
     }
 }
 
+// Poll a background PDF render until it finishes; resolves to the PDF filename or null
+async function waitForPdfJob(jobId, timeoutMs = 120000) {
+    const deadline = Date.now() + timeoutMs;
+    while (Date.now() < deadline) {
+        try {
+            const response = await fetch(`${API_BASE}/api/pdf-jobs/${jobId}`);
+            if (!response.ok) {
+                return null;
+            }
+            const job = await response.json();
+            if (job.status === 'done') {
+                return job.pdf_filename;
+            }
+            if (job.status === 'failed') {
+                console.warn('PDF generation failed:', job.error);
+                return null;
+            }
+        } catch (error) {
+            console.error('Error checking PDF job:', error);
+            return null;
+        }
+        await new Promise(resolve => setTimeout(resolve, 1000));
+    }
+    return null;
+}
+
 // Downloads
 async function handleDownloadMD() {
     // Download PDF instead of markdown
@@ -487,15 +687,16 @@ async function handleDownloadMD() {
                     'Content-Type': 'application/json'
                 },
                 body: JSON.stringify({
-                    md_filename: state.brdData.md_filename,
-                    brd_content: state.brdData.brd_content
+                    session_id: state.sessionId,
+                    md_filename: state.brdData.md_filename
                 })
             });
             
             if (response.ok) {
                 const data = await response.json();
-                if (data.pdf_filename) {
-                    filename = data.pdf_filename;
+                const pdfFilename = data.pdf_filename || (data.job_id && await waitForPdfJob(data.job_id));
+                if (pdfFilename) {
+                    filename = pdfFilename;
                     state.brdData.pdf_filename = filename;
                 }
             }
@@ -596,6 +797,7 @@ function handleNewProject() {
     // Reset state
     state = {
         currentStep: 'project-setup',
+        sessionId: null,
         projectContext: null,
         clientName: '',
         companyName: '',
@@ -604,6 +806,8 @@ function handleNewProject() {
         conversationPhase: 'discovery',
         totalExchanges: 0,
         customerResearch: '',
+        answerValidation: null,
+        completeness: null,
         brdData: null
     };
     
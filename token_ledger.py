@@ -0,0 +1,165 @@
+"""
+Token Ledger Module
+Per-session token usage and cost of every LLM call, by endpoint, task and stage
+"""
+import os
+import json
+import threading
+from collections import OrderedDict
+from dotenv import load_dotenv
+from tracing import tracer
+
+load_dotenv()
+
+# USD per million (prompt, completion) tokens; override with AIBA_MODEL_PRICES='{"model": [in, out]}'
+MODEL_PRICES = {
+    "llama-3.1-70b-versatile": (0.59, 0.79),
+    "llama-3.1-8b-instant": (0.05, 0.08),
+    "mixtral-8x7b-32768": (0.24, 0.24),
+    "gemma2-9b-it": (0.20, 0.20)
+}
+try:
+    MODEL_PRICES.update({
+        model_name: tuple(prices)
+        for model_name, prices in json.loads(os.getenv("AIBA_MODEL_PRICES", "{}")).items()
+    })
+except (ValueError, TypeError, AttributeError) as e:
+    print(f"⚠️  Ignoring invalid AIBA_MODEL_PRICES: {e}")
+
+# Sessions whose usage is kept in memory (least recently used are dropped)
+LEDGER_MAX_SESSIONS = int(os.getenv("AIBA_LEDGER_MAX_SESSIONS", "10000"))
+
+# Stage of the discovery workflow each LLM task belongs to
+STAGE_BY_TASK = {
+    "research_customer": "research",
+    "adaptive_question": "questions",
+    "chat": "questions",
+    "probing_question": "questions",
+    "validate_answer": "validation",
+    "analyze_sections": "completeness"
+}
+
+
+def stage_for(task):
+    if task.startswith("generate_brd"):
+        return "brd"
+    return STAGE_BY_TASK.get(task, "other")
+
+
+def cost_for(model_name, prompt_tokens, completion_tokens):
+    """USD cost of a call at MODEL_PRICES (0.0 for unpriced models)"""
+    prompt_price, completion_price = MODEL_PRICES.get(model_name, (0.0, 0.0))
+    return (prompt_tokens * prompt_price + completion_tokens * completion_price) / 1_000_000
+
+
+USAGE_FIELDS = ("calls", "cached_calls", "prompt_tokens", "completion_tokens", "total_tokens", "cost_usd")
+
+
+def empty_totals():
+    return {field: 0.0 if field == "cost_usd" else 0 for field in USAGE_FIELDS}
+
+
+def add_totals(totals, row):
+    for field in USAGE_FIELDS:
+        totals[field] += row[field]
+
+
+def usage_report(rows):
+    """Totals of ledger rows, overall and broken down by stage, task, endpoint and model"""
+    totals = empty_totals()
+    breakdowns = {"by_stage": {}, "by_task": {}, "by_endpoint": {}, "by_model": {}}
+    for (endpoint, task, model_name), row in rows.items():
+        add_totals(totals, row)
+        for breakdown, key in (("by_stage", stage_for(task)), ("by_task", task),
+                               ("by_endpoint", endpoint), ("by_model", model_name)):
+            add_totals(breakdowns[breakdown].setdefault(key, empty_totals()), row)
+
+    totals["cost_usd"] = round(totals["cost_usd"], 6)
+    for breakdown in breakdowns.values():
+        for row in breakdown.values():
+            row["cost_usd"] = round(row["cost_usd"], 6)
+    return dict(totals=totals, **breakdowns)
+
+
+class TokenLedger:
+    """
+    Token usage of every LLM call, aggregated per session
+
+    Rows are keyed by (endpoint, task, model) and hold call counts, prompt
+    and completion tokens and cost. Calls answered from the response cache
+    are counted as cached calls with no tokens. Calls made outside a
+    session (CLI runs, stateless clients) are kept under session None.
+    """
+
+    def __init__(self, max_sessions=LEDGER_MAX_SESSIONS):
+        self.max_sessions = max_sessions
+        self._sessions = OrderedDict()
+        self._totals = {}
+        self._lock = threading.Lock()
+
+    def record(self, session_id, endpoint, task, model_name, prompt_tokens=0, completion_tokens=0, cached=False):
+        prompt_tokens = prompt_tokens or 0
+        completion_tokens = completion_tokens or 0
+        key = (endpoint or "none", task, model_name or "none")
+        entry = {
+            "calls": 1,
+            "cached_calls": 1 if cached else 0,
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+            "total_tokens": prompt_tokens + completion_tokens,
+            "cost_usd": cost_for(model_name, prompt_tokens, completion_tokens)
+        }
+
+        with self._lock:
+            rows = self._sessions.get(session_id)
+            if rows is None:
+                rows = self._sessions[session_id] = {}
+            self._sessions.move_to_end(session_id)
+            while len(self._sessions) > self.max_sessions:
+                self._sessions.popitem(last=False)
+
+            for table in (rows, self._totals):
+                add_totals(table.setdefault(key, empty_totals()), entry)
+
+    def session_usage(self, session_id):
+        """Usage report for one session (all zeros if it made no calls)"""
+        with self._lock:
+            rows = {key: dict(row) for key, row in self._sessions.get(session_id, {}).items()}
+        return usage_report(rows)
+
+    def totals(self):
+        """Usage report across every session since startup"""
+        with self._lock:
+            rows = {key: dict(row) for key, row in self._totals.items()}
+            sessions = len(self._sessions)
+        report = usage_report(rows)
+        report["sessions"] = sessions
+        return report
+
+
+# Shared ledger instance
+token_ledger = TokenLedger()
+
+
+def record_span(span):
+    """Tracer listener: charge a finished LLM span to the session of its request"""
+    if span.kind != "llm" or span.status != "ok":
+        return
+    root = span.root()
+    if root.kind == "http":
+        endpoint = root.attributes.get("route")
+    else:
+        # Background work or a CLI run: named after its outermost span, if any
+        endpoint = root.name if root is not span else None
+    token_ledger.record(
+        root.attributes.get("session_id"),
+        endpoint,
+        span.attributes.get("task", ""),
+        span.attributes.get("model"),
+        span.attributes.get("prompt_tokens"),
+        span.attributes.get("completion_tokens"),
+        cached=bool(span.attributes.get("cache_hit"))
+    )
+
+
+tracer.add_listener(record_span)
@@ -0,0 +1,205 @@
+"""
+Tracing Module
+Lightweight spans for Flask requests and LLM calls, nested with contextvars
+"""
+import os
+import time
+import uuid
+import threading
+import contextvars
+from collections import deque
+from contextlib import contextmanager
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Finished request traces kept for /api/traces
+TRACE_BUFFER_SIZE = int(os.getenv("AIBA_TRACE_BUFFER_SIZE", "200"))
+# Print every finished trace as an indented tree
+TRACE_LOG = os.getenv("AIBA_TRACE_LOG", "0") == "1"
+
+_current_span = contextvars.ContextVar("aiba_current_span", default=None)
+# Time the current work item waited for a worker thread (see in_current_context)
+_queue_wait = contextvars.ContextVar("aiba_queue_wait", default=None)
+
+
+class Span:
+    """
+    One timed operation, with attributes and child spans
+
+    kind is "http" for a Flask request, "llm" for a model call and
+    "internal" for anything else. Children share their parent's trace id.
+    """
+
+    def __init__(self, tracer, name, kind="internal", attributes=None, parent=None):
+        self.tracer = tracer
+        self.parent = parent
+        self.name = name
+        self.kind = kind
+        self.attributes = dict(attributes or {})
+        self.trace_id = parent.trace_id if parent else uuid.uuid4().hex
+        self.span_id = uuid.uuid4().hex[:16]
+        self.parent_id = parent.span_id if parent else None
+        self.status = "ok"
+        self.start_time = time.time()
+        self.duration = None
+        self.children = []
+        self._started = time.perf_counter()
+        if parent is not None:
+            parent.children.append(self)
+
+    def set(self, **attributes):
+        self.attributes.update(attributes)
+
+    def fail(self, error):
+        self.status = "error"
+        self.attributes["error"] = str(error)[:200]
+
+    def root(self):
+        span = self
+        while span.parent is not None:
+            span = span.parent
+        return span
+
+    def elapsed(self):
+        return time.perf_counter() - self._started
+
+    def finish(self):
+        """End the span (only the first call counts)"""
+        if self.duration is None:
+            self.duration = self.elapsed()
+            self.tracer._finished(self)
+
+    def to_dict(self):
+        return {
+            "name": self.name,
+            "kind": self.kind,
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "status": self.status,
+            "start_time": self.start_time,
+            "duration_ms": round(self.duration * 1000, 1) if self.duration is not None else None,
+            "attributes": dict(self.attributes),
+            "children": [child.to_dict() for child in list(self.children)]
+        }
+
+
+class Tracer:
+    """
+    Creates spans and keeps the most recent finished traces
+
+    The active span lives in a contextvar, so spans opened during a Flask
+    request (or in a worker started with in_current_context) nest under it.
+    Listeners are called with every finished span; the metrics module uses
+    one to build its histograms and the token ledger one to charge sessions.
+    """
+
+    def __init__(self, buffer_size=TRACE_BUFFER_SIZE, log_traces=TRACE_LOG):
+        self.log_traces = log_traces
+        self._recent = deque(maxlen=buffer_size)
+        self._listeners = []
+        self._lock = threading.Lock()
+
+    def add_listener(self, listener):
+        self._listeners.append(listener)
+
+    def current_span(self):
+        return _current_span.get()
+
+    def start_span(self, name, kind="internal", **attributes):
+        """Open a child of the current span without making it current"""
+        return Span(self, name, kind, attributes, parent=_current_span.get())
+
+    def tag_root(self, **attributes):
+        """Set attributes on the outermost span of the current trace (e.g. the session of a request)"""
+        span = _current_span.get()
+        if span is not None:
+            span.root().set(**attributes)
+
+    def activate(self, span):
+        """Make span the current span; returns a token for deactivate()"""
+        return _current_span.set(span)
+
+    def deactivate(self, token):
+        try:
+            _current_span.reset(token)
+        except ValueError:
+            # Token from another context (e.g. a streamed response finishing elsewhere)
+            _current_span.set(None)
+
+    @contextmanager
+    def span(self, name, kind="internal", **attributes):
+        """Run a block as the current span, marking it failed if the block raises"""
+        span = self.start_span(name, kind, **attributes)
+        token = self.activate(span)
+        try:
+            yield span
+        except BaseException as e:
+            span.fail(e)
+            raise
+        finally:
+            self.deactivate(token)
+            span.finish()
+
+    def recent_traces(self, limit=50):
+        """Most recent finished traces, newest first"""
+        with self._lock:
+            traces = list(self._recent)[-limit:]
+        return [span.to_dict() for span in reversed(traces)]
+
+    def _finished(self, span):
+        for listener in self._listeners:
+            try:
+                listener(span)
+            except Exception as e:
+                print(f"⚠️  Trace listener failed: {e}")
+
+        if span.parent_id is None:
+            with self._lock:
+                self._recent.append(span)
+            if self.log_traces:
+                print(format_trace(span))
+
+
+def format_trace(span, depth=0):
+    """Indented one-line-per-span view of a trace"""
+    attributes = " ".join(f"{key}={value}" for key, value in span.attributes.items() if value is not None)
+    duration = f"{span.duration * 1000:.0f}ms" if span.duration is not None else "open"
+    marker = "🔭" if depth == 0 else "  " * depth + "└"
+    status = "" if span.status == "ok" else " ❌"
+    lines = [f"{marker} {span.name} {duration}{status} {attributes}".rstrip()]
+    lines.extend(format_trace(child, depth + 1) for child in list(span.children))
+    return "\n".join(lines)
+
+
+def in_current_context(fn):
+    """
+    fn wrapped to run with the caller's current span, for handing to a worker pool
+
+    Also records how long the call waited for a worker; the first LLM span it
+    opens reports that as its queue time.
+    """
+    context = contextvars.copy_context()
+    submitted = time.perf_counter()
+
+    def run(*args, **kwargs):
+        return context.run(_run_queued, submitted, fn, args, kwargs)
+    return run
+
+
+def _run_queued(submitted, fn, args, kwargs):
+    _queue_wait.set({"seconds": time.perf_counter() - submitted})
+    return fn(*args, **kwargs)
+
+
+def take_queue_seconds():
+    """Queue time of the current work item, reported once (0.0 afterwards or outside a pool)"""
+    wait = _queue_wait.get()
+    if not wait:
+        return 0.0
+    return wait.pop("seconds", 0.0)
+
+
+# Shared tracer instance
+tracer = Tracer()
@@ -0,0 +1,125 @@
+"""
+Turn Tasks Module
+Runs the independent per-answer tasks concurrently within a latency budget
+"""
+import os
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED, ALL_COMPLETED
+from dotenv import load_dotenv
+from tracing import in_current_context
+
+load_dotenv()
+
+TURN_WORKERS = int(os.getenv("AIBA_TURN_WORKERS", "16"))
+# How long /api/submit-answer waits before returning what is ready
+TURN_BUDGET_SECONDS = float(os.getenv("AIBA_TURN_BUDGET_SECONDS", "4"))
+# Late results older than this are dropped if nobody collected them
+PENDING_RESULTS_TTL_SECONDS = float(os.getenv("AIBA_TURN_RESULTS_TTL_SECONDS", "300"))
+
+
+class TurnTaskRunner:
+    """
+    Bounded thread pool for the work that follows each answer
+
+    run() starts every task at once and returns the results that finished
+    within the latency budget. Tasks still running are kept per session
+    until they finish or hit their own timeout; collect() hands their
+    results out later.
+    """
+
+    def __init__(self, max_workers=TURN_WORKERS):
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="turn-task")
+        self._pending = {}
+        self._lock = threading.Lock()
+
+    def run(self, session_id, tasks, budget_seconds=TURN_BUDGET_SECONDS):
+        """
+        Run tasks concurrently
+
+        Args:
+            session_id: Session the late results belong to (None = wait for everything)
+            tasks: dict of name -> (callable, timeout_seconds)
+            budget_seconds: How long to wait before returning
+
+        Returns:
+            tuple of (results dict, list of task names still pending)
+        """
+        started = time.monotonic()
+        running = {
+            name: (self._executor.submit(in_current_context(fn)), started + timeout)
+            for name, (fn, timeout) in tasks.items()
+        }
+
+        if not session_id:
+            # Nowhere to deliver late results, so wait for each task's own timeout
+            budget_seconds = max(timeout for _, timeout in tasks.values())
+
+        results, still_running = self._wait(running, started + budget_seconds)
+
+        if still_running:
+            with self._lock:
+                self._prune()
+                self._pending.setdefault(session_id, {}).update(still_running)
+
+        return results, sorted(still_running.keys())
+
+    def collect(self, session_id, wait_seconds=0.0):
+        """
+        Results of tasks that were still running when run() returned
+
+        Waits up to wait_seconds for at least one of them to finish.
+
+        Returns:
+            tuple of (results dict, list of task names still pending)
+        """
+        with self._lock:
+            running = self._pending.pop(session_id, {})
+        if not running:
+            return {}, []
+
+        results, still_running = self._wait(running, time.monotonic() + wait_seconds, return_early=True)
+
+        if still_running:
+            with self._lock:
+                self._pending.setdefault(session_id, {}).update(still_running)
+
+        return results, sorted(still_running.keys())
+
+    def _wait(self, running, wait_until, return_early=False):
+        """Wait for tasks until wait_until (or the first completion if return_early)"""
+        futures = [future for future, _ in running.values()]
+        remaining = max(0.0, wait_until - time.monotonic())
+        if futures:
+            wait(futures, timeout=remaining, return_when=FIRST_COMPLETED if return_early else ALL_COMPLETED)
+
+        results = {}
+        still_running = {}
+        now = time.monotonic()
+        for name, (future, deadline) in running.items():
+            if future.done():
+                try:
+                    results[name] = future.result()
+                except Exception as e:
+                    print(f"⚠️  Turn task '{name}' failed: {e}")
+                    results[name] = None
+            elif now >= deadline:
+                print(f"⏱️  Turn task '{name}' timed out")
+                future.cancel()
+                results[name] = None
+            else:
+                still_running[name] = (future, deadline)
+
+        return results, still_running
+
+    def _prune(self):
+        """Drop late results that were never collected"""
+        cutoff = time.monotonic() - PENDING_RESULTS_TTL_SECONDS
+        for session_id in list(self._pending.keys()):
+            tasks = self._pending[session_id]
+            if all(deadline < cutoff for _, deadline in tasks.values()):
+                del self._pending[session_id]
+
+
+# Shared runner instance
+turn_task_runner = TurnTaskRunner()